@@ -0,0 +1,817 @@
+"""Performance benchmarks for the travel adventure.
+
+    python benchmarks.py suite -o results.json            # everything, as JSON
+    python benchmarks.py compare old.json new.json        # flag regressions
+    python benchmarks.py story      # dict-of-dataclasses vs compiled mmap story load
+    python benchmarks.py journeys   # memory of stored journeys, tuples vs location ids
+    python benchmarks.py journal    # choice journal write rate and resume time
+    python benchmarks.py basemap    # per-map render time with and without the cached base layer
+    python benchmarks.py turtle     # interactive Turtle draw time, pen-by-pen vs fast mode
+                                    # (needs a display; headless: xvfb-run -a python benchmarks.py turtle)
+    python benchmarks.py labels     # label placement time for many distinct places
+    python benchmarks.py routes     # raster route drawing, every step vs aggregated legs
+    python benchmarks.py arcs       # great-circle arc cost per leg, first draw vs cached
+    python benchmarks.py projections  # projecting the static map layers, first time vs cached
+    python benchmarks.py heatmap    # aggregate heatmap throughput and peak memory
+    python benchmarks.py export     # SVG and GeoJSON export time for long journeys
+    python benchmarks.py validate   # story validation time, full check vs cached result
+    python benchmarks.py reload     # hot reload time for a one-node edit, vs loading the whole story
+    python benchmarks.py search     # full-text index build time and keyword query latency
+    python benchmarks.py spatial    # nearest-place and radius query rates on a gazetteer-sized set
+    python benchmarks.py planner    # route hints from the next-hop table vs searching per request
+    python benchmarks.py predecessors  # predecessor index upkeep, backward reachability and dominators
+"""
+from pathlib import Path
+from typing import Callable, Dict, List
+import argparse
+import dataclasses
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import travel_story
+from travel_story import JourneyOption, StoryNode
+
+PLACES = [
+    ("East Lansing, Michigan", 42.73698, -84.48387),
+    ("Las Vegas, Nevada", 36.17497, -115.13722),
+    ("Dublin, Ireland", 53.3498, -6.2603),
+    ("Tokyo, Japan", 35.6762, 139.6503),
+    ("Seoul, South Korea", 37.5665, 126.978),
+    ("London, United Kingdom", 51.50722, -0.1275),
+    ("Reykjavik, Iceland", 64.1466, -21.9426),
+    ("Barcelona, Spain", 41.3874, 2.1686),
+]
+
+
+def synthetic_graph(node_count: int, options_per_node: int = 3, seed: int = 0) -> Dict[str, StoryNode]:
+    """Build a random story graph shaped like the real one, starting at ``"start"``."""
+    rng = random.Random(seed)
+    node_ids = ["start"] + [f"node_{index}" for index in range(1, node_count)]
+    graph = {}
+    for index, node_id in enumerate(node_ids):
+        options = []
+        for choice in range(options_per_node):
+            target = rng.randrange(node_count)
+            options.append(
+                JourneyOption(
+                    prompt=f"Travel onward to stop {target}",
+                    next_id=node_ids[target],
+                    location=rng.choice(PLACES),
+                    detail=f"Choice {choice + 1} from stop {index}.",
+                )
+            )
+        graph[node_id] = StoryNode(
+            node_id=node_id,
+            title=f"Stop {index}",
+            description=f"A synthetic stop number {index} on the post-grad road.",
+            options=options,
+        )
+    return graph
+
+
+def _peak_rss_kb() -> int:
+    # ru_maxrss survives exec on Linux and would report the parent's peak, so prefer VmHWM.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _child(mode: str, argument: str) -> None:
+    """Load a story the way an importing process would and report time and peak RSS."""
+    started = time.perf_counter()
+    if mode in {"map", "map-fast"}:
+        from map_visualizer import draw_travel_map
+
+        draw_travel_map(_random_visits(int(argument)), wait=False, fast=mode == "map-fast")
+        print(f"{time.perf_counter() - started:.6f} {_peak_rss_kb()}")
+        return
+    if mode == "dict":
+        graph = synthetic_graph(int(argument))
+    else:
+        from story_compiler import CompiledStory
+
+        graph = CompiledStory(Path(argument))
+    graph["start"]
+    elapsed = time.perf_counter() - started
+    print(f"{elapsed:.6f} {_peak_rss_kb()}")
+
+
+def _measure(mode: str, argument: str) -> List[float]:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", mode, argument],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return [float(output[0]), float(output[1]) / 1024]
+
+
+def _measure_import() -> float:
+    """Seconds for a fresh interpreter to import travel_story (this module already has)."""
+    code = "import time; started = time.perf_counter(); import travel_story; print(time.perf_counter() - started)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=Path(__file__).parent
+    ).stdout
+    return float(output)
+
+
+def bench_compiled_story(sizes: List[int]) -> List[Dict[str, float]]:
+    """Compare cold load time and peak RSS of both story representations."""
+    from story_compiler import compile_story
+
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for size in sizes:
+            compiled = Path(scratch) / f"story-{size}.bin"
+            compile_story(synthetic_graph(size), compiled)
+            dict_seconds, dict_mb = _measure("dict", str(size))
+            mmap_seconds, mmap_mb = _measure("mmap", str(compiled))
+            results.append({
+                "nodes": size,
+                "dict_seconds": dict_seconds,
+                "dict_rss_mb": dict_mb,
+                "mmap_seconds": mmap_seconds,
+                "mmap_rss_mb": mmap_mb,
+            })
+    return results
+
+
+def bench_journey_storage(journey_count: int, stops: int = 12, seed: int = 0) -> Dict[str, float]:
+    """Measure the memory held by stored journeys as location tuples vs compact id arrays."""
+    import tracemalloc
+
+    from locations import build_location_table
+    from travel_story import START_LOCATION, STORY_GRAPH
+
+    table = build_location_table(STORY_GRAPH, START_LOCATION)
+    rng = random.Random(seed)
+    # Sessions loaded from storage hold their own tuples rather than sharing the story's.
+    template = [[rng.randrange(len(table)) for _ in range(stops)] for _ in range(256)]
+
+    tracemalloc.start()
+    tuples = [
+        [(name, lat, lon) for name, lat, lon in map(table.__getitem__, template[index % 256])]
+        for index in range(journey_count)
+    ]
+    tuple_bytes = tracemalloc.get_traced_memory()[0]
+    del tuples
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    compact = [table.encode(table[location_id] for location_id in template[index % 256]) for index in range(journey_count)]
+    compact_bytes = tracemalloc.get_traced_memory()[0]
+    del compact
+    tracemalloc.stop()
+    return {
+        "journeys": journey_count,
+        "stops": stops,
+        "tuple_mb": tuple_bytes / 2**20,
+        "compact_mb": compact_bytes / 2**20,
+    }
+
+
+def bench_journal_writes(choice_count: int, sessions: int = 1000, seed: int = 0) -> Dict[str, float]:
+    """Append choices for many sessions to a journal on local disk, then resume them."""
+    from journal import Journal
+    from travel_story import STORY_GRAPH
+
+    rng = random.Random(seed)
+    node_ids = list(STORY_GRAPH)
+    choices = [(rng.randrange(sessions), rng.choice(node_ids)) for _ in range(choice_count)]
+    with tempfile.TemporaryDirectory() as scratch:
+        journal = Journal(Path(scratch))
+        # Commits happen on a background thread, as in the server.
+        writing = threading.Event()
+        writing.set()
+
+        def committer() -> None:
+            while writing.is_set():
+                journal.commit_due()
+
+        thread = threading.Thread(target=committer)
+        started = time.perf_counter()
+        thread.start()
+        for session_id, node_id in choices:
+            journal.append(session_id, node_id, 0)
+        writing.clear()
+        thread.join()
+        journal.commit()
+        write_seconds = time.perf_counter() - started
+        journal.close()
+
+        journal = Journal(Path(scratch))
+        started = time.perf_counter()
+        journal.recover()
+        recover_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        journal.resume(0)
+        resume_seconds = time.perf_counter() - started
+        journal.close()
+    return {
+        "choices": choice_count,
+        "writes_per_second": choice_count / write_seconds,
+        "recover_seconds": recover_seconds,
+        "resume_one_seconds": resume_seconds,
+    }
+
+
+def bench_base_layer(journey_count: int, stops: int = 12) -> Dict[str, float]:
+    """Per-map raster render time for a batch, redrawing the base map vs compositing the cached one."""
+    from raster_map import base_layer, render_map
+
+    journeys = [_random_visits(stops, seed) for seed in range(journey_count)]
+    row: Dict[str, float] = {"journeys": journey_count}
+    base_layer(1000, 600)
+    for label, cached in [("redraw", False), ("cached", True)]:
+        started = time.perf_counter()
+        for visits in journeys:
+            render_map(visits, cached_base=cached)
+        row[f"{label}_ms_per_map"] = (time.perf_counter() - started) / journey_count * 1000
+    return row
+
+
+def bench_labels(label_count: int, seed: int = 0) -> Dict[str, float]:
+    """Place labels for ``label_count`` distinct places scattered over the map."""
+    from labels import place_labels
+
+    rng = random.Random(seed)
+    visits = [(f"Place {index}", rng.uniform(-80, 80), rng.uniform(-180, 180)) for index in range(label_count)]
+    started = time.perf_counter()
+    placed = place_labels(visits)
+    return {"labels": label_count, "placed": len(placed), "seconds": time.perf_counter() - started}
+
+
+def bench_routes(steps: int, seed: int = 0, naive_limit: int = 5_000) -> Dict[str, float]:
+    """Raster route time for a ``steps``-long journey, leg by leg vs aggregated.
+
+    Drawing every step is timed for at most ``naive_limit`` legs and scaled up.
+    """
+    from raster_map import RasterCanvas, draw_route, parse_color
+    from route_aggregation import aggregate_route
+
+    visits = _random_visits(steps + 1, seed)
+    canvas = RasterCanvas(1000, 600)
+    color = parse_color("gold")
+    sample = visits[:naive_limit + 1]
+    started = time.perf_counter()
+    for (_, lat0, lon0), (_, lat1, lon1) in zip(sample, sample[1:]):
+        canvas.line((lon0, lat0), (lon1, lat1), color, width=2)
+    naive = (time.perf_counter() - started) * steps / max(1, len(sample) - 1)
+    started = time.perf_counter()
+    draw_route(canvas, visits)
+    aggregated = time.perf_counter() - started
+    return {
+        "steps": steps,
+        "distinct_legs": len(aggregate_route(visits).legs),
+        "naive_seconds": naive,
+        "aggregated_seconds": aggregated,
+    }
+
+
+def bench_arcs(seed: int = 0) -> Dict[str, float]:
+    """Per-leg great-circle arc time for every pair of ``PLACES``, uncached then cached."""
+    import great_circle
+
+    legs = [(start, end) for start in PLACES for end in PLACES if start != end]
+    great_circle._pair_arc.cache_clear()
+    started = time.perf_counter()
+    for start, end in legs:
+        great_circle.leg_arc(start, end)
+    cold = (time.perf_counter() - started) / len(legs)
+    started = time.perf_counter()
+    for _ in range(100):
+        for start, end in legs:
+            great_circle.leg_arc(start, end)
+    warm = (time.perf_counter() - started) / (100 * len(legs))
+    return {"legs": len(legs), "cold_seconds": cold, "cached_seconds": warm}
+
+
+def bench_projections() -> Dict[str, Dict[str, float]]:
+    """Time to project the globe outline, graticule and continents for each projection."""
+    import projections
+
+    layers = (projections.projected_outline, projections.projected_graticule, projections.projected_landmasses)
+    results = {}
+    for name in projections.PROJECTIONS:
+        projection = projections.make_projection(name, PLACES)
+        for layer in layers:
+            layer.cache_clear()
+        timings = []
+        for _ in range(2):
+            started = time.perf_counter()
+            for layer in layers:
+                layer(projection)
+            timings.append(time.perf_counter() - started)
+        results[name] = {"first_seconds": timings[0], "cached_seconds": timings[1]}
+    return results
+
+
+def bench_heatmap(journey_count: int, workers: int = 1, seed: int = 0) -> Dict[str, float]:
+    """Tally and render a heatmap of ``journey_count`` generated journeys of 2-12 stops."""
+    from heatmap import build_heatmap
+
+    rng = random.Random(seed)
+    journeys = ([rng.choice(PLACES) for _ in range(rng.randint(2, 12))] for _ in range(journey_count))
+    started = time.perf_counter()
+    build_heatmap(journeys, workers=workers)
+    seconds = time.perf_counter() - started
+    return {"journeys": journey_count, "seconds": seconds, "journeys_per_second": journey_count / seconds, "peak_rss_kb": _peak_rss_kb()}
+
+
+def bench_export(stops: int) -> Dict[str, float]:
+    """Stream one ``stops``-long journey as SVG and as GeoJSON into temporary files."""
+    from map_export import save_geojson, save_svg
+
+    visits = _random_visits(stops)
+    row: Dict[str, float] = {"stops": stops}
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        save_svg(visits, Path(directory) / "journey.svg")
+        row["svg_seconds"] = time.perf_counter() - started
+        started = time.perf_counter()
+        save_geojson([visits], Path(directory) / "journey.geojson")
+        row["geojson_seconds"] = time.perf_counter() - started
+    return row
+
+
+def bench_validation(node_count: int) -> Dict[str, float]:
+    """Validate a synthetic JSONL story, then again with the cached result."""
+    from story_files import JsonlStory, export_story
+    from story_validator import validate_cached
+
+    row: Dict[str, float] = {"nodes": node_count}
+    with tempfile.TemporaryDirectory() as directory:
+        content = export_story(synthetic_graph(node_count), Path(directory) / "story.jsonl")
+        story = JsonlStory(content)
+        for label in ["full", "cached"]:
+            started = time.perf_counter()
+            problems = validate_cached(story, content, Path(directory) / "cache")
+            row[f"{label}_seconds"] = time.perf_counter() - started
+        row["problems"] = len(problems)
+    return row
+
+
+def bench_reload(node_count: int) -> Dict[str, float]:
+    """Edit one node of a synthetic JSONL story and time the watcher picking it up."""
+    from story_files import export_story, node_to_json
+    from story_reload import StoryWatcher
+
+    graph = synthetic_graph(node_count)
+    row: Dict[str, float] = {"nodes": node_count}
+    previous = travel_story.STORY_GRAPH
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            content = export_story(graph, Path(directory) / "story.jsonl")
+            started = time.perf_counter()
+            watcher = StoryWatcher(content)
+            row["load_seconds"] = time.perf_counter() - started
+            middle = graph[f"node_{node_count // 2}"]
+            edited = dataclasses.replace(middle, description=middle.description + " Edited.")
+            text = content.read_text(encoding="utf-8")
+            content.write_text(text.replace(node_to_json(middle), node_to_json(edited), 1), encoding="utf-8")
+            report = watcher.poll()
+            row["reload_seconds"] = report.seconds
+            row["updated"] = len(report.updated)
+    finally:
+        travel_story.use_story_graph(previous)
+    return row
+
+
+SEARCH_QUERIES = ["stop 4242", "onward", "choice 3 stop", "synth road", "node_99999", "no such word"]
+
+
+def bench_search(node_count: int) -> Dict[str, float]:
+    """Build the full-text index of a synthetic story, then time keyword queries on it."""
+    from story_search import SearchIndex, build_search_index
+
+    graph = synthetic_graph(node_count)
+    row: Dict[str, float] = {"nodes": node_count}
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        path = build_search_index(graph, Path(directory) / "search.bin")
+        row["build_seconds"] = time.perf_counter() - started
+        row["index_mb"] = path.stat().st_size / 2**20
+        index = SearchIndex(path)
+        for query in SEARCH_QUERIES:
+            row[f"query_ms[{query}]"] = 1000 / _rate(lambda: index.search(query), 200)
+        del index
+    return row
+
+
+def _random_places(count: int, seed: int = 0) -> List:
+    """Places spread evenly over the globe."""
+    rng = random.Random(seed)
+    return [
+        (f"Place {index}", math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180))
+        for index in range(count)
+    ]
+
+
+def bench_spatial(place_count: int, queries: int = 100_000) -> Dict[str, float]:
+    """Build a spatial index over random places, reload it from disk and time nearest and radius queries."""
+    from spatial_index import SpatialIndex
+
+    places = _random_places(place_count)
+    row: Dict[str, float] = {"places": place_count}
+    started = time.perf_counter()
+    index = SpatialIndex(places)
+    row["build_seconds"] = time.perf_counter() - started
+    with tempfile.TemporaryDirectory() as scratch:
+        path = index.save(Path(scratch) / "places.bin")
+        del index
+        started = time.perf_counter()
+        index = SpatialIndex.load(path)
+        row["load_seconds"] = time.perf_counter() - started
+    points = [(lat, lon) for _, lat, lon in _random_places(queries, seed=1)]
+    for label, query, count in [
+        ("nearest", lambda lat, lon: index.nearest(lat, lon), queries),
+        ("nearest_5", lambda lat, lon: index.nearest(lat, lon, 5), queries // 10),
+        ("within_50km", lambda lat, lon: index.within(lat, lon, 50), queries // 10),
+    ]:
+        started = time.perf_counter()
+        for lat, lon in points[:count]:
+            query(lat, lon)
+        row[f"{label}_per_second"] = count / (time.perf_counter() - started)
+    return row
+
+
+def bench_planner(node_count: int, lookups: int = 20_000) -> Dict[str, float]:
+    """Time the next-hop table build, then hints from the table against A* and BFS per request."""
+    from route_planner import NextHopTable, RoutePlanner
+
+    graph = synthetic_graph(node_count)
+    row: Dict[str, float] = {"nodes": node_count}
+    started = time.perf_counter()
+    planner = RoutePlanner(graph)
+    table = NextHopTable.build(planner)
+    row["build_seconds"] = time.perf_counter() - started
+    rng = random.Random(0)
+    node_ids = list(graph)
+    pairs = [(rng.choice(node_ids), rng.choice(node_ids)) for _ in range(lookups)]
+    for label, hint, count in [
+        ("table", lambda source, target: table.hint(source, target), lookups),
+        ("astar", planner.shortest_km, lookups // 100),
+        ("bfs", planner.fewest_choices, lookups // 100),
+    ]:
+        started = time.perf_counter()
+        for source, target in pairs[:count]:
+            hint(source, target)
+        row[f"{label}_us"] = (time.perf_counter() - started) / count * 1e6
+    return row
+
+
+def bench_predecessors(node_count: int, edits: int = 1_000) -> Dict[str, float]:
+    """Time building the predecessor index against updating it per edited node, then the graph queries."""
+    from story_analysis import PredecessorIndex, build_index, can_reach, immediate_dominators
+
+    graph = synthetic_graph(node_count)
+    row: Dict[str, float] = {"nodes": node_count}
+    started = time.perf_counter()
+    predecessors = PredecessorIndex(graph)
+    row["build_seconds"] = time.perf_counter() - started
+    rng = random.Random(0)
+    node_ids = list(graph)
+    changed = []
+    for _ in range(edits):
+        node = graph[rng.choice(node_ids)]
+        changed.append(dataclasses.replace(node, options=node.options[::-1]))
+    started = time.perf_counter()
+    for node in changed:
+        predecessors.add_node(node)
+    row["update_us"] = (time.perf_counter() - started) / edits * 1e6
+    index = build_index(graph)
+    started = time.perf_counter()
+    can_reach(index, node_ids[-1])
+    row["can_reach_seconds"] = time.perf_counter() - started
+    started = time.perf_counter()
+    immediate_dominators(index)
+    row["dominators_seconds"] = time.perf_counter() - started
+    return row
+
+
+def _random_visits(stops: int, seed: int = 0) -> List:
+    rng = random.Random(seed)
+    return [rng.choice(PLACES) for _ in range(stops)]
+
+
+def _rate(operation: Callable[[], object], repeat: int) -> float:
+    """Operations per second for ``operation``, best of three runs."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            operation()
+        best = min(best, time.perf_counter() - started)
+    return repeat / best
+
+
+def _graph_metrics(label: str, graph, results: Dict[str, Dict], seed: int = 0) -> None:
+    """Traversal and formatting throughput with ``graph`` swapped in as the live story."""
+    from array import array
+
+    from locations import JOURNEY_TYPECODE
+
+    previous = travel_story.use_story_graph(graph)
+    try:
+        rng = random.Random(seed)
+        node_ids = list(graph)
+        lookups = [rng.choice(node_ids) for _ in range(4096)]
+        position = iter(range(1 << 62))
+
+        def get_node() -> None:
+            travel_story.get_node(lookups[next(position) & 4095])
+
+        nodes = [travel_story.get_node(node_id) for node_id in lookups[:256]]
+
+        def describe_node() -> None:
+            travel_story.describe_node(nodes[next(position) & 255])
+
+        options = [option for node in nodes for option in node.options]
+        journey = array(JOURNEY_TYPECODE)
+
+        def record_location() -> None:
+            if len(journey) > 10_000:
+                del journey[:]
+            travel_story.record_location(options[next(position) % len(options)], journey)
+
+        def playthrough() -> None:
+            session = travel_story.Session(0, travel_story.get_start_node_id())
+            for _ in range(20):
+                session.choose(rng.randrange(len(travel_story.get_node(session.node_id).options)))
+
+        operations = [
+            ("get_node", get_node, 20_000, "ops/s"),
+            ("describe_node", describe_node, 20_000, "ops/s"),
+            ("record_location", record_location, 50_000, "ops/s"),
+            ("playthrough_20_choices", playthrough, 2_000, "playthroughs/s"),
+        ]
+        if hasattr(graph, "node_at"):
+            # Decodes from the mmap on every call: the cost of a node-cache miss.
+            indices = [rng.randrange(len(graph)) for _ in range(4096)]
+
+            def node_at_cold() -> None:
+                graph.node_at(indices[next(position) & 4095])
+
+            operations.append(("node_at_cold", node_at_cold, 20_000, "ops/s"))
+        for name, operation, repeat, unit in operations:
+            results[f"{label}.{name}"] = {"value": _rate(operation, repeat), "unit": unit, "better": "higher"}
+    finally:
+        travel_story.use_story_graph(previous)
+
+
+def _turtle_seconds(mode: str, stops: int):
+    """Interactive draw time in a fresh process, or None when there is no display."""
+    try:
+        return _measure(mode, str(stops))[0]
+    except subprocess.CalledProcessError:
+        return None
+
+
+def run_suite(synthetic_sizes: List[int], map_stops: List[int]) -> Dict:
+    """Run every benchmark and return a JSON-ready result document."""
+    from story_compiler import CompiledStory, compile_story
+
+    results: Dict[str, Dict] = {}
+    import_times = [_measure_import() for _ in range(5)]
+    results["real.import_travel_story"] = {"value": statistics.median(import_times), "unit": "s", "better": "lower"}
+    _graph_metrics("real", travel_story.STORY_GRAPH, results)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        for size in synthetic_sizes:
+            compiled = Path(scratch) / f"story-{size}.bin"
+            compile_story(synthetic_graph(size), compiled)
+            load_times = [_measure("mmap", str(compiled))[0] for _ in range(3)]
+            results[f"synthetic_{size}.load_story"] = {"value": statistics.median(load_times), "unit": "s", "better": "lower"}
+            _graph_metrics(f"synthetic_{size}", CompiledStory(compiled), results)
+
+    from raster_map import render_map
+
+    for stops in map_stops:
+        visits = _random_visits(stops)
+        results[f"map.raster_png_{stops}_stops"] = {
+            "value": 1 / _rate(lambda: render_map(visits).to_png(), 10), "unit": "s", "better": "lower",
+        }
+        for mode, label in [("map", "turtle_draw"), ("map-fast", "turtle_fast_draw")]:
+            results[f"map.{label}_{stops}_stops"] = {"value": _turtle_seconds(mode, stops), "unit": "s", "better": "lower"}
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare_results(old: Dict, new: Dict, threshold: float) -> List[str]:
+    """Describe every metric that got worse by more than ``threshold`` (0.1 = 10%).
+
+    A metric the baseline measured that is missing or has no value in ``new`` counts too,
+    so a benchmark that broke or was dropped doesn't pass as unchanged.
+    """
+    regressions = []
+    for name, before in old["results"].items():
+        if before["value"] is None:
+            continue
+        after = new["results"].get(name)
+        if after is None or after["value"] is None:
+            state = "missing" if after is None else "no value"
+            regressions.append(f"{name}: {before['value']:.6g} {before['unit']} -> {state}")
+            continue
+        if not before["value"]:
+            continue
+        change = (after["value"] - before["value"]) / before["value"]
+        if after["better"] == "higher":
+            change = -change
+        if change > threshold:
+            regressions.append(
+                f"{name}: {before['value']:.6g} -> {after['value']:.6g} {after['unit']} ({change:+.1%} worse)"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", nargs="?", choices=["suite", "compare", "story", "journeys", "journal", "basemap", "turtle", "labels", "routes", "arcs", "projections", "heatmap", "export", "validate", "reload", "search", "spatial", "planner", "predecessors"], default="suite")
+    parser.add_argument("files", nargs="*", help="for compare: the baseline and new result files")
+    parser.add_argument("--sizes", type=int, nargs="+", default=None)
+    parser.add_argument("-o", "--output", default=None, help="suite: write JSON here instead of stdout")
+    parser.add_argument("--threshold", type=float, default=0.10, help="compare: allowed slowdown, 0.10 = 10%%")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(*args.child)
+        return
+
+    if args.benchmark == "suite":
+        document = json.dumps(run_suite(args.sizes or [10_000, 100_000], [10, 100]), indent=2)
+        if args.output:
+            Path(args.output).write_text(document + "\n")
+        else:
+            print(document)
+        return
+
+    if args.benchmark == "compare":
+        if len(args.files) != 2:
+            parser.error("compare needs a baseline and a new result file")
+        old, new = (json.loads(Path(name).read_text()) for name in args.files)
+        regressions = compare_results(old, new, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+        return
+
+    if args.benchmark == "labels":
+        for size in args.sizes or [1_000, 10_000]:
+            row = bench_labels(size)
+            print(f"{row['labels']} labels: placed {row['placed']} in {row['seconds'] * 1000:.1f} ms")
+        return
+
+    if args.benchmark == "planner":
+        for size in args.sizes or [500, 2_000]:
+            row = bench_planner(size)
+            print(
+                f"{size} nodes: tables built in {row['build_seconds']:.1f} s; hint {row['table_us']:.2f} us "
+                f"from the table, {row['astar_us']:.0f} us by A*, {row['bfs_us']:.0f} us by BFS"
+            )
+        return
+
+    if args.benchmark == "predecessors":
+        for size in args.sizes or [10_000, 100_000]:
+            row = bench_predecessors(size)
+            print(
+                f"{size} nodes: index built in {row['build_seconds']:.2f} s, updated in {row['update_us']:.1f} us "
+                f"per edited node; backward reachability {row['can_reach_seconds'] * 1000:.0f} ms, "
+                f"dominators {row['dominators_seconds'] * 1000:.0f} ms"
+            )
+        return
+
+    if args.benchmark == "spatial":
+        for size in args.sizes or [100_000, 1_000_000]:
+            row = bench_spatial(size)
+            print(
+                f"{size} places: built in {row['build_seconds']:.1f} s, loaded in {row['load_seconds']:.1f} s; "
+                f"{row['nearest_per_second']:,.0f} nearest/s, {row['nearest_5_per_second']:,.0f} nearest-5/s, "
+                f"{row['within_50km_per_second']:,.0f} within-50km/s"
+            )
+        return
+
+    if args.benchmark == "search":
+        for size in args.sizes or [100_000, 1_000_000]:
+            row = bench_search(size)
+            print(f"{size} nodes: index built in {row['build_seconds']:.1f} s, {row['index_mb']:.1f} MB")
+            for query in SEARCH_QUERIES:
+                print(f"  {query!r}: {row[f'query_ms[{query}]']:.3f} ms")
+        return
+
+    if args.benchmark == "reload":
+        for size in args.sizes or [10_000, 100_000]:
+            row = bench_reload(size)
+            print(
+                f"{size} nodes: {row['load_seconds'] * 1000:.1f} ms to load, "
+                f"{row['reload_seconds'] * 1000:.1f} ms to reload {row['updated']} edited node"
+            )
+        return
+
+    if args.benchmark == "validate":
+        for size in args.sizes or [10_000, 100_000]:
+            row = bench_validation(size)
+            print(
+                f"{size} nodes: {row['full_seconds'] * 1000:.1f} ms to validate, "
+                f"{row['cached_seconds'] * 1000:.2f} ms cached ({row['problems']} problems)"
+            )
+        return
+
+    if args.benchmark == "export":
+        for stops in args.sizes or [1_000, 1_000_000]:
+            row = bench_export(stops)
+            print(f"{stops} stops: SVG {row['svg_seconds']:.3f} s, GeoJSON {row['geojson_seconds']:.3f} s")
+        return
+
+    if args.benchmark == "heatmap":
+        for size in args.sizes or [100_000, 1_000_000]:
+            row = bench_heatmap(size)
+            print(
+                f"{row['journeys']} journeys: {row['seconds']:.2f} s "
+                f"({row['journeys_per_second']:.0f}/s), peak RSS {row['peak_rss_kb'] / 1024:.0f} MB"
+            )
+        return
+
+    if args.benchmark == "projections":
+        for name, row in bench_projections().items():
+            print(f"{name:>16}: {row['first_seconds'] * 1000:.2f} ms first, {row['cached_seconds'] * 1e6:.1f} us cached")
+        return
+
+    if args.benchmark == "arcs":
+        row = bench_arcs()
+        print(f"{row['legs']} legs: {row['cold_seconds'] * 1e6:.1f} us first time, {row['cached_seconds'] * 1e6:.2f} us cached")
+        return
+
+    if args.benchmark == "routes":
+        print(f"{'steps':>8} {'legs':>6} {'per step s':>11} {'aggregated s':>13}")
+        for steps in args.sizes or [1_000, 100_000]:
+            row = bench_routes(steps)
+            print(f"{steps:>8} {row['distinct_legs']:>6} {row['naive_seconds']:>11.3f} {row['aggregated_seconds']:>13.3f}")
+        return
+
+    if args.benchmark == "turtle":
+        print(f"{'stops':>6} {'turtle s':>10} {'fast s':>10}")
+        for stops in args.sizes or [10, 100, 1_000]:
+            pens, fast = _turtle_seconds("map", stops), _turtle_seconds("map-fast", stops)
+            if pens is None or fast is None:
+                print("Turtle needs a display; run this from a desktop session or under xvfb-run -a.")
+                return
+            print(f"{stops:>6} {pens:>10.3f} {fast:>10.3f}")
+        return
+
+    if args.benchmark == "basemap":
+        for size in args.sizes or [10_000]:
+            row = bench_base_layer(size)
+            print(
+                f"{row['journeys']} maps: {row['redraw_ms_per_map']:.2f} ms/map redrawing the base, "
+                f"{row['cached_ms_per_map']:.2f} ms/map with the cached base layer"
+            )
+        return
+
+    if args.benchmark == "journal":
+        for size in args.sizes or [500_000]:
+            row = bench_journal_writes(size)
+            print(
+                f"{row['choices']} choices: {row['writes_per_second']:,.0f} writes/s, "
+                f"recover all {row['recover_seconds']:.3f}s, resume one {row['resume_one_seconds'] * 1000:.2f} ms"
+            )
+        return
+
+    if args.benchmark == "journeys":
+        print(f"{'journeys':>10} {'stops':>6} {'tuples MB':>10} {'ids MB':>10}")
+        for size in args.sizes or [1_000_000]:
+            row = bench_journey_storage(size)
+            print(f"{row['journeys']:>10} {row['stops']:>6} {row['tuple_mb']:>10.1f} {row['compact_mb']:>10.1f}")
+        return
+
+    print(f"{'nodes':>10} {'dict s':>10} {'dict MB':>10} {'mmap s':>10} {'mmap MB':>10}")
+    for row in bench_compiled_story(args.sizes or [1_000, 100_000, 1_000_000]):
+        print(
+            f"{row['nodes']:>10} {row['dict_seconds']:>10.4f} {row['dict_rss_mb']:>10.1f} "
+            f"{row['mmap_seconds']:>10.4f} {row['mmap_rss_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Host the adventure for many players over a telnet-style line protocol.
+
+Each connection gets the same node/choice flow as ``main.play_adventure``: the server
+sends ``describe_node`` output followed by the ``Your choice: `` prompt and reads one
+line per choice. Run ``python game_server.py --port 7777`` and connect with
+``telnet localhost 7777`` or ``nc localhost 7777``.
+"""
+from pathlib import Path
+from typing import Optional
+import argparse
+import asyncio
+import itertools
+import threading
+
+from journal import Journal
+from locations import location_table
+from route_planner import MAX_TABLE_NODES, live_planner, live_table, next_choice
+from story_reload import ReloadReport, StoryWatcher, migrate_sessions
+from story_search import live_index, resolve_node
+from story_validator import check_story
+from travel_story import (
+    Session,
+    StoryNode,
+    describe_node,
+    get_node,
+    get_start_node_id,
+    parse_choice,
+    story_generation,
+)
+from trip_stats import format_stats, journey_stats
+
+PROMPT = "Your choice: "
+NAME_PROMPT = "What's your name? "
+
+
+def _lines(text: str) -> bytes:
+    return text.replace("\n", "\r\n").encode("utf-8")
+
+
+class GameServer:
+    def __init__(self, idle_timeout: float = 300.0, journal: Optional[Journal] = None) -> None:
+        self.idle_timeout = idle_timeout
+        self.journal = journal
+        self.sessions = {}
+        # Sessions recovered from the journal wait here until their player reconnects.
+        self.resumable = journal.recover() if journal else {}
+        # Continue after every id the journal has seen, finished sessions included.
+        self._ids = itertools.count((journal.last_session_id if journal else 0) + 1)
+
+    async def _read_line(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[str]:
+        """Wait for one line, or return None when the player disconnects or goes idle.
+
+        A line longer than the reader's limit is discarded and read as an empty line.
+        """
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            writer.write(_lines("\nSession closed after being idle.\n"))
+            return None
+        except ConnectionError:
+            return None
+        except ValueError:
+            return ""
+        if not line:
+            return None
+        return line.decode("utf-8", errors="replace")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session = Session(next(self._ids), get_start_node_id())
+        self.sessions[session.session_id] = session
+        finished = False
+        try:
+            writer.write(_lines(NAME_PROMPT))
+            await writer.drain()
+            name = await self._read_line(reader, writer)
+            if name is None:
+                return
+            name = name.strip() or "Spartan"
+            resumed = self._resume(name)
+            if resumed is not None:
+                del self.sessions[session.session_id]
+                session = self.sessions[resumed.session_id] = resumed
+                writer.write(_lines(f"\nWelcome back! Picking up session {session.session_id} where you left off.\n"))
+            else:
+                writer.write(_lines(
+                    f"\nWelcome, {name}! Each choice takes you somewhere new. Type 'quit' anytime to end.\n"
+                ))
+                if self.journal:
+                    code = self.journal.resume_code(session.session_id)
+                    writer.write(_lines(f"To continue later, type 'resume {code}' at the name prompt.\n"))
+            while True:
+                generation = story_generation()
+                node = self._current_node(session)
+                writer.write(_lines(describe_node(node) + "\n" + PROMPT))
+                await writer.drain()
+                while True:
+                    raw = await self._read_line(reader, writer)
+                    if raw is None:
+                        return
+                    command, _, keyword = raw.strip().partition(" ")
+                    if command.lower() == "hint" and keyword.strip():
+                        answer = await asyncio.to_thread(self._hint, session.node_id, keyword.strip())
+                        writer.write(_lines(answer + "\n" + PROMPT))
+                        await writer.drain()
+                        continue
+                    try:
+                        choice = parse_choice(raw, len(node.options))
+                        break
+                    except ValueError:
+                        writer.write(_lines("Please enter a valid option number or type 'quit' to finish.\n" + PROMPT))
+                        await writer.drain()
+                if choice is None:
+                    break
+                # Lazily loaded stories hand out a fresh node object after evicting one, so
+                # only a story swap can change the node, and only if its content changed.
+                if story_generation() != generation and self._current_node(session) != node:
+                    writer.write(_lines("\nThe story was just updated, so here is where you stand now.\n"))
+                    continue
+                if self.journal:
+                    self.journal.append(session.session_id, session.node_id, choice)
+                session.choose(choice)
+            finished = True
+
+            places = ", ".join(name for name, _, _ in location_table().decode(session.journey))
+            # A journey reaching new places grows the distance matrix, so keep it off the loop.
+            stats = await asyncio.to_thread(journey_stats, session.journey)
+            writer.write(_lines(f"\nYou traveled to: {places}\n{format_stats(stats)}\n"))
+        except ConnectionError:
+            # The player dropped mid-turn; an unfinished session stays resumable below.
+            pass
+        finally:
+            del self.sessions[session.session_id]
+            if self.journal:
+                if finished:
+                    self.journal.end_session(session.session_id)
+                elif len(session.journey) > 1:
+                    self.resumable[session.session_id] = session
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def _current_node(self, session: Session) -> StoryNode:
+        """The session's node in the live story; back to the start if a reload removed it."""
+        migrate_sessions([session])
+        return get_node(session.node_id)
+
+    def _hint(self, here: str, keyword: str) -> str:
+        """Answer ``hint <keyword>``: which option to pick to head for a matching node.
+
+        Searches and may load indexes, so call it off the event loop.
+        """
+        target = resolve_node(keyword)
+        if target is None:
+            return f"No story node mentions {keyword!r}."
+        title = get_node(target).title
+        if target == here:
+            return f"You're already at {title}."
+        # Until the hint table for this story is ready, search instead of building it here.
+        shortest = next_choice(here, target, "km", build_table=False)
+        fewest = next_choice(here, target, "choices", build_table=False)
+        if shortest is None:
+            return f"There's no way to {title} from here."
+        if fewest == shortest:
+            return f"To reach {title}, type {shortest}."
+        return f"To reach {title}, type {shortest} for the shortest trip or {fewest} for the fewest choices."
+
+    def story_reloaded(self, report: ReloadReport) -> None:
+        print(report.summary())
+        if report.applied:
+            moved = migrate_sessions(itertools.chain(self.sessions.values(), self.resumable.values()))
+            if moved:
+                print(f"Moved {len(moved)} sessions on removed nodes back to the start")
+
+    def _resume(self, name: str) -> Optional[Session]:
+        """Handle ``resume <code>`` typed at the name prompt."""
+        command, _, code = name.partition(" ")
+        if command.lower() != "resume" or not self.journal:
+            return None
+        session_id = self.journal.session_for_code(code.strip())
+        if session_id is None:
+            return None
+        return self.resumable.pop(session_id, None)
+
+
+def _prepare_hints() -> None:
+    """Build the search index and hint table for the live story, so every ``hint`` is a lookup."""
+    live_index()
+    if len(live_planner().node_ids) <= MAX_TABLE_NODES:
+        live_table()
+
+
+def _prepare_hints_in_background() -> None:
+    """Run ``_prepare_hints`` in a daemon thread; hints are searched for until it finishes."""
+    threading.Thread(target=_prepare_hints, name="hint-tables", daemon=True).start()
+
+
+async def _watch_story(watcher: StoryWatcher, game: GameServer) -> None:
+    """Poll the story source off the event loop and apply edits between turns."""
+    while True:
+        await asyncio.sleep(watcher.interval)
+        report = await asyncio.to_thread(watcher.poll)
+        if report is not None:
+            game.story_reloaded(report)
+            if report.applied:
+                _prepare_hints_in_background()
+
+
+async def _maintain_journal(journal: Journal, compact_bytes: int) -> None:
+    """Group-commit buffered choices off the event loop and compact a growing journal."""
+    while True:
+        await asyncio.to_thread(journal.commit_due)
+        if journal.journal_bytes() > compact_bytes:
+            await asyncio.to_thread(journal.compact)
+
+
+def _raise_open_file_limit() -> None:
+    """Idle players each hold a socket, so allow as many as the hard limit permits."""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def serve(
+    host: str, port: int, idle_timeout: float, journal_dir: Optional[Path] = None, watch: bool = False
+) -> None:
+    check_story()
+    _prepare_hints_in_background()
+    _raise_open_file_limit()
+    journal = Journal(journal_dir) if journal_dir else None
+    game = GameServer(idle_timeout, journal)
+    server = await asyncio.start_server(game.handle, host, port, backlog=4096)
+    print(f"Serving the travel adventure on {host}:{port}")
+    if journal:
+        print(f"Journaling choices to {journal_dir}; {len(game.resumable)} sessions can be resumed")
+        maintenance = asyncio.create_task(_maintain_journal(journal, 64 * 2**20))
+    if watch:
+        watcher = StoryWatcher()
+        print(f"Watching {watcher.source.path} for story edits")
+        watching = asyncio.create_task(_watch_story(watcher, game))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watch:
+            watching.cancel()
+        if journal:
+            maintenance.cancel()
+            journal.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the adventure to many players at once.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--idle-timeout", type=float, default=300.0, help="seconds before an idle player is dropped")
+    parser.add_argument("--journal", type=Path, default=None, help="directory for the crash-safe choice journal")
+    parser.add_argument("--watch", action="store_true", help="reload story edits without restarting")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.idle_timeout, args.journal, args.watch))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
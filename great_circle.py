@@ -0,0 +1,122 @@
+"""Great-circle arcs for drawing route legs on the flat lon/lat map.
+
+A leg is the shortest path between its two places on the globe, sampled every few
+degrees and split where it crosses the 180th meridian so it doesn't streak across the
+map. Arcs are cached per pair of places; the story only has a fixed set of legs, so
+``precompute_arcs`` can fill the cache for all of them up front.
+"""
+from functools import lru_cache
+from typing import Iterable, List, Mapping, Optional, Set, Tuple
+import math
+
+Coordinate = Tuple[str, float, float]
+Point = Tuple[float, float]
+Polyline = Tuple[Point, ...]
+
+# One arc sample per this many degrees of travel around the globe.
+ARC_STEP_DEGREES = 2.0
+ARC_CACHE_SIZE = 16_384
+
+
+def _unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    lat, lon = math.radians(lat), math.radians(lon)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def interpolate_arc(start: Point, end: Point, step_degrees: float = ARC_STEP_DEGREES) -> List[Point]:
+    """``(lon, lat)`` samples along the great circle from ``start`` to ``end`` (both lon/lat).
+
+    Longitudes are left in -180..180, so the result may jump across the dateline.
+    """
+    (lon0, lat0), (lon1, lat1) = start, end
+    x0, y0, z0 = _unit_vector(lat0, lon0)
+    x1, y1, z1 = _unit_vector(lat1, lon1)
+    cross = math.sqrt((y0 * z1 - z0 * y1) ** 2 + (z0 * x1 - x0 * z1) ** 2 + (x0 * y1 - y0 * x1) ** 2)
+    angle = math.atan2(cross, x0 * x1 + y0 * y1 + z0 * z1)
+    segments = math.ceil(math.degrees(angle) / step_degrees)
+    # Antipodes have no single shortest path; a straight line is as good as any.
+    if segments <= 1 or cross < 1e-9:
+        return [start, end]
+    points = [start]
+    for step in range(1, segments):
+        fraction = step / segments
+        a = math.sin((1 - fraction) * angle) / cross
+        b = math.sin(fraction * angle) / cross
+        x, y, z = a * x0 + b * x1, a * y0 + b * y1, a * z0 + b * z1
+        points.append((math.degrees(math.atan2(y, x)), math.degrees(math.asin(max(-1.0, min(1.0, z))))))
+    points.append(end)
+    return points
+
+
+def split_at_dateline(points: List[Point]) -> List[Polyline]:
+    """Break a polyline wherever it crosses the 180th meridian, ending both sides on it."""
+    pieces = []
+    current = [points[0]]
+    for (lon0, lat0), (lon1, lat1) in zip(points, points[1:]):
+        if abs(lon1 - lon0) > 180:
+            edge = 180.0 if lon0 > 0 else -180.0
+            unwrapped = lon1 + 360 if lon0 > 0 else lon1 - 360
+            lat = lat0 + (lat1 - lat0) * (edge - lon0) / (unwrapped - lon0)
+            current.append((edge, lat))
+            pieces.append(tuple(current))
+            current = [(-edge, lat)]
+        current.append((lon1, lat1))
+    pieces.append(tuple(current))
+    return pieces
+
+
+@lru_cache(maxsize=ARC_CACHE_SIZE)
+def _pair_arc(start: Point, end: Point) -> Tuple[Polyline, ...]:
+    return tuple(split_at_dateline(interpolate_arc(start, end)))
+
+
+def leg_arc(start: Coordinate, end: Coordinate) -> Tuple[Polyline, ...]:
+    """The ``(lon, lat)`` polylines to draw for a leg between two places.
+
+    Cached per unordered pair, so a leg traveled in both directions is computed once.
+    """
+    first, second = (start[2], start[1]), (end[2], end[1])
+    if second < first:
+        return tuple(piece[::-1] for piece in reversed(_pair_arc(second, first)))
+    return _pair_arc(first, second)
+
+
+def story_legs(graph: Mapping, start: Optional[Coordinate] = None) -> Set[Tuple[Coordinate, Coordinate]]:
+    """Legs a player can travel: from a choice's place to a place offered next.
+
+    Legs that pass through a choice with no place aren't listed; ``leg_arc`` still
+    computes those on first use.
+    """
+    legs = set()
+
+    def add(origin: Optional[Coordinate], options: Iterable) -> None:
+        if origin is None:
+            return
+        for option in options:
+            if option.location is not None and option.location != origin:
+                legs.add((origin, option.location))
+
+    if start is not None and graph:
+        from travel_story import get_start_node_id
+
+        add(start, graph[get_start_node_id()].options)
+    for node in graph.values():
+        for option in node.options:
+            following = graph.get(option.next_id)
+            if following is not None:
+                add(option.location, following.options)
+    return legs
+
+
+def precompute_arcs(graph: Optional[Mapping] = None) -> int:
+    """Fill the arc cache for every leg in the story; returns how many legs there are."""
+    if graph is None:
+        from travel_story import START_LOCATION, STORY_GRAPH
+
+        graph, start = STORY_GRAPH, START_LOCATION
+    else:
+        start = None
+    legs = story_legs(graph, start)
+    for origin, destination in legs:
+        leg_arc(origin, destination)
+    return len(legs)
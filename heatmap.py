@@ -0,0 +1,240 @@
+"""Aggregate heatmap of where many players traveled.
+
+Journeys are streamed in chunks and tallied into counts of places and legs; the story
+has a limited set of places, so the tally stays small however many journeys go in.
+Chunks are tallied across worker processes and the partial tallies are merged as they
+finish. The merged tally is then binned into a density grid (each leg along its
+great-circle arc) and drawn over the raster base map.
+
+    python replay.py choices.txt -o journeys.jsonl
+    python heatmap.py journeys.jsonl -o heatmap.png --workers 4
+"""
+from array import array
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import json
+import math
+
+from locations import as_locations
+from projections import PROJECTIONS, Projection, make_projection, projected_leg, projected_places
+from raster_map import RasterCanvas, base_layer, parse_color
+
+Coordinate = Tuple[str, float, float]
+
+# Density runs from cool to hot; low-density cells are mostly see-through.
+HEAT_STOPS = [(0.0, "#2c7bb6"), (0.5, "#ffffbf"), (1.0, "#d7191c")]
+MIN_ALPHA = 0.35
+# Leg arcs are sampled this many times per cell they cross, so no cell is skipped.
+SAMPLES_PER_CELL = 2
+# Cells this far either side of an arc also count it, so thin routes stay visible.
+SPREAD = 1
+
+
+@dataclass
+class JourneyTally:
+    """How many journeys visited each place and traveled each (directed) leg."""
+
+    journeys: int = 0
+    places: Counter = field(default_factory=Counter)
+    legs: Counter = field(default_factory=Counter)
+
+    def add(self, visits: Sequence[Coordinate]) -> None:
+        self.journeys += 1
+        self.places.update(visits)
+        self.legs.update(zip(visits, visits[1:]))
+
+    def merge(self, other: "JourneyTally") -> "JourneyTally":
+        self.journeys += other.journeys
+        self.places.update(other.places)
+        self.legs.update(other.legs)
+        return self
+
+
+def _tally_chunk(chunk: List) -> JourneyTally:
+    """Tally a chunk of journeys: ``replay.py`` JSON lines, location lists or id arrays."""
+    tally = JourneyTally()
+    for journey in chunk:
+        if isinstance(journey, str):
+            if not journey.strip():
+                continue
+            journey = [tuple(place) for place in json.loads(journey)["places"]]
+        tally.add(as_locations(journey))
+    return tally
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def tally_journeys(journeys: Iterable, workers: int = 1, chunk_size: int = 10_000) -> JourneyTally:
+    """Tally every journey in ``journeys``, reading at most a few chunks ahead.
+
+    With ``workers > 1`` chunks are tallied in a process pool; only ``2 * workers``
+    chunks are in flight at once, so memory stays flat for any number of journeys.
+    """
+    total = JourneyTally()
+    chunks = _chunks(journeys, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            total.merge(_tally_chunk(chunk))
+        return total
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    total.merge(future.result())
+            # Location ids only mean something in this process's table, so send the places.
+            chunk = [as_locations(journey) if isinstance(journey, array) else journey for journey in chunk]
+            pending.add(pool.submit(_tally_chunk, chunk))
+        for future in pending:
+            total.merge(future.result())
+    return total
+
+
+def read_lines(paths: Iterable[Path]) -> Iterator[str]:
+    """Stream the lines of each file in turn."""
+    for path in paths:
+        with open(path, encoding="utf-8") as handle:
+            yield from handle
+
+
+class DensityGrid:
+    """Per-pixel travel density for one output size and projection."""
+
+    def __init__(self, width: int, height: int, projection: Projection) -> None:
+        self.width = width
+        self.height = height
+        self.projection = projection
+        self.bounds = projection.view_bounds(width, height)
+        self.cells = array("d", bytes(8 * width * height))
+        west, south, east, north = self.bounds
+        self._x_scale = width / (east - west)
+        self._y_scale = height / (north - south)
+        self._leg_cells: Dict[Tuple[Coordinate, Coordinate], Tuple[int, ...]] = {}
+
+    def cell_of(self, x: float, y: float) -> Optional[int]:
+        west, _, _, north = self.bounds
+        column = int((x - west) * self._x_scale)
+        row = int((north - y) * self._y_scale)
+        if 0 <= column < self.width and 0 <= row < self.height:
+            return row * self.width + column
+        return None
+
+    def _brush(self, cell: int) -> Iterator[int]:
+        row, column = divmod(cell, self.width)
+        for near_row in range(max(0, row - SPREAD), min(self.height, row + SPREAD + 1)):
+            for near_column in range(max(0, column - SPREAD), min(self.width, column + SPREAD + 1)):
+                yield near_row * self.width + near_column
+
+    def leg_cells(self, start: Coordinate, end: Coordinate) -> Tuple[int, ...]:
+        """Every cell within ``SPREAD`` of the leg's arc, each listed once; cached per leg."""
+        cells = self._leg_cells.get((start, end))
+        if cells is None:
+            touched = {}
+            for piece in projected_leg(self.projection, start, end):
+                for (x0, y0), (x1, y1) in zip(piece, piece[1:]):
+                    length = math.hypot((x1 - x0) * self._x_scale, (y1 - y0) * self._y_scale)
+                    samples = max(1, math.ceil(length * SAMPLES_PER_CELL))
+                    for sample in range(samples + 1):
+                        fraction = sample / samples
+                        cell = self.cell_of(x0 + (x1 - x0) * fraction, y0 + (y1 - y0) * fraction)
+                        if cell is not None:
+                            touched.update(dict.fromkeys(self._brush(cell)))
+            cells = self._leg_cells[(start, end)] = tuple(touched)
+        return cells
+
+    def add_tally(self, tally: JourneyTally) -> None:
+        cells = self.cells
+        for (start, end), count in tally.legs.items():
+            if start != end:
+                for cell in self.leg_cells(start, end):
+                    cells[cell] += count
+        for place, count in tally.places.items():
+            for _, y, x in projected_places(self.projection, [place]):
+                cell = self.cell_of(x, y)
+                if cell is not None:
+                    for near in self._brush(cell):
+                        cells[near] += count
+
+
+def heat_palette(levels: int = 256) -> List[Tuple[int, int, int, float]]:
+    """``(red, green, blue, alpha)`` for each density level from faint to hottest."""
+    stops = [(position, parse_color(color)) for position, color in HEAT_STOPS]
+    palette = []
+    for level in range(levels):
+        weight = level / (levels - 1)
+        for (low, low_color), (high, high_color) in zip(stops, stops[1:]):
+            if weight <= high:
+                blend = (weight - low) / (high - low)
+                color = [round(a + (b - a) * blend) for a, b in zip(low_color, high_color)]
+                break
+        palette.append((*color, MIN_ALPHA + (1 - MIN_ALPHA) * weight))
+    return palette
+
+
+def render_heatmap(grid: DensityGrid) -> RasterCanvas:
+    """Blend the density grid over the cached base map, on a log scale."""
+    canvas = RasterCanvas(grid.width, grid.height, grid.bounds)
+    canvas.pixels[:] = base_layer(grid.width, grid.height, grid.projection)
+    peak = max(grid.cells, default=0.0)
+    if peak <= 0:
+        return canvas
+    palette = heat_palette()
+    scale = (len(palette) - 1) / math.log1p(peak)
+    pixels = canvas.pixels
+    for cell, value in enumerate(grid.cells):
+        if value:
+            red, green, blue, alpha = palette[int(math.log1p(value) * scale)]
+            offset = cell * 3
+            pixels[offset] += int((red - pixels[offset]) * alpha)
+            pixels[offset + 1] += int((green - pixels[offset + 1]) * alpha)
+            pixels[offset + 2] += int((blue - pixels[offset + 2]) * alpha)
+    return canvas
+
+
+def build_heatmap(
+    journeys: Iterable,
+    width: int = 1000,
+    height: int = 600,
+    projection: str = "equirectangular",
+    workers: int = 1,
+    chunk_size: int = 10_000,
+) -> Tuple[RasterCanvas, JourneyTally]:
+    """Tally ``journeys`` and render their heatmap; returns the canvas and the tally."""
+    tally = tally_journeys(journeys, workers, chunk_size)
+    grid = DensityGrid(width, height, make_projection(projection, list(tally.places)))
+    grid.add_tally(tally)
+    return render_heatmap(grid), tally
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render one heatmap of where every player traveled.")
+    parser.add_argument("journeys", type=Path, nargs="+", help="JSON lines from replay.py")
+    parser.add_argument("-o", "--output", type=Path, default=Path("heatmap.png"))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--projection", choices=list(PROJECTIONS), default="equirectangular")
+    args = parser.parse_args()
+    canvas, tally = build_heatmap(
+        read_lines(args.journeys), args.width, args.height, args.projection, args.workers, args.chunk_size
+    )
+    args.output.write_bytes(canvas.to_png())
+    print(f"Wrote {args.output} from {tally.journeys} journeys over {len(tally.legs)} distinct legs")
+
+
+if __name__ == "__main__":
+    main()
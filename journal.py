@@ -0,0 +1,330 @@
+"""Crash-safe session storage: an append-only choice journal plus periodic snapshots.
+
+Every choice is appended as ``(session id, node id, option index)``. Appends are
+buffered and written with one ``fsync`` per batch (group commit), so a crash can lose
+at most the choices since the last commit. ``compact()`` folds the journal into a
+snapshot of every live session and starts a fresh journal, so resuming a session only
+replays the choices made since the last snapshot.
+
+The journal also remembers the highest session id it has seen, so ids are never reused
+across restarts, and signs resume codes with a key kept next to it, so a player can
+only resume a session they were given the code for.
+"""
+from array import array
+from pathlib import Path
+from typing import Dict, Optional
+import hashlib
+import hmac
+import os
+import secrets
+import struct
+import threading
+import time
+import zlib
+
+import travel_story
+from locations import JOURNEY_TYPECODE, LocationTable, location_table
+from travel_story import START_LOCATION, Session
+
+JOURNAL_NAME = "journal.log"
+SNAPSHOT_NAME = "snapshot.bin"
+KEY_NAME = "resume.key"
+SNAPSHOT_MAGIC = b"TSN2"
+END_OF_SESSION = 0xFF
+
+# crc32 of the rest, session id, option index, node id length; then the node id bytes
+_RECORD = struct.Struct("<IQBH")
+_RECORD_BODY = struct.Struct("<QBH")
+# magic, location count, session count, highest session id ever journaled
+_SNAPSHOT_HEADER = struct.Struct("<4sIIQ")
+# session id, node id length, journey length
+_SNAPSHOT_SESSION = struct.Struct("<QHI")
+_LOCATION = struct.Struct("<Hdd")
+
+
+def _pack_record(session_id: int, node_id: str, option_index: int) -> bytes:
+    encoded = node_id.encode("utf-8")
+    body = _RECORD_BODY.pack(session_id, option_index, len(encoded)) + encoded
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+
+def _iter_records(data: bytes, offset: int = 0):
+    """Yield ``(offset, end, session_id, node_id, option_index)`` up to the first torn record."""
+    while offset + _RECORD.size <= len(data):
+        crc, session_id, option_index, length = _RECORD.unpack_from(data, offset)
+        end = offset + _RECORD.size + length
+        if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+            return
+        yield offset, end, session_id, data[offset + _RECORD.size:end].decode("utf-8"), option_index
+        offset = end
+
+
+def _resume_key(directory: Path) -> bytes:
+    """The secret resume codes are signed with, created on first use."""
+    path = directory / KEY_NAME
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+    key = secrets.token_bytes(32)
+    temporary = path.with_name(path.name + f".{os.getpid()}.tmp")
+    descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(descriptor, "wb") as handle:
+        handle.write(key)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+    return key
+
+
+def _apply(session: Session, node_id: str, option_index: int, table: LocationTable) -> bool:
+    """Replay one choice, interning into ``table``; False if the story no longer has it."""
+    graph = travel_story.STORY_GRAPH
+    # The journal says which node the choice was made on, so trust it over our copy.
+    if node_id not in graph:
+        return False
+    options = graph[node_id].options
+    if option_index >= len(options):
+        return False
+    option = options[option_index]
+    if option.location:
+        session.journey.append(table.intern(option.location))
+    session.node_id = option.next_id
+    return True
+
+
+class Journal:
+    """Append-only choice log for every session, stored in ``directory``."""
+
+    def __init__(self, directory: Path, batch_size: int = 4096, commit_interval: float = 0.05) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self._pending = bytearray()
+        self._pending_count = 0
+        self._last_commit = time.monotonic()
+        self._batch_full = threading.Event()
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._handle = open(self.directory / JOURNAL_NAME, "ab")
+        self._position = self._handle.tell()
+        # Where each session's records live, so one session can be resumed on its own.
+        self._offsets: Dict[int, array] = {}
+        # Replayed and snapshot sessions number places in this private table, not the shared
+        # one, as compaction replays on a background thread. Guarded by ``_write_lock``.
+        self._table = LocationTable()
+        self._snapshot: Dict[int, Session] = {}
+        self._key = _resume_key(self.directory)
+        # The highest session id in the journal or any earlier snapshot; see ``recover``.
+        self.last_session_id = 0
+
+    def append(self, session_id: int, node_id: str, option_index: int) -> None:
+        """Buffer one choice. Never writes, so it is safe on the event loop; see ``commit_due``."""
+        record = _pack_record(session_id, node_id, option_index)
+        with self._buffer_lock:
+            self._offsets.setdefault(session_id, array("Q")).append(
+                self._position + len(self._pending)
+            )
+            self._pending += record
+            self._pending_count += 1
+            self.last_session_id = max(self.last_session_id, session_id)
+            if self._pending_count >= self.batch_size:
+                self._batch_full.set()
+
+    def commit_due(self) -> None:
+        """Wait until a batch is full or ``commit_interval`` has passed, then commit.
+
+        Blocks, so call it from a background thread in a loop.
+        """
+        wait = self.commit_interval - (time.monotonic() - self._last_commit)
+        if self._batch_full.wait(max(0.0, wait)):
+            self._batch_full.clear()
+        self.commit()
+
+    def end_session(self, session_id: int) -> None:
+        """Mark a finished session so compaction drops it."""
+        self.append(session_id, "", END_OF_SESSION)
+
+    def commit(self) -> None:
+        """Write every buffered choice and fsync them as one group."""
+        with self._write_lock:
+            with self._buffer_lock:
+                pending, self._pending = self._pending, bytearray()
+                self._pending_count = 0
+                self._position += len(pending)
+                self._last_commit = time.monotonic()
+            # A background commit_due may finish after close(), which already wrote everything.
+            if pending and not self._handle.closed:
+                self._handle.write(pending)
+                self._handle.flush()
+                os.fsync(self._handle.fileno())
+
+    def close(self) -> None:
+        with self._write_lock:
+            self.commit()
+            self._handle.close()
+
+    def _read_snapshot(self) -> Dict[int, Session]:
+        path = self.directory / SNAPSHOT_NAME
+        if not path.exists():
+            return {}
+        data = path.read_bytes()
+        magic, location_count, session_count, last_session_id = _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a session snapshot")
+        self.last_session_id = max(self.last_session_id, last_session_id)
+        offset = _SNAPSHOT_HEADER.size
+        table = self._table
+        # Location ids may shift when the story changes, so the snapshot carries its own table.
+        remap = array(JOURNEY_TYPECODE)
+        for _ in range(location_count):
+            length, lat, lon = _LOCATION.unpack_from(data, offset)
+            offset += _LOCATION.size
+            remap.append(table.intern((data[offset:offset + length].decode("utf-8"), lat, lon)))
+            offset += length
+        sessions = {}
+        for _ in range(session_count):
+            session_id, node_length, journey_length = _SNAPSHOT_SESSION.unpack_from(data, offset)
+            offset += _SNAPSHOT_SESSION.size
+            node_id = data[offset:offset + node_length].decode("utf-8")
+            offset += node_length
+            stored = array(JOURNEY_TYPECODE, data[offset:offset + journey_length * 2])
+            offset += journey_length * 2
+            sessions[session_id] = Session(session_id, node_id, array(JOURNEY_TYPECODE, map(remap.__getitem__, stored)))
+        return sessions
+
+    def _new_session(self, session_id: int, node_id: str) -> Session:
+        return Session(session_id, node_id, array(JOURNEY_TYPECODE, [self._table.intern(START_LOCATION)]))
+
+    def _shared(self, session: Session) -> Session:
+        """A copy of a replayed session with its journey in the shared location table."""
+        table = location_table()
+        journey = array(JOURNEY_TYPECODE, (table.intern(self._table[location_id]) for location_id in session.journey))
+        return Session(session.session_id, session.node_id, journey)
+
+    def recover(self) -> Dict[int, Session]:
+        """Rebuild every unfinished session from the snapshot and the journal since it.
+
+        Sessions with a choice the story no longer has (its node or option was removed)
+        are closed. Also restores ``last_session_id``, so new sessions are numbered after it.
+        """
+        with self._write_lock:
+            sessions = self._replay()
+            return {session_id: self._shared(session) for session_id, session in sessions.items()}
+
+    def _replay(self) -> Dict[int, Session]:
+        """``recover`` with journeys left in the private table; touches no shared state."""
+        with self._write_lock:
+            self.commit()
+            self._snapshot = self._read_snapshot()
+            sessions = {
+                session_id: Session(session_id, session.node_id, array(JOURNEY_TYPECODE, session.journey))
+                for session_id, session in self._snapshot.items()
+            }
+            data = (self.directory / JOURNAL_NAME).read_bytes()
+            self._offsets = {}
+            closed = set()
+            valid_end = 0
+            for offset, valid_end, session_id, node_id, option_index in _iter_records(data):
+                self.last_session_id = max(self.last_session_id, session_id)
+                if session_id in closed:
+                    continue
+                session = sessions.get(session_id)
+                if session is None and option_index != END_OF_SESSION:
+                    session = sessions[session_id] = self._new_session(session_id, node_id)
+                if option_index == END_OF_SESSION or not _apply(session, node_id, option_index, self._table):
+                    closed.add(session_id)
+                    sessions.pop(session_id, None)
+                    self._snapshot.pop(session_id, None)
+                    self._offsets.pop(session_id, None)
+                    continue
+                self._offsets.setdefault(session_id, array("Q")).append(offset)
+            if valid_end < len(data):
+                # Drop a record torn by a crash mid-write so new appends start clean.
+                self._handle.truncate(valid_end)
+                self._position = valid_end
+        return sessions
+
+    def resume(self, session_id: int) -> Optional[Session]:
+        """Rebuild one session from its snapshot entry and its own journal records.
+
+        Only that session's records since the last snapshot are read; ``recover()``
+        must have been called once after opening an existing journal.
+        """
+        with self._write_lock:
+            self.commit()
+            base = self._snapshot.get(session_id)
+            offsets = self._offsets.get(session_id)
+            if base is None and not offsets:
+                return None
+            session = Session(session_id, base.node_id, array(JOURNEY_TYPECODE, base.journey)) if base else None
+            with open(self.directory / JOURNAL_NAME, "rb") as handle:
+                for offset in offsets or ():
+                    handle.seek(offset)
+                    header = handle.read(_RECORD.size)
+                    _, _, option_index, length = _RECORD.unpack(header)
+                    node_id = handle.read(length).decode("utf-8")
+                    if option_index == END_OF_SESSION:
+                        return None
+                    if session is None:
+                        session = self._new_session(session_id, node_id)
+                    if not _apply(session, node_id, option_index, self._table):
+                        return None
+            return self._shared(session)
+
+    def compact(self) -> None:
+        """Fold the journal into a new snapshot and start an empty journal."""
+        with self._write_lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        sessions = self._replay()
+        table = self._table
+        used = sorted({location_id for session in sessions.values() for location_id in session.journey})
+        renumber = {location_id: position for position, location_id in enumerate(used)}
+
+        temporary = self.directory / (SNAPSHOT_NAME + ".tmp")
+        with open(temporary, "wb") as handle:
+            handle.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(used), len(sessions), self.last_session_id))
+            for location_id in used:
+                name, lat, lon = table[location_id]
+                encoded = name.encode("utf-8")
+                handle.write(_LOCATION.pack(len(encoded), lat, lon) + encoded)
+            for session_id, session in sessions.items():
+                node_id = session.node_id.encode("utf-8")
+                journey = array(JOURNEY_TYPECODE, (renumber[location_id] for location_id in session.journey))
+                handle.write(_SNAPSHOT_SESSION.pack(session_id, len(node_id), len(journey)) + node_id)
+                handle.write(journey.tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, self.directory / SNAPSHOT_NAME)
+
+        with self._buffer_lock:
+            # Choices buffered while the snapshot was written belong to the new journal.
+            carried = bytes(self._pending)
+            self._handle.close()
+            self._handle = open(self.directory / JOURNAL_NAME, "wb")
+            self._pending = bytearray(carried)
+            self._position = 0
+            self._offsets = {}
+            for offset, _, session_id, _, option_index in _iter_records(carried):
+                self._offsets.setdefault(session_id, array("Q")).append(offset)
+            self._snapshot = sessions
+
+    def resume_code(self, session_id: int) -> str:
+        """A code that lets its holder resume ``session_id``; it can't be guessed from the id."""
+        signature = hmac.new(self._key, struct.pack("<Q", session_id), hashlib.sha256).hexdigest()
+        return f"{session_id}-{signature[:24]}"
+
+    def session_for_code(self, code: str) -> Optional[int]:
+        """The session id a ``resume_code`` was made for, or None if the code is not genuine."""
+        session_id, _, _ = code.partition("-")
+        if not session_id.isdigit() or int(session_id) >= 1 << 64:
+            return None
+        if not hmac.compare_digest(self.resume_code(int(session_id)), code):
+            return None
+        return int(session_id)
+
+    def journal_bytes(self) -> int:
+        return self._position
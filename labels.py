@@ -0,0 +1,114 @@
+"""Place-name label placement for the travel map.
+
+Repeated stops get one label, and labels are placed greedily in priority order at the
+first of a few offsets around their marker that doesn't overlap a label already placed.
+Placed rectangles are bucketed in a uniform grid, so each check only looks at the
+labels in nearby cells instead of every other label.
+
+Label sizes are in pixels and converted to map units with the view being drawn, so
+labels take the same room on screen in every projection.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from map_geometry import MAP_BOUNDS
+
+Coordinate = Tuple[str, float, float]
+Rect = Tuple[float, float, float, float]
+
+# Sizes in pixels for Arial 10.
+CHAR_WIDTH = 6.0
+LINE_HEIGHT = 14.0
+MARKER_GAP = 4.0
+# The window size every map is drawn at unless told otherwise.
+WINDOW_SIZE = (1000, 600)
+
+# (dx, dy, align): right and up first, then the other corners.
+CANDIDATE_OFFSETS = [
+    (MARKER_GAP, MARKER_GAP, "left"),
+    (-MARKER_GAP, MARKER_GAP, "right"),
+    (MARKER_GAP, -MARKER_GAP - LINE_HEIGHT, "left"),
+    (-MARKER_GAP, -MARKER_GAP - LINE_HEIGHT, "right"),
+]
+
+
+@dataclass(frozen=True)
+class PlacedLabel:
+    text: str
+    x: float
+    y: float
+    align: str
+
+
+class GridIndex:
+    """Uniform grid of rectangles for fast overlap checks."""
+
+    def __init__(self, cell_size: float) -> None:
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[Rect]] = {}
+
+    def _cells_for(self, rect: Rect) -> Iterable[Tuple[int, int]]:
+        west, south, east, north = rect
+        size = self.cell_size
+        for column in range(int(west // size), int(east // size) + 1):
+            for row in range(int(south // size), int(north // size) + 1):
+                yield column, row
+
+    def overlaps(self, rect: Rect) -> bool:
+        west, south, east, north = rect
+        for cell in self._cells_for(rect):
+            for other_west, other_south, other_east, other_north in self._cells.get(cell, ()):
+                if west < other_east and other_west < east and south < other_north and other_south < north:
+                    return True
+        return False
+
+    def insert(self, rect: Rect) -> None:
+        for cell in self._cells_for(rect):
+            self._cells.setdefault(cell, []).append(rect)
+
+
+def label_rect(text: str, x: float, y: float, align: str, unit: Tuple[float, float] = (1.0, 1.0)) -> Rect:
+    """The box a label covers, in map units; ``unit`` is the map units per pixel across and up."""
+    width = len(text) * CHAR_WIDTH * unit[0]
+    height = LINE_HEIGHT * unit[1]
+    if align == "right":
+        return x - width, y, x, y + height
+    return x, y, x + width, y + height
+
+
+def place_labels(
+    visits: List[Coordinate],
+    show_counts: bool = True,
+    bounds: Rect = MAP_BOUNDS,
+    window: Tuple[int, int] = WINDOW_SIZE,
+) -> List[PlacedLabel]:
+    """Choose non-overlapping labels for the distinct places in ``visits``.
+
+    ``visits`` are in the map units of a ``window``-sized view of ``bounds``, by default
+    the flat map. Places visited more often win ties for space, then the start and end
+    of the journey, then earlier stops. Labels with no free candidate position are
+    dropped. With ``show_counts`` a place visited more than once is labeled like
+    ``Dublin, Ireland ×3``.
+    """
+    west, south, east, north = bounds
+    unit = ((east - west) / window[0], (north - south) / window[1])
+    counts = Counter(visits)
+    first_seen = {place: order for order, place in enumerate(dict.fromkeys(visits))}
+    ends = {visits[0], visits[-1]} if visits else set()
+    ranked = sorted(first_seen, key=lambda place: (-counts[place], place not in ends, first_seen[place]))
+
+    grid = GridIndex(cell_size=LINE_HEIGHT * 4 * max(unit))
+    placed = []
+    for place in ranked:
+        name, lat, lon = place
+        if show_counts and counts[place] > 1:
+            name = f"{name} ×{counts[place]}"
+        for dx, dy, align in CANDIDATE_OFFSETS:
+            x, y = lon + dx * unit[0], lat + dy * unit[1]
+            rect = label_rect(name, x, y, align, unit)
+            if not grid.overlaps(rect):
+                grid.insert(rect)
+                placed.append(PlacedLabel(name, x, y, align))
+                break
+    return placed
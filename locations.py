@@ -0,0 +1,79 @@
+"""Interned story locations so journeys can be stored as small integer arrays."""
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+Location = Tuple[str, float, float]
+
+# Journeys are stored as unsigned shorts, one per stop.
+JOURNEY_TYPECODE = "H"
+MAX_LOCATIONS = 1 << 16
+
+
+class LocationTable:
+    """Numbers every distinct ``(name, lat, lon)`` place with a small integer id."""
+
+    def __init__(self, locations: Iterable[Location] = ()) -> None:
+        self._locations: List[Location] = []
+        self._ids: Dict[Location, int] = {}
+        for location in locations:
+            self.intern(location)
+
+    def intern(self, location: Location) -> int:
+        location_id = self._ids.get(location)
+        if location_id is None:
+            if len(self._locations) >= MAX_LOCATIONS:
+                raise OverflowError(f"more than {MAX_LOCATIONS} distinct locations")
+            location = tuple(location)
+            location_id = self._ids[location] = len(self._locations)
+            self._locations.append(location)
+        return location_id
+
+    def id_of(self, location: Location) -> Optional[int]:
+        return self._ids.get(tuple(location))
+
+    def __getitem__(self, location_id: int) -> Location:
+        return self._locations[location_id]
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def __iter__(self):
+        return iter(self._locations)
+
+    def encode(self, visits: Iterable[Location]) -> array:
+        """Pack a list of visited locations into a compact journey."""
+        return array(JOURNEY_TYPECODE, [self.intern(location) for location in visits])
+
+    def decode(self, journey: Iterable[int]) -> List[Location]:
+        locations = self._locations
+        return [locations[location_id] for location_id in journey]
+
+
+def build_location_table(graph: Mapping, start: Optional[Location] = None) -> LocationTable:
+    """Intern the start location and every option location in ``graph``, in story order."""
+    table = LocationTable([start] if start else [])
+    for node_id in graph:
+        for option in graph[node_id].options:
+            if option.location:
+                table.intern(option.location)
+    return table
+
+
+@lru_cache(maxsize=None)
+def location_table() -> LocationTable:
+    """The shared table: the start location, then each place as journeys first reach it.
+
+    It never walks ``STORY_GRAPH``, so using it doesn't load every node of a lazy story.
+    Use ``build_location_table`` when every place in the story is wanted.
+    """
+    from travel_story import START_LOCATION
+
+    return LocationTable([START_LOCATION])
+
+
+def as_locations(visits) -> List[Location]:
+    """Accept either a compact journey or a list of locations and return locations."""
+    if isinstance(visits, array):
+        return location_table().decode(visits)
+    return list(visits)
@@ -1,56 +1,118 @@
 """Interactive choose-your-own-adventure about life after graduation."""
-from typing import List, Tuple
+from array import array
+import argparse
 
+from locations import JOURNEY_TYPECODE, location_table
 from map_visualizer import draw_travel_map
-from travel_story import describe_node, get_node, get_start_node_id, record_location
-
-Coordinate = Tuple[str, float, float]
-
-
-EXIT_WORDS = {"quit", "exit", "done"}
-
-
-def prompt_choice(option_count: int) -> int | None:
-    """Ask the player for a choice and validate it."""
+from story_validator import check_story
+from travel_story import (
+    START_LOCATION,
+    describe_node,
+    get_node,
+    get_start_node_id,
+    parse_choice,
+    record_location,
+)
+from trip_stats import format_stats, journey_stats
+
+
+def goto_target(keyword: str) -> str | None:
+    """Debug command: the node ``keyword`` names or first matches, listing the other matches."""
+    from story_search import find_nodes, resolve_node
+
+    target = resolve_node(keyword)
+    if target is None:
+        print(f"No story node mentions {keyword!r}.")
+        return None
+    others = [node_id for node_id in find_nodes(keyword, limit=6) if node_id != target][:5]
+    if others:
+        print(f"Also matching: {', '.join(others)}")
+    print(f"Jumping to {target}.\n")
+    return target
+
+
+def show_routes(here: str, keyword: str) -> None:
+    """Debug command: the fewest-choices and shortest routes to the first node matching ``keyword``."""
+    from route_planner import describe_route, live_planner
+    from story_search import resolve_node
+
+    target = resolve_node(keyword)
+    if target is None:
+        print(f"No story node mentions {keyword!r}.")
+        return
+    planner = live_planner()
+    print(f"Routes to {target}:")
+    print("  " + describe_route(planner.fewest_choices(here, target), "Fewest choices"))
+    print("  " + describe_route(planner.shortest_km(here, target), "Shortest trip"))
+
+
+def prompt_choice(option_count: int, here: str) -> int | str | None:
+    """Ask the player for a choice and validate it.
+
+    ``goto <keyword>`` returns the id of a node to jump to instead of an option index;
+    ``route <keyword>`` prints the ways from ``here`` to a matching node and asks again.
+    """
     while True:
-        raw = input("Your choice: ").strip().lower()
-        if raw in EXIT_WORDS:
-            return None
-        if raw.isdigit():
-            selection = int(raw) - 1
-            if 0 <= selection < option_count:
-                return selection
-        print("Please enter a valid option number or type 'quit' to finish.")
-
-
-def play_adventure(player_name: str) -> List[Coordinate]:
-    """Run the main interactive loop and return visited locations."""
-    visited: List[Coordinate] = [("East Lansing, Michigan", 42.73698, -84.48387)]
+        raw = input("Your choice: ")
+        command, _, keyword = raw.strip().partition(" ")
+        if command.lower() == "goto" and keyword.strip():
+            target = goto_target(keyword)
+            if target is not None:
+                return target
+            continue
+        if command.lower() == "route" and keyword.strip():
+            show_routes(here, keyword)
+            continue
+        try:
+            return parse_choice(raw, option_count)
+        except ValueError:
+            print("Please enter a valid option number or type 'quit' to finish.")
+
+
+def play_adventure(player_name: str) -> array:
+    """Run the main interactive loop and return the visited locations as a compact journey."""
+    visited = array(JOURNEY_TYPECODE, [location_table().intern(START_LOCATION)])
     current_id = get_start_node_id()
 
     print(f"\nWelcome, {player_name}! Each choice takes you somewhere new. Type 'quit' anytime to end and draw your map.\n")
 
     while True:
-        node = get_node(current_id)
+        try:
+            node = get_node(current_id)
+        except KeyError:
+            # Only possible with --watch, when a reload removed the node we were heading to.
+            print("\nThat part of the story was just rewritten, so you're back at the start.")
+            current_id = get_start_node_id()
+            continue
         print(describe_node(node))
-        choice_index = prompt_choice(len(node.options))
+        choice_index = prompt_choice(len(node.options), current_id)
         if choice_index is None:
             break
+        if isinstance(choice_index, str):
+            current_id = choice_index
+            continue
 
         option = node.options[choice_index]
-        location = record_location(option)
-        if location:
-            visited.append(location)
+        record_location(option, visited)
         current_id = option.next_id
 
     return visited
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Play the post-grad travel adventure.")
+    parser.add_argument("--watch", action="store_true", help="reload story edits while you play")
+    args = parser.parse_args()
+    check_story()
+    if args.watch:
+        from story_reload import StoryWatcher
+
+        StoryWatcher().start()
     name = input("What's your name? ").strip() or "Spartan"
     visits = play_adventure(name)
+    print(format_stats(journey_stats(visits)))
     print("\nDrawing your travel map... close the Turtle window when you're done reviewing your journey.")
-    draw_travel_map(visits)
+    draw_travel_map(visits, fast=True)
 
 
 if __name__ == "__main__":
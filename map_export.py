@@ -0,0 +1,187 @@
+"""Save journey maps as SVG and journeys as GeoJSON, streaming straight to a file.
+
+The SVG has the same layers as the Turtle map (ocean, graticule, continents, routes,
+markers and labels) in any projection. GeoJSON gets one ``LineString`` per journey plus a
+``Point`` per distinct place, and a batch of journeys goes into one feature collection.
+Both writers emit the document piece by piece, so a million-stop journey or a file of
+many journeys never has to be held as one string.
+
+    python map_export.py journeys.jsonl --geojson journeys.geojson
+    python map_export.py journeys.jsonl --svg-dir maps/ --projection robinson
+"""
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator, List, TextIO, Tuple, Union
+from xml.sax.saxutils import escape
+import argparse
+import json
+
+from labels import place_labels
+from locations import as_locations
+from map_geometry import GRATICULE_COLOR, LAND_COLOR, MARKER_COLOR, OCEAN_COLOR, SPACE_COLOR
+from projections import (
+    PROJECTIONS,
+    make_projection,
+    projected_graticule,
+    projected_landmasses,
+    projected_leg,
+    projected_outline,
+    projected_places,
+)
+from raster_map import read_journeys
+from route_aggregation import aggregate_route, leg_color, leg_width
+
+Coordinate = Tuple[str, float, float]
+Point = Tuple[float, float]
+
+# Coordinates are written in batches of this many, so long routes come out in pieces.
+WRITE_BATCH = 4096
+
+
+def _svg_points(points: Iterable[Point]) -> str:
+    # SVG's y axis points down, so latitude-like map units are negated.
+    return " ".join(f"{x:.3f},{-y:.3f}" for x, y in points)
+
+
+def iter_svg(
+    visits: Union[List[Coordinate], array], projection: str = "equirectangular", width: int = 1000, height: int = 600
+) -> Iterator[str]:
+    """Yield the SVG document for one journey a piece at a time."""
+    visits = as_locations(visits)
+    chosen = make_projection(projection, visits)
+    west, south, east, north = chosen.view_bounds(width, height)
+    unit = (east - west) / width
+    yield (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="{west:.3f} {-north:.3f} {east - west:.3f} {north - south:.3f}" preserveAspectRatio="none">\n'
+    )
+    yield f'<rect x="{west:.3f}" y="{-north:.3f}" width="{east - west:.3f}" height="{north - south:.3f}" fill="{SPACE_COLOR}"/>\n'
+    yield f'<polygon points="{_svg_points(projected_outline(chosen))}" fill="{OCEAN_COLOR}"/>\n'
+    yield f'<g fill="none" stroke="{GRATICULE_COLOR}" stroke-width="1" vector-effect="non-scaling-stroke">\n'
+    for line in projected_graticule(chosen):
+        yield f'<polyline points="{_svg_points(line)}" vector-effect="non-scaling-stroke"/>\n'
+    yield "</g>\n"
+    yield f'<g fill="{LAND_COLOR}">\n'
+    for land in projected_landmasses(chosen):
+        yield f'<polygon points="{_svg_points(land)}"/>\n'
+    yield "</g>\n"
+    if not visits:
+        yield "</svg>\n"
+        return
+
+    route = aggregate_route(visits)
+    yield '<g fill="none" stroke-linecap="round" stroke-linejoin="round">\n'
+    for (start, end), count in route.legs.items():
+        color, stroke = leg_color(count, route.busiest), leg_width(count, route.busiest)
+        for piece in projected_leg(chosen, start, end):
+            yield (
+                f'<polyline points="{_svg_points(piece)}" stroke="{color}" stroke-width="{stroke}" '
+                'vector-effect="non-scaling-stroke"/>\n'
+            )
+    yield "</g>\n"
+    yield f'<g fill="{MARKER_COLOR}">\n'
+    for _, y, x in projected_places(chosen, route.places):
+        yield f'<circle cx="{x:.3f}" cy="{-y:.3f}" r="{4 * unit:.3f}"/>\n'
+    yield "</g>\n"
+    yield f'<g fill="{MARKER_COLOR}" font-family="Arial" font-size="{10 * unit:.3f}">\n'
+    labels = place_labels(projected_places(chosen, visits), bounds=(west, south, east, north), window=(width, height))
+    for label in labels:
+        anchor = "end" if label.align == "right" else "start"
+        yield f'<text x="{label.x:.3f}" y="{-label.y:.3f}" text-anchor="{anchor}">{escape(label.text)}</text>\n'
+    yield "</g>\n"
+    yield "</svg>\n"
+
+
+def write_svg(visits: Union[List[Coordinate], array], handle: TextIO, projection: str = "equirectangular") -> None:
+    for piece in iter_svg(visits, projection):
+        handle.write(piece)
+
+
+def save_svg(visits: Union[List[Coordinate], array], path: Path, projection: str = "equirectangular") -> Path:
+    path = Path(path)
+    with open(path, "w", encoding="utf-8") as handle:
+        write_svg(visits, handle, projection)
+    return path
+
+
+def _coordinates(visits: Iterable[Coordinate]) -> Iterator[str]:
+    batch = []
+    for _, lat, lon in visits:
+        batch.append(f"[{lon},{lat}]")
+        if len(batch) >= WRITE_BATCH:
+            yield ",".join(batch)
+            batch = []
+    if batch:
+        yield ",".join(batch)
+
+
+def iter_journey_features(visits: Union[List[Coordinate], array], journey: int) -> Iterator[str]:
+    """Yield the comma-separated GeoJSON features for one journey, in pieces.
+
+    The route is a ``LineString`` of every stop in order (left out for a journey with
+    fewer than two stops), followed by a ``Point`` per distinct place with its visit count.
+    """
+    visits = as_locations(visits)
+    first = True
+    if len(visits) > 1:
+        yield '{"type":"Feature","geometry":{"type":"LineString","coordinates":['
+        separator = ""
+        for piece in _coordinates(visits):
+            yield separator + piece
+            separator = ","
+        yield f']}},"properties":{{"journey":{journey},"stops":{len(visits)}}}}}'
+        first = False
+    for (name, lat, lon), count in Counter(visits).items():
+        properties = json.dumps({"journey": journey, "name": name, "visits": count}, ensure_ascii=False)
+        yield ("" if first else ",") + (
+            f'{{"type":"Feature","geometry":{{"type":"Point","coordinates":[{lon},{lat}]}},"properties":{properties}}}'
+        )
+        first = False
+
+
+def write_geojson(journeys: Iterable[Union[List[Coordinate], array]], handle: TextIO) -> int:
+    """Write every journey into one feature collection; returns how many were written."""
+    handle.write('{"type":"FeatureCollection","features":[\n')
+    count = 0
+    for journey, visits in enumerate(journeys):
+        pieces = iter_journey_features(visits, journey)
+        first = next(pieces, None)
+        if first is None:
+            continue
+        handle.write((",\n" if count else "") + first)
+        for piece in pieces:
+            handle.write(piece)
+        count += 1
+    handle.write("\n]}\n")
+    return count
+
+
+def save_geojson(journeys: Iterable[Union[List[Coordinate], array]], path: Path) -> int:
+    with open(path, "w", encoding="utf-8") as handle:
+        return write_geojson(journeys, handle)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export journeys from replay.py output as SVG maps or GeoJSON.")
+    parser.add_argument("journeys", type=Path, help="JSON lines from replay.py")
+    parser.add_argument("--geojson", type=Path, help="write every journey into this feature collection")
+    parser.add_argument("--svg-dir", type=Path, help="write journey-<n>.svg for each journey here")
+    parser.add_argument("--projection", choices=list(PROJECTIONS), default="equirectangular")
+    args = parser.parse_args()
+    if not args.geojson and not args.svg_dir:
+        parser.error("choose --geojson, --svg-dir or both")
+    if args.geojson:
+        count = save_geojson(read_journeys(args.journeys), args.geojson)
+        print(f"Wrote {count} journeys to {args.geojson}")
+    if args.svg_dir:
+        args.svg_dir.mkdir(parents=True, exist_ok=True)
+        count = 0
+        for index, visits in enumerate(read_journeys(args.journeys)):
+            save_svg(visits, args.svg_dir / f"journey-{index}.svg", args.projection)
+            count += 1
+        print(f"Wrote {count} SVG maps to {args.svg_dir}")
+
+
+if __name__ == "__main__":
+    main()
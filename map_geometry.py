@@ -0,0 +1,55 @@
+"""Shared world map geometry and colors, used by every map renderer."""
+from typing import List, Tuple
+
+Outline = List[Tuple[float, float]]
+
+# (west, south, east, north) in degrees; a little wider than the globe so edges stay visible.
+MAP_BOUNDS = (-190.0, -110.0, 190.0, 110.0)
+
+# Window background around globes that don't fill it.
+SPACE_COLOR = "black"
+OCEAN_COLOR = "#06243d"
+GRATICULE_COLOR = "#1d4f7a"
+GRATICULE_STEP = 30
+LAND_COLOR = "#4fa35f"
+# Gold, written out in hex so route colors can be blended from it.
+ROUTE_COLOR = "#ffd700"
+MARKER_COLOR = "#f4e409"
+
+# These polygons are intentionally coarse; they are meant to anchor the map visually
+# rather than replicate detailed geography.
+NORTH_AMERICA = [
+    (-170, 70), (-140, 72), (-125, 70), (-110, 60), (-102, 50), (-95, 48),
+    (-85, 50), (-75, 45), (-80, 35), (-90, 30), (-95, 20), (-100, 15),
+    (-110, 20), (-120, 25), (-130, 35), (-140, 50), (-155, 60), (-170, 70)
+]
+SOUTH_AMERICA = [
+    (-80, 12), (-70, 10), (-65, 0), (-60, -10), (-60, -20), (-62, -30),
+    (-70, -40), (-78, -50), (-75, -55), (-70, -52), (-65, -48), (-60, -40),
+    (-58, -30), (-58, -20), (-60, -10), (-65, 0), (-70, 8), (-80, 12)
+]
+AFRICA = [
+    (-17, 37), (0, 37), (20, 32), (30, 25), (35, 10), (40, -5), (45, -15),
+    (40, -25), (30, -35), (15, -35), (5, -30), (0, -25), (-5, -5),
+    (-10, 0), (-15, 10), (-17, 20), (-17, 37)
+]
+EURASIA = [
+    (-10, 70), (10, 72), (30, 70), (50, 65), (70, 60), (90, 55), (110, 60),
+    (130, 55), (150, 60), (160, 55), (160, 40), (150, 35), (140, 30), (120, 25),
+    (100, 20), (80, 15), (60, 20), (40, 25), (30, 30), (20, 40), (10, 45),
+    (0, 50), (-10, 55), (-10, 60), (-10, 70)
+]
+AUSTRALIA = [
+    (110, -10), (120, -15), (135, -20), (145, -25), (150, -32), (145, -38),
+    (130, -40), (120, -35), (110, -30), (105, -20), (110, -10)
+]
+GREENLAND = [(-60, 82), (-40, 80), (-20, 75), (-20, 65), (-45, 60), (-60, 65), (-60, 82)]
+INDIA = [(70, 22), (80, 28), (90, 22), (85, 10), (75, 5), (70, 15), (70, 22)]
+ANTARCTICA = [
+    (-180, -70), (-120, -72), (-60, -74), (0, -76), (60, -74), (120, -72), (180, -70),
+    (180, -80), (-180, -80), (-180, -70)
+]
+
+LANDMASSES: List[Outline] = [
+    NORTH_AMERICA, SOUTH_AMERICA, AFRICA, EURASIA, AUSTRALIA, GREENLAND, INDIA, ANTARCTICA,
+]
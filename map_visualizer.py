@@ -1,43 +1,40 @@
 """Turtle-based map drawing for the travel adventure."""
-from typing import Iterable, List, Tuple
+from array import array
+from typing import Iterable, List, Tuple, Union
 import turtle
 
+from labels import place_labels
+from locations import as_locations
+from map_geometry import GRATICULE_COLOR, LAND_COLOR, MARKER_COLOR, OCEAN_COLOR
+from projections import (
+    Projection,
+    make_projection,
+    projected_graticule,
+    projected_landmasses,
+    projected_leg,
+    projected_outline,
+    projected_places,
+)
+from route_aggregation import aggregate_route, leg_color, leg_width
+
 Coordinate = Tuple[str, float, float]
 
 
-def _draw_ocean(bounds: Tuple[float, float, float, float]) -> None:
-    ocean = turtle.Turtle(visible=False)
-    ocean.speed(0)
-    ocean.penup()
-    ocean.color("#06243d")
-    west, south, east, north = bounds
-    ocean.goto(west, south)
-    ocean.begin_fill()
-    ocean.pendown()
-    for point in [(west, north), (east, north), (east, south), (west, south)]:
-        ocean.goto(point)
-    ocean.end_fill()
-    ocean.penup()
+def _draw_ocean(projection: Projection) -> None:
+    _draw_continent(projected_outline(projection), OCEAN_COLOR)
 
 
-def _draw_graticule(bounds: Tuple[float, float, float, float]) -> None:
+def _draw_graticule(projection: Projection) -> None:
     grid = turtle.Turtle(visible=False)
     grid.speed(0)
-    grid.color("#1d4f7a")
+    grid.color(GRATICULE_COLOR)
     grid.pensize(1)
-    west, south, east, north = bounds
-
-    for lon in range(-180, 181, 30):
-        grid.penup()
-        grid.goto(lon, south)
-        grid.pendown()
-        grid.goto(lon, north)
-
-    for lat in range(-90, 91, 30):
+    for line in projected_graticule(projection):
         grid.penup()
-        grid.goto(west, lat)
+        grid.goto(line[0])
         grid.pendown()
-        grid.goto(east, lat)
+        for point in line[1:]:
+            grid.goto(point)
 
 
 def _draw_continent(outline: Iterable[Tuple[float, float]], fill: str) -> None:
@@ -56,69 +53,38 @@ def _draw_continent(outline: Iterable[Tuple[float, float]], fill: str) -> None:
     pen.end_fill()
 
 
-def _draw_landmasses() -> None:
-    """Draw simple, recognizable continent silhouettes in lat/lon space."""
-    # These polygons are intentionally coarse; they are meant to anchor the map visually
-    # rather than replicate detailed geography.
-    north_america = [
-        (-170, 70), (-140, 72), (-125, 70), (-110, 60), (-102, 50), (-95, 48),
-        (-85, 50), (-75, 45), (-80, 35), (-90, 30), (-95, 20), (-100, 15),
-        (-110, 20), (-120, 25), (-130, 35), (-140, 50), (-155, 60), (-170, 70)
-    ]
-    south_america = [
-        (-80, 12), (-70, 10), (-65, 0), (-60, -10), (-60, -20), (-62, -30),
-        (-70, -40), (-78, -50), (-75, -55), (-70, -52), (-65, -48), (-60, -40),
-        (-58, -30), (-58, -20), (-60, -10), (-65, 0), (-70, 8), (-80, 12)
-    ]
-    africa = [
-        (-17, 37), (0, 37), (20, 32), (30, 25), (35, 10), (40, -5), (45, -15),
-        (40, -25), (30, -35), (15, -35), (5, -30), (0, -25), (-5, -5),
-        (-10, 0), (-15, 10), (-17, 20), (-17, 37)
-    ]
-    eurasia = [
-        (-10, 70), (10, 72), (30, 70), (50, 65), (70, 60), (90, 55), (110, 60),
-        (130, 55), (150, 60), (160, 55), (160, 40), (150, 35), (140, 30), (120, 25),
-        (100, 20), (80, 15), (60, 20), (40, 25), (30, 30), (20, 40), (10, 45),
-        (0, 50), (-10, 55), (-10, 60), (-10, 70)
-    ]
-    australia = [
-        (110, -10), (120, -15), (135, -20), (145, -25), (150, -32), (145, -38),
-        (130, -40), (120, -35), (110, -30), (105, -20), (110, -10)
-    ]
-    greenland = [(-60, 82), (-40, 80), (-20, 75), (-20, 65), (-45, 60), (-60, 65), (-60, 82)]
-    india = [(70, 22), (80, 28), (90, 22), (85, 10), (75, 5), (70, 15), (70, 22)]
-    antarctica = [
-        (-180, -70), (-120, -72), (-60, -74), (0, -76), (60, -74), (120, -72), (180, -70),
-        (180, -80), (-180, -80), (-180, -70)
-    ]
-
-    for land in [north_america, south_america, africa, eurasia, australia, greenland, india, antarctica]:
-        _draw_continent(land, "#4fa35f")
-
-
-def _draw_route(visits: List[Coordinate]) -> None:
+def _draw_landmasses(projection: Projection) -> None:
+    """Draw simple, recognizable continent silhouettes, projected once and cached."""
+    for land in projected_landmasses(projection):
+        _draw_continent(land, LAND_COLOR)
+
+
+def _draw_route(visits: List[Coordinate], projection: Projection, bounds: Tuple[float, float, float, float]) -> None:
+    """Draw each distinct leg once as a great-circle arc, wider and redder the more often it was traveled."""
+    route = aggregate_route(visits)
     path = turtle.Turtle(visible=False)
     path.speed(0)
-    path.color("gold")
-    path.pensize(2)
     path.penup()
+    for (start, end), count in route.legs.items():
+        path.color(leg_color(count, route.busiest))
+        path.pensize(leg_width(count, route.busiest))
+        for piece in projected_leg(projection, start, end):
+            path.goto(piece[0])
+            path.pendown()
+            for point in piece[1:]:
+                path.goto(point)
+            path.penup()
 
     marker = turtle.Turtle(visible=False)
     marker.speed(0)
-    marker.color("#f4e409")
+    marker.color(MARKER_COLOR)
     marker.penup()
-
-    previous = None
-    for name, lat, lon in visits:
-        if previous is None:
-            path.goto(lon, lat)
-            path.pendown()
-        else:
-            path.goto(lon, lat)
-        marker.goto(lon, lat)
-        marker.dot(8, "#f4e409")
-        marker.write(name, align="left", font=("Arial", 10, "normal"))
-        previous = (lon, lat)
+    for _, y, x in projected_places(projection, route.places):
+        marker.goto(x, y)
+        marker.dot(8, MARKER_COLOR)
+    for label in place_labels(projected_places(projection, visits), bounds=bounds):
+        marker.goto(label.x, label.y)
+        marker.write(label.text, align=label.align, font=("Arial", 10, "normal"))
 
 
 def _write_summary(visits: List[Coordinate], bounds: Tuple[float, float, float, float]) -> None:
@@ -128,30 +94,123 @@ def _write_summary(visits: List[Coordinate], bounds: Tuple[float, float, float,
     label.penup()
     label.goto((west + east) / 2, north - 10)
     if visits:
-        locations = ", ".join(name for name, _, _ in visits)
+        locations = ", ".join(dict.fromkeys(name for name, _, _ in visits))
         label.write(f"You traveled to: {locations}", align="center", font=("Arial", 12, "bold"))
     else:
         label.write("You stayed in East Lansing this time.", align="center", font=("Arial", 12, "bold"))
 
 
-def draw_travel_map(visits: List[Coordinate]) -> None:
-    """Render a flat world map with the player's travel path."""
+def _canvas_scale(screen: turtle.TurtleScreen, bounds: Tuple[float, float, float, float]) -> Tuple[float, float]:
+    """The world-to-canvas scale ``setworldcoordinates(*bounds)`` set up on ``screen``."""
+    west, south, east, north = bounds
+    width, height = screen.screensize()
+    return width / (east - west), height / (north - south)
+
+
+def _canvas_coordinates(points: Iterable[Tuple[float, float]], scale: Tuple[float, float]) -> List[float]:
+    """World points as the flat ``x0, y0, x1, y1, ...`` list Tk canvas items take."""
+    xscale, yscale = scale
+    coordinates = []
+    for x, y in points:
+        coordinates.append(x * xscale)
+        coordinates.append(-y * yscale)
+    return coordinates
+
+
+def _draw_map_fast(
+    screen: turtle.TurtleScreen,
+    visits: List[Coordinate],
+    bounds: Tuple[float, float, float, float],
+    projection: Projection,
+) -> None:
+    """Draw every layer straight onto the Tk canvas, refreshing once per layer.
+
+    Each polygon and polyline is one item made with the documented Tk canvas methods on
+    ``screen.getcanvas()``, so no per-polygon Turtle objects are created and the route
+    costs one line item per distinct leg (more where it is split at the dateline or the
+    globe's edge) however long the journey is.
+    """
+    canvas = screen.getcanvas()
+    scale = _canvas_scale(screen, bounds)
+
+    def polygon(points: Iterable[Tuple[float, float]], color: str) -> None:
+        coordinates = _canvas_coordinates(points, scale)
+        if len(coordinates) >= 6:
+            canvas.create_polygon(coordinates, fill=color, outline=color)
+
+    def polyline(points: Iterable[Tuple[float, float]], color: str, width: float) -> None:
+        coordinates = _canvas_coordinates(points, scale)
+        if len(coordinates) >= 4:
+            canvas.create_line(coordinates, fill=color, width=width, capstyle="round")
+
+    polygon(projected_outline(projection), OCEAN_COLOR)
+    screen.update()
+
+    for line in projected_graticule(projection):
+        polyline(line, GRATICULE_COLOR, 1)
+    screen.update()
+
+    for land in projected_landmasses(projection):
+        polygon(land, LAND_COLOR)
+    screen.update()
+
+    if visits:
+        route = aggregate_route(visits)
+        for (start, end), count in route.legs.items():
+            for piece in projected_leg(projection, start, end):
+                polyline(piece, leg_color(count, route.busiest), leg_width(count, route.busiest))
+        screen.update()
+
+        for _, place_y, place_x in projected_places(projection, route.places):
+            x, y = _canvas_coordinates([(place_x, place_y)], scale)
+            canvas.create_oval(x - 4, y - 4, x + 4, y + 4, fill=MARKER_COLOR, outline="")
+        for label in place_labels(projected_places(projection, visits), bounds=bounds):
+            x, y = _canvas_coordinates([(label.x, label.y)], scale)
+            anchor = "se" if label.align == "right" else "sw"
+            canvas.create_text(x, y, text=label.text, anchor=anchor, fill=MARKER_COLOR, font=("Arial", 10, "normal"))
+        screen.update()
+
+    _write_summary(visits, bounds)
+    screen.update()
+
+
+def draw_travel_map(
+    visits: Union[List[Coordinate], array],
+    wait: bool = True,
+    fast: bool = False,
+    projection: str = "equirectangular",
+) -> None:
+    """Render a world map with the player's travel path.
+
+    ``visits`` may be a list of locations or a compact journey of location ids. With
+    ``wait=False`` the window is left open without entering the Tk main loop, and
+    ``fast=True`` draws each layer in bulk on the canvas instead of with turtle pens.
+    ``projection`` names one of ``projections.PROJECTIONS``; the orthographic globe is
+    centered on the journey.
+    """
+    visits = as_locations(visits)
     screen = turtle.Screen()
     screen.setup(width=1000, height=600)
     screen.title("Your Post-Grad Travel Map")
     screen.bgcolor("black")
 
-    # Use geographic coordinates directly so longitude runs horizontally and latitude vertically.
-    bounds = (-190.0, -110.0, 190.0, 110.0)
+    # World coordinates are the projection's map units; for the default flat map those
+    # are plain longitude and latitude.
+    chosen = make_projection(projection, visits)
+    bounds = chosen.view_bounds(1000, 600)
     screen.setworldcoordinates(*bounds)
     screen.tracer(False)
 
-    _draw_ocean(bounds)
-    _draw_graticule(bounds)
-    _draw_landmasses()
-    if visits:
-        _draw_route(visits)
-    _write_summary(visits, bounds)
+    if fast:
+        _draw_map_fast(screen, visits, bounds, chosen)
+    else:
+        _draw_ocean(chosen)
+        _draw_graticule(chosen)
+        _draw_landmasses(chosen)
+        if visits:
+            _draw_route(visits, chosen, bounds)
+        _write_summary(visits, bounds)
 
     screen.tracer(True)
-    turtle.done()
+    if wait:
+        turtle.done()
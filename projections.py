@@ -0,0 +1,291 @@
+"""Map projections shared by the Turtle and raster renderers.
+
+A projection turns lon/lat degrees into flat map coordinates, scaled so the map is
+roughly 360 units wide like the original lon/lat view. The static layers (globe
+outline, graticule and continents) are projected once per projection and cached, so
+re-rendering or switching back to a projection never re-projects them.
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+import bisect
+import math
+
+from great_circle import ARC_CACHE_SIZE, leg_arc
+from map_geometry import GRATICULE_STEP, LANDMASSES, MAP_BOUNDS
+
+Coordinate = Tuple[str, float, float]
+Point = Tuple[float, float]
+Polyline = Tuple[Point, ...]
+Bounds = Tuple[float, float, float, float]
+
+# Curved projections get extra vertices this far apart so straight outline edges bend.
+DENSIFY_DEGREES = 2.0
+MERCATOR_MAX_LAT = 85.0
+VIEW_MARGIN = 0.05
+
+_ROBINSON_LATS = list(range(0, 91, 5))
+_ROBINSON_X = [
+    1.0000, 0.9986, 0.9954, 0.9900, 0.9822, 0.9730, 0.9600, 0.9427, 0.9216, 0.8962,
+    0.8679, 0.8350, 0.7986, 0.7597, 0.7186, 0.6732, 0.6213, 0.5722, 0.5322,
+]
+_ROBINSON_Y = [
+    0.0000, 0.0620, 0.1240, 0.1860, 0.2480, 0.3100, 0.3720, 0.4340, 0.4958, 0.5571,
+    0.6176, 0.6769, 0.7346, 0.7903, 0.8435, 0.8936, 0.9394, 0.9761, 1.0000,
+]
+# Robinson's 1.3523 / 0.8487 height-to-width ratio, in degrees of longitude.
+_ROBINSON_Y_SCALE = 1.3523 / 0.8487 * 180 / math.pi
+
+
+def densify(points: Sequence[Point], step: float = DENSIFY_DEGREES) -> List[Point]:
+    """Insert points so no edge of ``points`` is longer than ``step`` degrees."""
+    dense = [points[0]]
+    for (lon0, lat0), (lon1, lat1) in zip(points, points[1:]):
+        pieces = max(1, math.ceil(max(abs(lon1 - lon0), abs(lat1 - lat0)) / step))
+        dense.extend(
+            (lon0 + (lon1 - lon0) * piece / pieces, lat0 + (lat1 - lat0) * piece / pieces)
+            for piece in range(1, pieces + 1)
+        )
+    return dense
+
+
+class Projection(ABC):
+    """Base class: subclasses implement ``project_points`` as one batch transform."""
+
+    name = "projection"
+    # Straight lon/lat edges stay straight, so outlines need no extra vertices.
+    straight_lines = False
+    # The view depends on the journey drawn, so there are many variants of it.
+    journey_centered = False
+
+    @abstractmethod
+    def project_points(self, points: Iterable[Point]) -> List[Optional[Point]]:
+        """Project ``(lon, lat)`` points; ``None`` marks a point not visible on the map."""
+
+    def project(self, lon: float, lat: float) -> Optional[Point]:
+        return self.project_points([(lon, lat)])[0]
+
+    def project_polygon(self, outline: Sequence[Point]) -> Polyline:
+        points = outline if self.straight_lines else densify(outline)
+        return tuple(point for point in self.project_points(points) if point is not None)
+
+    def project_line(self, points: Sequence[Point]) -> List[Polyline]:
+        """Project a polyline, breaking it wherever it goes out of view."""
+        pieces, current = [], []
+        for point in self.project_points(points):
+            if point is None:
+                if len(current) > 1:
+                    pieces.append(tuple(current))
+                current = []
+            else:
+                current.append(point)
+        if len(current) > 1:
+            pieces.append(tuple(current))
+        return pieces
+
+    def outline(self) -> Polyline:
+        """The edge of the globe on this map, as a polygon."""
+        west, east = -180.0, 180.0
+        edge = [(west, -90.0), (west, 90.0), (east, 90.0), (east, -90.0), (west, -90.0)]
+        return self.project_polygon(edge)
+
+    def graticule(self) -> List[Polyline]:
+        lines = []
+        for lon in range(-180, 181, GRATICULE_STEP):
+            lines.extend(self.project_line(densify([(lon, -90.0), (lon, 90.0)])))
+        for lat in range(-90, 91, GRATICULE_STEP):
+            lines.extend(self.project_line(densify([(-180.0, lat), (180.0, lat)])))
+        return lines
+
+    def view_bounds(self, width: int, height: int) -> Bounds:
+        """``(west, south, east, north)`` around the globe, padded to the window's shape."""
+        outline = projected_outline(self)
+        west, east = min(x for x, _ in outline), max(x for x, _ in outline)
+        south, north = min(y for _, y in outline), max(y for _, y in outline)
+        pad = VIEW_MARGIN * max(east - west, north - south)
+        west, south, east, north = west - pad, south - pad, east + pad, north + pad
+        # Widen whichever side is short so the globe isn't stretched.
+        aspect = width / height
+        if (east - west) / (north - south) < aspect:
+            extra = ((north - south) * aspect - (east - west)) / 2
+            west, east = west - extra, east + extra
+        else:
+            extra = ((east - west) / aspect - (north - south)) / 2
+            south, north = south - extra, north + extra
+        return west, south, east, north
+
+
+@dataclass(frozen=True)
+class Equirectangular(Projection):
+    """Longitude and latitude used directly, the map's original view."""
+
+    name = "equirectangular"
+    straight_lines = True
+
+    def project_points(self, points: Iterable[Point]) -> List[Optional[Point]]:
+        return [(lon, lat) for lon, lat in points]
+
+    def outline(self) -> Polyline:
+        west, south, east, north = MAP_BOUNDS
+        return (west, south), (west, north), (east, north), (east, south)
+
+    def graticule(self) -> List[Polyline]:
+        # Grid lines run the full width of the view, as the map always drew them.
+        west, south, east, north = MAP_BOUNDS
+        return [((lon, south), (lon, north)) for lon in range(-180, 181, GRATICULE_STEP)] + [
+            ((west, lat), (east, lat)) for lat in range(-90, 91, GRATICULE_STEP)
+        ]
+
+    def view_bounds(self, width: int, height: int) -> Bounds:
+        # The flat map has always been stretched to fill the window.
+        return MAP_BOUNDS
+
+
+@dataclass(frozen=True)
+class Mercator(Projection):
+    name = "mercator"
+    straight_lines = True
+
+    def project_points(self, points: Iterable[Point]) -> List[Optional[Point]]:
+        limit = MERCATOR_MAX_LAT
+        scale = 180 / math.pi
+        log, tan, radians = math.log, math.tan, math.radians
+        return [
+            (lon, scale * log(tan(math.pi / 4 + radians(max(-limit, min(limit, lat))) / 2)))
+            for lon, lat in points
+        ]
+
+
+@dataclass(frozen=True)
+class Robinson(Projection):
+    name = "robinson"
+
+    def project_points(self, points: Iterable[Point]) -> List[Optional[Point]]:
+        projected = []
+        for lon, lat in points:
+            magnitude = min(abs(lat), 90.0)
+            index = min(bisect.bisect_right(_ROBINSON_LATS, magnitude) - 1, len(_ROBINSON_LATS) - 2)
+            fraction = (magnitude - _ROBINSON_LATS[index]) / 5
+            x = _ROBINSON_X[index] + (_ROBINSON_X[index + 1] - _ROBINSON_X[index]) * fraction
+            y = _ROBINSON_Y[index] + (_ROBINSON_Y[index + 1] - _ROBINSON_Y[index]) * fraction
+            projected.append((x * lon, math.copysign(y * _ROBINSON_Y_SCALE, lat)))
+        return projected
+
+
+@dataclass(frozen=True)
+class Orthographic(Projection):
+    """The globe seen from space above ``(center_lon, center_lat)``; the far side is hidden."""
+
+    center_lon: float = 0.0
+    center_lat: float = 0.0
+    name = "orthographic"
+    radius = 90.0
+    journey_centered = True
+
+    @classmethod
+    def centered_on(cls, visits: Sequence[Coordinate], snap: float = 5.0) -> "Orthographic":
+        """Center on the average position of ``visits``.
+
+        The center is snapped to a ``snap``-degree grid so similar journeys share the
+        cached projected geometry.
+        """
+        x = y = z = 0.0
+        for _, lat, lon in visits:
+            lat, lon = math.radians(lat), math.radians(lon)
+            x += math.cos(lat) * math.cos(lon)
+            y += math.cos(lat) * math.sin(lon)
+            z += math.sin(lat)
+        if not visits or math.hypot(x, y, z) < 1e-9:
+            return cls()
+        lon = math.degrees(math.atan2(y, x))
+        lat = math.degrees(math.atan2(z, math.hypot(x, y)))
+        return cls(round(lon / snap) * snap, round(lat / snap) * snap)
+
+    def _project(self, points: Iterable[Point], clamp: bool) -> List[Optional[Point]]:
+        radius = self.radius
+        center_lon = math.radians(self.center_lon)
+        sin_center, cos_center = math.sin(math.radians(self.center_lat)), math.cos(math.radians(self.center_lat))
+        projected = []
+        for lon, lat in points:
+            lat, delta = math.radians(lat), math.radians(lon) - center_lon
+            cos_lat, sin_lat, cos_delta = math.cos(lat), math.sin(lat), math.cos(delta)
+            x = cos_lat * math.sin(delta)
+            y = cos_center * sin_lat - sin_center * cos_lat * cos_delta
+            if sin_center * sin_lat + cos_center * cos_lat * cos_delta < 0:
+                if not clamp:
+                    projected.append(None)
+                    continue
+                # Pin hidden outline points to the horizon so filled shapes stay closed.
+                length = math.hypot(x, y) or 1.0
+                x, y = x / length, y / length
+            projected.append((radius * x, radius * y))
+        return projected
+
+    def project_points(self, points: Iterable[Point]) -> List[Optional[Point]]:
+        return self._project(points, clamp=False)
+
+    def project_polygon(self, outline: Sequence[Point]) -> Polyline:
+        points = densify(outline)
+        if all(point is None for point in self._project(points, clamp=False)):
+            return ()
+        return tuple(self._project(points, clamp=True))
+
+    def outline(self) -> Polyline:
+        steps = 180
+        return tuple(
+            (self.radius * math.cos(2 * math.pi * step / steps), self.radius * math.sin(2 * math.pi * step / steps))
+            for step in range(steps)
+        )
+
+
+PROJECTIONS = {
+    "equirectangular": Equirectangular,
+    "mercator": Mercator,
+    "robinson": Robinson,
+    "orthographic": Orthographic,
+}
+EQUIRECTANGULAR = Equirectangular()
+
+
+def make_projection(name: str = "equirectangular", visits: Sequence[Coordinate] = ()) -> Projection:
+    """Look up a projection by name; orthographic views are centered on ``visits``."""
+    if name not in PROJECTIONS:
+        raise ValueError(f"unknown projection {name!r}; choose from {', '.join(PROJECTIONS)}")
+    if name == "orthographic":
+        return Orthographic.centered_on(visits)
+    return PROJECTIONS[name]()
+
+
+@lru_cache(maxsize=32)
+def projected_outline(projection: Projection) -> Polyline:
+    return tuple(projection.outline())
+
+
+@lru_cache(maxsize=32)
+def projected_graticule(projection: Projection) -> Tuple[Polyline, ...]:
+    return tuple(projection.graticule())
+
+
+@lru_cache(maxsize=32)
+def projected_landmasses(projection: Projection) -> Tuple[Polyline, ...]:
+    polygons = (projection.project_polygon(outline) for outline in LANDMASSES)
+    return tuple(polygon for polygon in polygons if len(polygon) > 2)
+
+
+@lru_cache(maxsize=ARC_CACHE_SIZE)
+def projected_leg(projection: Projection, start: Coordinate, end: Coordinate) -> Tuple[Polyline, ...]:
+    """The great-circle arc for a leg, projected; cached per projection and leg."""
+    if isinstance(projection, Equirectangular):
+        return leg_arc(start, end)
+    return tuple(piece for arc in leg_arc(start, end) for piece in projection.project_line(arc))
+
+
+def projected_places(projection: Projection, places: Iterable[Coordinate]) -> List[Coordinate]:
+    """``(name, y, x)`` for each visible place, in the same order as the visit tuples."""
+    visible = []
+    for name, lat, lon in places:
+        point = projection.project(lon, lat)
+        if point is not None:
+            visible.append((name, point[1], point[0]))
+    return visible
@@ -0,0 +1,344 @@
+"""Offscreen travel map renderer that writes PNG files without Tk.
+
+Draws the same ocean, graticule, continents and route as ``map_visualizer`` into an
+RGB byte buffer and encodes it with ``zlib``, so servers can produce a map for every
+finished session.
+
+    python raster_map.py journeys.jsonl --out maps/ --workers 4
+    python raster_map.py journeys.jsonl --out maps/ --projection robinson
+"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+import argparse
+import hashlib
+import json
+import math
+import os
+import struct
+import zlib
+
+from locations import as_locations
+from map_geometry import (
+    GRATICULE_COLOR,
+    GRATICULE_STEP,
+    LAND_COLOR,
+    LANDMASSES,
+    MAP_BOUNDS,
+    MARKER_COLOR,
+    OCEAN_COLOR,
+    SPACE_COLOR,
+)
+from projections import (
+    EQUIRECTANGULAR,
+    PROJECTIONS,
+    Projection,
+    make_projection,
+    projected_graticule,
+    projected_landmasses,
+    projected_leg,
+    projected_outline,
+    projected_places,
+)
+from route_aggregation import aggregate_route, leg_color, leg_width
+
+Color = Tuple[int, int, int]
+Coordinate = Tuple[str, float, float]
+
+# Rendered base layers are kept here between runs, keyed by size and map geometry.
+MAP_CACHE_DIR = Path(__file__).with_name(".map_cache")
+BASE_LAYER_VERSION = 2
+
+NAMED_COLORS = {"gold": (255, 215, 0), "white": (255, 255, 255), "black": (0, 0, 0)}
+
+
+def parse_color(color: str) -> Color:
+    if color.startswith("#"):
+        return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+    return NAMED_COLORS[color]
+
+
+class RasterCanvas:
+    """An RGB pixel buffer addressed in lon/lat world coordinates."""
+
+    def __init__(self, width: int, height: int, bounds: Tuple[float, float, float, float] = MAP_BOUNDS) -> None:
+        self.width = width
+        self.height = height
+        self.bounds = bounds
+        self.pixels = bytearray(width * height * 3)
+        west, south, east, north = bounds
+        self._x_scale = width / (east - west)
+        self._y_scale = height / (north - south)
+
+    def to_pixel(self, lon: float, lat: float) -> Tuple[float, float]:
+        west, _, _, north = self.bounds
+        return (lon - west) * self._x_scale, (north - lat) * self._y_scale
+
+    def fill(self, color: Color) -> None:
+        self.pixels[:] = bytes(color) * (self.width * self.height)
+
+    def _span(self, y: int, x0: int, x1: int, color: bytes) -> None:
+        x0, x1 = max(0, x0), min(self.width, x1)
+        if 0 <= y < self.height and x0 < x1:
+            start = (y * self.width + x0) * 3
+            self.pixels[start:start + (x1 - x0) * 3] = color * (x1 - x0)
+
+    def hline(self, lat: float, color: Color) -> None:
+        y = int(self.to_pixel(0, lat)[1])
+        self._span(min(y, self.height - 1), 0, self.width, bytes(color))
+
+    def vline(self, lon: float, color: Color) -> None:
+        x = min(int(self.to_pixel(lon, 0)[0]), self.width - 1)
+        if 0 <= x < self.width:
+            pixels = self.pixels
+            red, green, blue = color
+            for offset in range(x * 3, len(pixels), self.width * 3):
+                pixels[offset] = red
+                pixels[offset + 1] = green
+                pixels[offset + 2] = blue
+
+    def fill_polygon(self, outline: Sequence[Tuple[float, float]], color: Color) -> None:
+        """Scanline fill with the even-odd rule, sampling at pixel centers."""
+        points = [self.to_pixel(lon, lat) for lon, lat in outline]
+        edges = []
+        for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]):
+            if y0 == y1:
+                continue
+            if y0 > y1:
+                x0, y0, x1, y1 = x1, y1, x0, y0
+            edges.append((y0, y1, x0, (x1 - x0) / (y1 - y0)))
+        if not edges:
+            return
+        packed = bytes(color)
+        top = max(0, math.ceil(min(edge[0] for edge in edges) - 0.5))
+        bottom = min(self.height - 1, math.floor(max(edge[1] for edge in edges) - 0.5))
+        for y in range(top, bottom + 1):
+            center = y + 0.5
+            crossings = sorted(
+                x0 + (center - y0) * slope for y0, y1, x0, slope in edges if y0 <= center < y1
+            )
+            for left, right in zip(crossings[::2], crossings[1::2]):
+                self._span(y, math.ceil(left - 0.5), math.ceil(right - 0.5), packed)
+
+    def line(self, start: Tuple[float, float], end: Tuple[float, float], color: Color, width: int = 1) -> None:
+        """Anti-aliased line between two lon/lat points (Xiaolin Wu's algorithm, widened).
+
+        Each column gets ``width`` fully covered pixels with fractional ones on either side.
+        """
+        x0, y0 = self.to_pixel(*start)
+        x1, y1 = self.to_pixel(*end)
+        steep = abs(y1 - y0) > abs(x1 - x0)
+        if steep:
+            x0, y0, x1, y1 = y0, x0, y1, x1
+        if x0 > x1:
+            x0, x1, y0, y1 = x1, x0, y1, y0
+        gradient = (y1 - y0) / (x1 - x0) if x1 != x0 else 0.0
+        pixels = self.pixels
+        columns, rows = (self.height, self.width) if steep else (self.width, self.height)
+        # Offsets of one step along the line's major and minor axes.
+        major, minor = (self.width * 3, 3) if steep else (3, self.width * 3)
+        red, green, blue = color
+        first = max(0, int(round(x0)))
+        last = min(columns - 1, int(round(x1)))
+        y = y0 + (first - x0) * gradient - (width - 1) / 2
+        for x in range(first, last + 1):
+            row = math.floor(y)
+            coverage = y - row
+            base = x * major
+            for step, alpha in enumerate([1 - coverage] + [1.0] * (width - 1) + [coverage]):
+                minor_index = row + step
+                if 0 <= minor_index < rows and alpha > 0:
+                    offset = base + minor_index * minor
+                    pixels[offset] += int((red - pixels[offset]) * alpha)
+                    pixels[offset + 1] += int((green - pixels[offset + 1]) * alpha)
+                    pixels[offset + 2] += int((blue - pixels[offset + 2]) * alpha)
+            y += gradient
+
+    def dot(self, lon: float, lat: float, diameter: int, color: Color) -> None:
+        cx, cy = self.to_pixel(lon, lat)
+        radius = diameter / 2
+        packed = bytes(color)
+        for y in range(math.floor(cy - radius), math.ceil(cy + radius) + 1):
+            half = radius * radius - (y + 0.5 - cy) ** 2
+            if half >= 0:
+                reach = math.sqrt(half)
+                self._span(y, math.ceil(cx - reach - 0.5), math.ceil(cx + reach - 0.5), packed)
+
+    def to_png(self, compression: int = 6) -> bytes:
+        return encode_png(self.width, self.height, self.pixels, compression)
+
+
+def encode_png(width: int, height: int, pixels: Union[bytes, bytearray], compression: int = 6) -> bytes:
+    """Encode 8-bit RGB rows as a PNG using only the standard library."""
+    stride = width * 3
+    view = memoryview(pixels)
+    raw = b"".join(b"\x00" + view[row:row + stride] for row in range(0, height * stride, stride))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw, compression))
+        + chunk(b"IEND", b"")
+    )
+
+
+def draw_base_map(canvas: RasterCanvas, projection: Projection = EQUIRECTANGULAR) -> None:
+    """Ocean, 30-degree graticule and continents, matching the Turtle map."""
+    canvas.fill(parse_color(SPACE_COLOR))
+    canvas.fill_polygon(projected_outline(projection), parse_color(OCEAN_COLOR))
+    grid = parse_color(GRATICULE_COLOR)
+    for line in projected_graticule(projection):
+        if len(line) == 2 and line[0][0] == line[1][0]:
+            canvas.vline(line[0][0], grid)
+        elif len(line) == 2 and line[0][1] == line[1][1]:
+            canvas.hline(line[0][1], grid)
+        else:
+            for start, end in zip(line, line[1:]):
+                canvas.line(start, end, grid)
+    land = parse_color(LAND_COLOR)
+    for outline in projected_landmasses(projection):
+        canvas.fill_polygon(outline, land)
+
+
+def _base_layer_key(width: int, height: int, projection: Projection = EQUIRECTANGULAR) -> str:
+    geometry = repr(
+        (BASE_LAYER_VERSION, MAP_BOUNDS, OCEAN_COLOR, GRATICULE_COLOR, GRATICULE_STEP, LAND_COLOR, LANDMASSES, projection)
+    )
+    return f"base-{width}x{height}-{hashlib.sha256(geometry.encode()).hexdigest()[:16]}.rgb"
+
+
+@lru_cache(maxsize=8)
+def base_layer(width: int, height: int, projection: Projection = EQUIRECTANGULAR) -> bytes:
+    """The static ocean/graticule/continent pixels for one output size and projection.
+
+    Cached in memory and in ``MAP_CACHE_DIR``, so the base map is drawn once per size
+    rather than once per journey. Journey-centered views only use the memory cache:
+    there is one per globe center, and the disk cache is never pruned.
+    """
+    path = MAP_CACHE_DIR / _base_layer_key(width, height, projection)
+    if not projection.journey_centered:
+        try:
+            pixels = path.read_bytes()
+            if len(pixels) == width * height * 3:
+                return pixels
+        except OSError:
+            pass
+    canvas = RasterCanvas(width, height, projection.view_bounds(width, height))
+    draw_base_map(canvas, projection)
+    pixels = bytes(canvas.pixels)
+    if projection.journey_centered:
+        return pixels
+    try:
+        MAP_CACHE_DIR.mkdir(exist_ok=True)
+        temporary = path.with_name(path.name + f".{os.getpid()}.tmp")
+        temporary.write_bytes(pixels)
+        os.replace(temporary, path)
+    except OSError:
+        pass
+    return pixels
+
+
+def draw_route(canvas: RasterCanvas, visits: List[Coordinate], projection: Projection = EQUIRECTANGULAR) -> None:
+    """Route lines and stop markers; place names need a font, so they are left out.
+
+    Each distinct leg is drawn once as a great-circle arc, wider and redder the more
+    often it was traveled.
+    """
+    route = aggregate_route(visits)
+    for (start, end), count in route.legs.items():
+        color = parse_color(leg_color(count, route.busiest))
+        width = leg_width(count, route.busiest)
+        for piece in projected_leg(projection, start, end):
+            for segment_start, segment_end in zip(piece, piece[1:]):
+                canvas.line(segment_start, segment_end, color, width=width)
+    marker = parse_color(MARKER_COLOR)
+    for _, y, x in projected_places(projection, route.places):
+        canvas.dot(x, y, 8, marker)
+
+
+def render_map(
+    visits: Union[List[Coordinate], array],
+    width: int = 1000,
+    height: int = 600,
+    cached_base: bool = True,
+    projection: str = "equirectangular",
+) -> RasterCanvas:
+    """Composite the journey's route over the base map in the named projection."""
+    visits = as_locations(visits)
+    chosen = make_projection(projection, visits)
+    canvas = RasterCanvas(width, height, chosen.view_bounds(width, height))
+    if cached_base:
+        canvas.pixels[:] = base_layer(width, height, chosen)
+    else:
+        draw_base_map(canvas, chosen)
+    draw_route(canvas, visits, chosen)
+    return canvas
+
+
+def save_map_png(
+    visits: Union[List[Coordinate], array],
+    path: Path,
+    width: int = 1000,
+    height: int = 600,
+    projection: str = "equirectangular",
+) -> Path:
+    path = Path(path)
+    path.write_bytes(render_map(visits, width, height, projection=projection).to_png())
+    return path
+
+
+def _render_one(job: Tuple[List[Coordinate], str, int, int, str]) -> str:
+    visits, path, width, height, projection = job
+    return str(save_map_png(visits, Path(path), width, height, projection))
+
+
+def render_batch(
+    journeys: Iterable[List[Coordinate]],
+    out_dir: Path,
+    workers: Optional[int] = None,
+    width: int = 1000,
+    height: int = 600,
+    projection: str = "equirectangular",
+) -> List[str]:
+    """Render ``journey-<n>.png`` for each journey, spread across a process pool."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs = (
+        (as_locations(visits), str(out_dir / f"journey-{index}.png"), width, height, projection)
+        for index, visits in enumerate(journeys)
+    )
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_one, jobs, chunksize=16))
+
+
+def read_journeys(path: Path) -> Iterable[List[Coordinate]]:
+    """Stream the visited places from ``replay.py`` JSON lines output."""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield [tuple(place) for place in json.loads(line)["places"]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Render travel maps to PNG without a display.")
+    parser.add_argument("journeys", type=Path, help="JSON lines from replay.py")
+    parser.add_argument("--out", type=Path, default=Path("maps"))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--projection", choices=list(PROJECTIONS), default="equirectangular")
+    args = parser.parse_args()
+    written = render_batch(
+        read_journeys(args.journeys), args.out, args.workers, args.width, args.height, args.projection
+    )
+    print(f"Wrote {len(written)} maps to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
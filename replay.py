@@ -0,0 +1,100 @@
+"""Replay scripted choices through the story without ``input()``.
+
+Each input line is one journey: the choices a player would type, e.g. ``1 3 2 quit``.
+Every line is walked through the same node traversal as ``main.play_adventure`` and
+written out as one JSON line with the visited places and any rejected choices.
+
+    python replay.py choices.txt -o journeys.jsonl --workers 4
+    echo "1 3 2 quit" | python replay.py
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, TextIO
+import argparse
+import json
+import sys
+
+from locations import location_table
+from travel_story import Session, get_node, get_start_node_id, parse_choice
+
+
+def replay_line(line: str) -> str:
+    """Play one line of choices and return its JSON result (without a newline).
+
+    Invalid choices are reported in ``errors`` and skipped, the way ``prompt_choice``
+    asks again; ``quit`` (or the end of the line) finishes the journey.
+    """
+    session = Session(0, get_start_node_id())
+    errors = []
+    for position, raw in enumerate(line.split(), start=1):
+        node = get_node(session.node_id)
+        try:
+            choice = parse_choice(raw, len(node.options))
+        except ValueError:
+            errors.append(f"choice {position}: {raw!r} is not an option at {node.node_id}")
+            continue
+        if choice is None:
+            break
+        session.choose(choice)
+    table = location_table()
+    return json.dumps(
+        {"places": [list(table[location_id]) for location_id in session.journey], "node_id": session.node_id, "errors": errors},
+        ensure_ascii=False,
+    )
+
+
+def _replay_chunk(lines: List[str]) -> List[str]:
+    return [replay_line(line) for line in lines]
+
+
+def _chunks(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(lines)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def replay_stream(lines: Iterable[str], output: TextIO, workers: int = 1, chunk_size: int = 2000) -> int:
+    """Replay every non-blank line of ``lines`` to ``output`` in order; returns the count.
+
+    Input is read and results are written a chunk at a time, so memory stays flat
+    however long the input is. With ``workers > 1`` chunks are played in a process pool.
+    """
+    lines = (line for line in lines if line.strip())
+    count = 0
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() keeps results in input order while workers run ahead.
+            for results in pool.map(_replay_chunk, _chunks(lines, chunk_size)):
+                output.write("\n".join(results) + "\n")
+                count += len(results)
+    else:
+        for chunk in _chunks(lines, chunk_size):
+            output.write("\n".join(_replay_chunk(chunk)) + "\n")
+            count += len(chunk)
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay scripted journeys, one line of choices per journey.")
+    parser.add_argument("input", nargs="?", default="-", help="file of choice lines, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="where to write JSON lines, or - for stdout")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    destination = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        count = replay_stream(source, destination, args.workers)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if destination is not sys.stdout:
+            destination.close()
+    print(f"Replayed {count} journeys", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Collapse a journey into distinct legs and places with how often each was used.
+
+Looping journeys (East Lansing, Dublin, Las Vegas...) repeat the same legs many times;
+drawing the aggregated legs once each keeps map rendering proportional to the number
+of distinct legs instead of the journey length.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+import math
+
+from map_geometry import ROUTE_COLOR
+
+Coordinate = Tuple[str, float, float]
+Leg = Tuple[Coordinate, Coordinate]
+
+# Leg color runs from the normal route gold (ROUTE_COLOR) to this for the most traveled leg.
+BUSY_LEG_COLOR = "#ff5a1f"
+MAX_LEG_WIDTH = 6
+
+
+@dataclass
+class RouteSummary:
+    legs: Dict[Leg, int]
+    places: Counter
+
+    @property
+    def busiest(self) -> int:
+        return max(self.legs.values(), default=0)
+
+
+def aggregate_route(visits: List[Coordinate]) -> RouteSummary:
+    """Count each leg (in either direction) and each place in ``visits``.
+
+    Legs are keyed by their two ends in first-traveled order; staying put is not a leg.
+    """
+    directed = Counter(zip(visits, visits[1:]))
+    legs: Dict[Leg, int] = {}
+    for (start, end), count in directed.items():
+        if start == end:
+            continue
+        key = (end, start) if (end, start) in legs else (start, end)
+        legs[key] = legs.get(key, 0) + count
+    return RouteSummary(legs=legs, places=Counter(visits))
+
+
+def leg_weight(count: int, busiest: int) -> float:
+    """0.0 for a leg traveled once, 1.0 for the busiest leg, on a log scale."""
+    if busiest <= 1:
+        return 0.0
+    return math.log(count) / math.log(busiest)
+
+
+def leg_width(count: int, busiest: int, base: int = 2) -> int:
+    return base + round((MAX_LEG_WIDTH - base) * leg_weight(count, busiest))
+
+
+def blend_hex(low: str, high: str, weight: float) -> str:
+    channels = [
+        round(int(low[index:index + 2], 16) + (int(high[index:index + 2], 16) - int(low[index:index + 2], 16)) * weight)
+        for index in (1, 3, 5)
+    ]
+    return "#" + "".join(f"{channel:02x}" for channel in channels)
+
+
+def leg_color(count: int, busiest: int, low: str = ROUTE_COLOR) -> str:
+    return blend_hex(low, BUSY_LEG_COLOR, leg_weight(count, busiest))
@@ -0,0 +1,363 @@
+"""Plan routes through the story: the fewest choices, or the fewest kilometres, to a node.
+
+Every node has a place: where the options leading into it take the player (the most
+common one if they disagree; a node no option locates keeps the place the player came
+from). A choice costs the great-circle distance between the places of the two nodes,
+so A* with the great-circle distance to the target as its estimate finds the shortest
+trip exactly.
+
+For serving, ``NextHopTable`` stores the option to pick next for every pair of nodes,
+one byte per pair and route kind, so a hint is a single lookup. The table is cached
+next to the compiled story, keyed by the story source hash. Stories too big to
+tabulate get their hints from a search instead.
+
+    python route_planner.py start tokyo
+"""
+from collections import Counter, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+import argparse
+import hashlib
+import heapq
+import math
+import os
+import struct
+import threading
+
+from trip_stats import haversine_km
+
+Location = Tuple[str, float, float]
+
+TABLE_MAGIC = b"TSRT"
+TABLE_VERSION = 1
+# Table entries are option indices stored in a byte; this one means "no route".
+NO_ROUTE = 255
+_TABLE_HEADER = struct.Struct("<4sHxxI")
+# The tables grow with the square of the node count; 4096 nodes take 32 MB.
+MAX_TABLE_NODES = 4096
+
+
+@dataclass(frozen=True)
+class Route:
+    """The nodes from source to target and the choice numbers to type on the way."""
+
+    nodes: List[str]
+    choices: List[int]
+    km: float
+
+
+class RoutePlanner:
+    """Fewest-choices and shortest-distance routes over a ``node_id -> StoryNode`` mapping."""
+
+    def __init__(self, graph: Mapping, start: str = "start", start_place: Optional[Location] = None) -> None:
+        self.node_ids = list(graph)
+        self.positions = {node_id: position for position, node_id in enumerate(self.node_ids)}
+        targets: List[List[Tuple[int, int]]] = []
+        arrivals = [Counter() for _ in self.node_ids]
+        for node_id in self.node_ids:
+            edges = []
+            for option_index, option in enumerate(graph[node_id].options):
+                target = self.positions.get(option.next_id)
+                if target is None:
+                    continue
+                edges.append((option_index, target))
+                if option.location:
+                    arrivals[target][tuple(option.location)] += 1
+            targets.append(edges)
+        self.places: List[Optional[Location]] = [
+            counts.most_common(1)[0][0] if counts else None for counts in arrivals
+        ]
+        if start in self.positions and self.places[self.positions[start]] is None:
+            self.places[self.positions[start]] = start_place
+        self._inherit_places(targets)
+        # edges[node] lists (option index, target node, km) for options leading to a node.
+        self.edges: List[List[Tuple[int, int, float]]] = [
+            [(option_index, target, self._km(node, target)) for option_index, target in node_edges]
+            for node, node_edges in enumerate(targets)
+        ]
+        # The distance estimate only stays a lower bound if every node has a place.
+        self._estimates = all(place is not None for place in self.places)
+
+    def _inherit_places(self, targets: List[List[Tuple[int, int]]]) -> None:
+        """Give unplaced nodes the place of the nearest placed node that leads to them."""
+        queue = deque(node for node, place in enumerate(self.places) if place is not None)
+        while queue:
+            node = queue.popleft()
+            for _, target in targets[node]:
+                if self.places[target] is None:
+                    self.places[target] = self.places[node]
+                    queue.append(target)
+
+    def _km(self, node: int, target: int) -> float:
+        here, there = self.places[node], self.places[target]
+        if here is None or there is None:
+            return 0.0
+        return haversine_km(here[1], here[2], there[1], there[2])
+
+    def _position(self, node_id: str) -> int:
+        position = self.positions.get(node_id)
+        if position is None:
+            raise KeyError(node_id)
+        return position
+
+    def _route(self, parents: Dict[int, Tuple[int, int, float]], source: int, target: int) -> Route:
+        nodes, choices, km = [target], [], 0.0
+        while nodes[-1] != source:
+            parent, option_index, leg_km = parents[nodes[-1]]
+            nodes.append(parent)
+            choices.append(option_index + 1)
+            km += leg_km
+        return Route([self.node_ids[node] for node in reversed(nodes)], choices[::-1], km)
+
+    def fewest_choices(self, source: str, target: str) -> Optional[Route]:
+        """Breadth-first search for the route with the fewest choices, or ``None``."""
+        origin, goal = self._position(source), self._position(target)
+        parents: Dict[int, Tuple[int, int, float]] = {}
+        queue = deque([origin])
+        seen = {origin}
+        while queue:
+            node = queue.popleft()
+            if node == goal:
+                return self._route(parents, origin, goal)
+            for option_index, next_node, km in self.edges[node]:
+                if next_node not in seen:
+                    seen.add(next_node)
+                    parents[next_node] = (node, option_index, km)
+                    queue.append(next_node)
+        return None
+
+    def shortest_km(self, source: str, target: str) -> Optional[Route]:
+        """A* search for the route covering the fewest great-circle kilometres, or ``None``."""
+        origin, goal = self._position(source), self._position(target)
+        goal_place = self.places[goal]
+
+        def estimate(node: int) -> float:
+            return self._km(node, goal) if self._estimates and goal_place is not None else 0.0
+
+        parents: Dict[int, Tuple[int, int, float]] = {}
+        distances = {origin: 0.0}
+        done = set()
+        heap = [(estimate(origin), 0.0, origin)]
+        while heap:
+            _, distance, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            if node == goal:
+                return self._route(parents, origin, goal)
+            done.add(node)
+            for option_index, next_node, km in self.edges[node]:
+                candidate = distance + km
+                if candidate < distances.get(next_node, math.inf):
+                    distances[next_node] = candidate
+                    parents[next_node] = (node, option_index, km)
+                    heapq.heappush(heap, (candidate + estimate(next_node), candidate, next_node))
+        return None
+
+
+class NextHopTable:
+    """The option to pick next from every node toward every other node.
+
+    Each route kind is a ``count * count`` byte table indexed by ``source * count + target``.
+    """
+
+    def __init__(self, node_ids: List[str], shortest: bytes, fewest: bytes) -> None:
+        self.node_ids = node_ids
+        self.positions = {node_id: position for position, node_id in enumerate(node_ids)}
+        self._tables = {"km": shortest, "choices": fewest}
+
+    @classmethod
+    def build(cls, planner: RoutePlanner) -> "NextHopTable":
+        """Search backward from every target once: breadth-first for choices, Dijkstra for km."""
+        count = len(planner.node_ids)
+        if count > MAX_TABLE_NODES:
+            raise ValueError(f"{count} nodes is too many for a next-hop table (at most {MAX_TABLE_NODES})")
+        predecessors: List[List[Tuple[int, int, float]]] = [[] for _ in range(count)]
+        for node, edges in enumerate(planner.edges):
+            for option_index, target, km in edges:
+                if option_index >= NO_ROUTE:
+                    raise ValueError(f"{planner.node_ids[node]} has more than {NO_ROUTE} options")
+                predecessors[target].append((node, option_index, km))
+        shortest = bytearray([NO_ROUTE]) * (count * count)
+        fewest = bytearray([NO_ROUTE]) * (count * count)
+        for target in range(count):
+            seen = bytearray(count)
+            seen[target] = 1
+            frontier = [target]
+            while frontier:
+                reached = []
+                for node in frontier:
+                    for source, option_index, _ in predecessors[node]:
+                        if not seen[source]:
+                            seen[source] = 1
+                            fewest[source * count + target] = option_index
+                            reached.append(source)
+                frontier = reached
+
+            distances = {target: 0.0}
+            done = bytearray(count)
+            heap = [(0.0, target)]
+            while heap:
+                distance, node = heapq.heappop(heap)
+                if done[node]:
+                    continue
+                done[node] = 1
+                for source, option_index, km in predecessors[node]:
+                    candidate = distance + km
+                    if candidate < distances.get(source, math.inf):
+                        distances[source] = candidate
+                        shortest[source * count + target] = option_index
+                        heapq.heappush(heap, (candidate, source))
+        return cls(planner.node_ids, bytes(shortest), bytes(fewest))
+
+    def hint(self, source: str, target: str, by: str = "km") -> Optional[int]:
+        """The choice number to type at ``source`` to head for ``target``; ``None`` if there's no way."""
+        count = len(self.node_ids)
+        option_index = self._tables[by][self.positions[source] * count + self.positions[target]]
+        return None if option_index == NO_ROUTE else option_index + 1
+
+    def choices(self, graph: Mapping, source: str, target: str, by: str = "km") -> Optional[List[int]]:
+        """Every choice number from ``source`` to ``target``, following the hints."""
+        choices: List[int] = []
+        node_id = source
+        while node_id != target:
+            choice = self.hint(node_id, target, by)
+            if choice is None:
+                return None
+            choices.append(choice)
+            node_id = graph[node_id].options[choice - 1].next_id
+        return choices
+
+    def save(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(temporary, "wb") as handle:
+            handle.write(_TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, len(self.node_ids)))
+            handle.write(self._tables["km"])
+            handle.write(self._tables["choices"])
+        os.replace(temporary, path)
+        return path
+
+    @classmethod
+    def load(cls, path: Path, node_ids: List[str]) -> "NextHopTable":
+        """Read a table saved for a story whose nodes are ``node_ids``, in that order."""
+        data = Path(path).read_bytes()
+        if len(data) < _TABLE_HEADER.size:
+            raise ValueError(f"{path} is not a route table")
+        magic, version, count = _TABLE_HEADER.unpack_from(data)
+        size = count * count
+        if magic != TABLE_MAGIC or version != TABLE_VERSION or count != len(node_ids):
+            raise ValueError(f"{path} is not a route table for this story (format {TABLE_VERSION})")
+        if len(data) != _TABLE_HEADER.size + 2 * size:
+            raise ValueError(f"{path} is truncated")
+        start = _TABLE_HEADER.size
+        return cls(node_ids, data[start:start + size], data[start + size:])
+
+
+def _table_path(source: Path, cache_dir: Path) -> Path:
+    from story_compiler import content_hash
+
+    key = hashlib.sha256(f"routes-{TABLE_VERSION}:{content_hash(source, cache_dir)}".encode()).hexdigest()
+    return Path(cache_dir) / f"routes-{key[:16]}.bin"
+
+
+def load_or_build_table(planner: RoutePlanner, source: Path, cache_dir: Path) -> NextHopTable:
+    """The next-hop table for this version of ``source``, building it into the cache if needed."""
+    path = _table_path(source, cache_dir)
+    try:
+        return NextHopTable.load(path, planner.node_ids)
+    except (OSError, ValueError):
+        pass
+    table = NextHopTable.build(planner)
+    try:
+        table.save(path)
+    except OSError:
+        pass
+    return table
+
+
+_live_planner: Optional[Tuple[Mapping, RoutePlanner]] = None
+_live_table: Optional[Tuple[Mapping, NextHopTable]] = None
+# The server asks from worker threads, so each is built by one thread at a time. Separate
+# locks let planner searches go ahead while a table is being built.
+_planner_lock = threading.Lock()
+_table_lock = threading.Lock()
+
+
+def live_planner() -> RoutePlanner:
+    """The planner for the live story; rebuilt after the story is swapped, e.g. by a hot reload."""
+    global _live_planner
+    import travel_story
+
+    graph = travel_story.STORY_GRAPH
+    with _planner_lock:
+        if _live_planner is None or _live_planner[0] is not graph:
+            planner = RoutePlanner(graph, travel_story.get_start_node_id(), travel_story.START_LOCATION)
+            _live_planner = graph, planner
+        return _live_planner[1]
+
+
+def live_table() -> NextHopTable:
+    """The next-hop table for the live story, loaded from the cache or built on first use."""
+    global _live_table
+    import travel_story
+
+    graph = travel_story.STORY_GRAPH
+    with _table_lock:
+        if _live_table is None or _live_table[0] is not graph:
+            table = load_or_build_table(live_planner(), travel_story.story_source(), travel_story.STORY_CACHE_DIR)
+            _live_table = graph, table
+        return _live_table[1]
+
+
+def ready_table() -> Optional[NextHopTable]:
+    """The live story's next-hop table if it has been built already; never builds it."""
+    import travel_story
+
+    live = _live_table
+    return live[1] if live is not None and live[0] is travel_story.STORY_GRAPH else None
+
+
+def next_choice(source: str, target: str, by: str = "km", build_table: bool = True) -> Optional[int]:
+    """The live story's hint: a table lookup, or a search if the story is too big to tabulate.
+
+    With ``build_table=False`` a table that isn't ready for the live story is not built
+    here (it can take a minute); the hint is searched for instead.
+    """
+    planner = live_planner()
+    table = None
+    if len(planner.node_ids) <= MAX_TABLE_NODES:
+        table = live_table() if build_table else ready_table()
+    if table is not None:
+        return table.hint(source, target, by)
+    route = planner.shortest_km(source, target) if by == "km" else planner.fewest_choices(source, target)
+    return route.choices[0] if route and route.choices else None
+
+
+def describe_route(route: Optional[Route], kind: str) -> str:
+    if route is None:
+        return f"{kind}: no route"
+    if not route.choices:
+        return f"{kind}: you're already there"
+    return (
+        f"{kind}: type {' then '.join(map(str, route.choices))} "
+        f"({len(route.choices)} choices, {route.km:,.0f} km via {' > '.join(route.nodes[1:])})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find the shortest way between two story nodes.")
+    parser.add_argument("source", help="node id to start from")
+    parser.add_argument("target", help="node id to reach")
+    args = parser.parse_args()
+    planner = live_planner()
+    try:
+        print(describe_route(planner.fewest_choices(args.source, args.target), "Fewest choices"))
+        print(describe_route(planner.shortest_km(args.source, args.target), "Shortest trip"))
+    except KeyError as error:
+        raise SystemExit(f"No story node {error}")
+
+
+if __name__ == "__main__":
+    main()
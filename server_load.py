@@ -0,0 +1,103 @@
+"""Local load generator for ``game_server.py``.
+
+Opens idle connections and runs scripted players concurrently, then reports completed
+sessions per second and response latency percentiles.
+
+    python game_server.py --port 7777 &
+    python server_load.py --port 7777 --sessions 5000 --concurrency 500 --idle 10000
+"""
+from typing import List
+import argparse
+import asyncio
+import random
+import time
+
+from game_server import NAME_PROMPT, PROMPT, _raise_open_file_limit
+
+
+async def _play(host: str, port: int, choices: int, rng: random.Random, latencies: List[float]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    prompt = PROMPT.encode()
+    await reader.readuntil(NAME_PROMPT.encode())
+    sent = time.perf_counter()
+    writer.write(b"load tester\r\n")
+    await reader.readuntil(prompt)
+    latencies.append(time.perf_counter() - sent)
+    for _ in range(choices):
+        sent = time.perf_counter()
+        # Every story node has at least three options.
+        writer.write(f"{rng.randint(1, 3)}\r\n".encode())
+        await reader.readuntil(prompt)
+        latencies.append(time.perf_counter() - sent)
+    writer.write(b"quit\r\n")
+    await reader.read()
+    writer.close()
+
+
+async def _hold_idle(host: str, port: int, count: int, ready: asyncio.Event, release: asyncio.Event) -> int:
+    connections = []
+    for _ in range(count):
+        try:
+            connections.append(await asyncio.open_connection(host, port))
+        except OSError:
+            break
+    ready.set()
+    await release.wait()
+    for _, writer in connections:
+        writer.close()
+    return len(connections)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def run_load(host: str, port: int, sessions: int, concurrency: int, choices: int, idle: int, seed: int) -> None:
+    ready, release = asyncio.Event(), asyncio.Event()
+    idle_task = asyncio.create_task(_hold_idle(host, port, idle, ready, release))
+    await ready.wait()
+
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    limit = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one_session() -> None:
+        nonlocal failures
+        async with limit:
+            try:
+                await _play(host, port, choices, rng, latencies)
+            except (OSError, asyncio.IncompleteReadError):
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+    release.set()
+    held = await idle_task
+
+    print(f"Idle connections held: {held}")
+    print(f"{sessions - failures} sessions in {elapsed:.2f}s ({(sessions - failures) / elapsed:,.0f} sessions/s), {failures} failed")
+    print(
+        f"Response latency: p50 {_percentile(latencies, 0.50) * 1000:.2f} ms, "
+        f"p99 {_percentile(latencies, 0.99) * 1000:.2f} ms over {len(latencies)} responses"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure game_server.py throughput and latency.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--choices", type=int, default=10, help="choices made by each scripted player")
+    parser.add_argument("--idle", type=int, default=0, help="extra connections to hold open without playing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    _raise_open_file_limit()
+    asyncio.run(run_load(args.host, args.port, args.sessions, args.concurrency, args.choices, args.idle, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Headless Monte Carlo playthroughs of the travel adventure.
+
+Simulated players walk ``STORY_GRAPH`` the same way ``main.play_adventure`` does, but a
+choice policy picks the options instead of ``input()``. Batches run across worker
+processes, each with its own seeded RNG, and the visit histograms are merged.
+
+    python simulator.py --playthroughs 1000000 --policy uniform --workers 8
+"""
+from bisect import bisect
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+import argparse
+import os
+import random
+import time
+
+# A policy gets the number of options and the worker's RNG and returns an option index.
+Policy = Callable[[int, random.Random], int]
+
+
+def uniform_policy(option_count: int, rng: random.Random) -> int:
+    return rng.randrange(option_count)
+
+
+def first_option_policy(option_count: int, rng: random.Random) -> int:
+    return 0
+
+
+def weighted_policy(option_count: int, rng: random.Random) -> int:
+    """Favor the options listed first, the way players tend to skim a menu."""
+    try:
+        cumulative = _CUMULATIVE_WEIGHTS[option_count]
+    except IndexError:
+        cumulative = _cumulative_weights(option_count)
+    return bisect(cumulative, rng.random() * cumulative[-1])
+
+
+def _cumulative_weights(option_count: int) -> List[float]:
+    """Extend ``_CUMULATIVE_WEIGHTS`` to cover nodes with ``option_count`` options."""
+    for count in range(len(_CUMULATIVE_WEIGHTS), option_count + 1):
+        _CUMULATIVE_WEIGHTS.append(list(accumulate(1 / (position + 1) for position in range(count))))
+    return _CUMULATIVE_WEIGHTS[option_count]
+
+
+# Option ``i`` is picked with weight ``1 / (i + 1)``; indexed by option count, and
+# extended on demand for nodes with more options.
+_CUMULATIVE_WEIGHTS = [list(accumulate(1 / (position + 1) for position in range(count))) for count in range(17)]
+
+POLICIES: Dict[str, Policy] = {
+    "uniform": uniform_policy,
+    "weighted": weighted_policy,
+    "first": first_option_policy,
+}
+
+
+@dataclass
+class SimulationResult:
+    playthroughs: int
+    choices: int
+    seconds: float
+    node_visits: Counter
+    location_visits: Counter
+
+    @property
+    def playthroughs_per_second(self) -> float:
+        return self.playthroughs / self.seconds if self.seconds else float("inf")
+
+    def merge(self, other: "SimulationResult") -> None:
+        self.playthroughs += other.playthroughs
+        self.choices += other.choices
+        self.node_visits.update(other.node_visits)
+        self.location_visits.update(other.location_visits)
+
+
+def story_table(graph: Mapping) -> Tuple[List[str], List[List[Tuple[int, Optional[str]]]]]:
+    """Flatten the graph into ``(node_ids, options)`` where each option is
+    ``(target position, location name)``; missing targets become ``-1``."""
+    node_ids = list(graph)
+    positions = {node_id: index for index, node_id in enumerate(node_ids)}
+    options = [
+        [
+            (positions.get(option.next_id, -1), option.location[0] if option.location else None)
+            for option in graph[node_id].options
+        ]
+        for node_id in node_ids
+    ]
+    return node_ids, options
+
+
+def simulate(
+    graph: Mapping,
+    playthroughs: int,
+    policy: Policy = uniform_policy,
+    seed: int = 0,
+    quit_chance: float = 0.1,
+    max_choices: int = 200,
+    start: str = "start",
+) -> SimulationResult:
+    """Run ``playthroughs`` games in this process.
+
+    Before each choice the simulated player quits with probability ``quit_chance``,
+    and no game runs longer than ``max_choices``.
+    """
+    started = time.perf_counter()
+    node_ids, options = story_table(graph)
+    origin = node_ids.index(start)
+    rng = random.Random(seed)
+    chance = rng.random
+    node_counts = [0] * len(node_ids)
+    location_counts: Counter = Counter()
+    choices = 0
+    for _ in range(playthroughs):
+        node = origin
+        node_counts[node] += 1
+        for _ in range(max_choices):
+            available = options[node]
+            if not available or chance() < quit_chance:
+                break
+            node, location = available[policy(len(available), rng)]
+            choices += 1
+            if location is not None:
+                location_counts[location] += 1
+            if node < 0:
+                break
+            node_counts[node] += 1
+    return SimulationResult(
+        playthroughs=playthroughs,
+        choices=choices,
+        seconds=time.perf_counter() - started,
+        node_visits=Counter({node_ids[index]: count for index, count in enumerate(node_counts) if count}),
+        location_visits=location_counts,
+    )
+
+
+def _simulate_story(playthroughs: int, policy: str, seed: int, quit_chance: float, max_choices: int) -> SimulationResult:
+    from travel_story import STORY_GRAPH, get_start_node_id
+
+    return simulate(STORY_GRAPH, playthroughs, POLICIES[policy], seed, quit_chance, max_choices, get_start_node_id())
+
+
+def simulate_parallel(
+    playthroughs: int,
+    policy: str = "uniform",
+    seed: int = 0,
+    quit_chance: float = 0.1,
+    max_choices: int = 200,
+    workers: Optional[int] = None,
+) -> SimulationResult:
+    """Split ``playthroughs`` across worker processes and merge their histograms.
+
+    Worker ``i`` seeds its RNG from ``(seed, i)``, so a run is reproducible for a given
+    seed and worker count.
+    """
+    workers = workers or os.cpu_count() or 1
+    shares = [playthroughs // workers + (1 if index < playthroughs % workers else 0) for index in range(workers)]
+    started = time.perf_counter()
+    total = SimulationResult(0, 0, 0.0, Counter(), Counter())
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_simulate_story, share, policy, hash((seed, index)), quit_chance, max_choices)
+            for index, share in enumerate(shares)
+            if share
+        ]
+        for future in futures:
+            total.merge(future.result())
+    total.seconds = time.perf_counter() - started
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate many playthroughs without input() or Turtle.")
+    parser.add_argument("--playthroughs", type=int, default=100_000)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="uniform")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quit-chance", type=float, default=0.1)
+    parser.add_argument("--max-choices", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=15, help="how many locations to list")
+    args = parser.parse_args()
+    if args.playthroughs < 1:
+        parser.error("--playthroughs must be at least 1")
+
+    result = simulate_parallel(
+        args.playthroughs, args.policy, args.seed, args.quit_chance, args.max_choices, args.workers
+    )
+    print(
+        f"{result.playthroughs} playthroughs, {result.choices} choices in {result.seconds:.2f}s "
+        f"({result.playthroughs_per_second:,.0f} playthroughs/s)"
+    )
+    print("\nMost reached locations:")
+    for name, count in result.location_visits.most_common(args.top):
+        print(f"  {name:<40} {count / result.playthroughs:8.3f} visits per playthrough")
+
+
+if __name__ == "__main__":
+    main()
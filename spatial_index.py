@@ -0,0 +1,318 @@
+"""Nearest-place and radius queries over story locations.
+
+Places are stored as 3D unit vectors in a k-d tree, so distances are straight chords
+through the globe: no trigonometry per comparison and no trouble at the poles or the
+180th meridian. The tree is implicit: points are reordered so every subtree is a
+contiguous slice split at its middle, and only the split axis and value of each
+internal node are kept, in flat lists.
+
+The single nearest place, the common question, skips the tree: the globe is divided
+into the cells of a cube map, and each cell lists every place that is the nearest one
+for some point inside it. A lookup finds the query's cell with a little arithmetic and
+measures only that cell's short list.
+
+Building takes minutes for a million places, so the built index can be saved and
+loaded again; the story's own index is cached per story version in the story cache.
+
+    python spatial_index.py 53.35 -6.26 --radius 500
+    python spatial_index.py 42.73 -84.48 -k 5
+"""
+from functools import lru_cache
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+import argparse
+import bisect
+import hashlib
+import marshal
+import math
+import os
+
+from locations import Location
+from trip_stats import EARTH_RADIUS_KM
+
+# Leaves hold up to this many places and are scanned directly.
+LEAF_SIZE = 16
+# The cube map is sized to hold about this many places per cell.
+PLACES_PER_CELL = 2
+MAGIC = b"TSPI"
+FORMAT_VERSION = 1
+
+Vector = Tuple[float, float, float]
+# The places that can be nearest inside one cube-map cell, and their positions.
+Cell = Tuple[Tuple[Vector, ...], Tuple[int, ...]]
+CornerKey = Tuple[int, int, int]
+
+
+def unit_vector(lat: float, lon: float) -> Vector:
+    lat, lon = math.radians(lat), math.radians(lon)
+    return math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat)
+
+
+def chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km: float) -> float:
+    """The straight-line distance through the unit globe for a great-circle distance of ``km``."""
+    return 2 * math.sin(min(math.pi, km / EARTH_RADIUS_KM) / 2)
+
+
+def cube_cell(vector: Vector, grid: int) -> int:
+    """The cube-map cell of a unit vector: one of ``grid * grid`` cells on each of six faces."""
+    x, y, z = vector
+    ax, ay, az = abs(x), abs(y), abs(z)
+    if ax >= ay and ax >= az:
+        face, u, v, major = (0 if x > 0 else 1), y, z, ax
+    elif ay >= az:
+        face, u, v, major = (2 if y > 0 else 3), x, z, ay
+    else:
+        face, u, v, major = (4 if z > 0 else 5), x, y, az
+    column = min(grid - 1, int((u / major + 1) * 0.5 * grid))
+    row = min(grid - 1, int((v / major + 1) * 0.5 * grid))
+    return (face * grid + row) * grid + column
+
+
+def _face_point(face: int, u: float, v: float) -> Vector:
+    """The unit vector at face coordinates ``(u, v)``; the inverse of ``cube_cell``'s mapping."""
+    major = 1.0 if face % 2 == 0 else -1.0
+    x, y, z = ((major, u, v), (u, major, v), (u, v, major))[face // 2]
+    length = math.sqrt(x * x + y * y + z * z)
+    return x / length, y / length, z / length
+
+
+class SpatialIndex:
+    """A k-d tree of ``(name, lat, lon)`` places for nearest-k and radius queries."""
+
+    def __init__(self, locations: Iterable[Location], leaf_size: int = LEAF_SIZE) -> None:
+        locations = list(locations)
+        vectors = [unit_vector(lat, lon) for _, lat, lon in locations]
+        columns = [[vector[axis] for vector in vectors] for axis in range(3)]
+        self.leaf_size = max(1, leaf_size)
+        depth, size = 0, len(locations)
+        while size > self.leaf_size:
+            size = (size + 1) // 2
+            depth += 1
+        self._axes = [0] * (2 ** depth)
+        self._splits = [0.0] * (2 ** depth)
+        order = list(range(len(locations)))
+        self._build(order, columns, 0, 0, len(order))
+        self.locations = [locations[index] for index in order]
+        # Made afresh in tree order so nearby places are also near each other in memory.
+        self._points = [unit_vector(lat, lon) for _, lat, lon in self.locations]
+        self._grid = max(1, round(math.sqrt(len(locations) / (6 * PLACES_PER_CELL))))
+        corner_nearest: Dict[CornerKey, int] = {}
+        cell_count = 6 * self._grid ** 2 if locations else 0
+        self._cells = [self._cell_candidates(cell, corner_nearest) for cell in range(cell_count)]
+
+    def _build(self, order: List[int], columns: List[List[float]], node: int, low: int, high: int) -> None:
+        if high - low <= self.leaf_size:
+            return
+        # Split along the axis the points are most spread out on.
+        spreads = []
+        for column in columns:
+            values = [column[index] for index in order[low:high]]
+            spreads.append(max(values) - min(values))
+        axis = spreads.index(max(spreads))
+        column = columns[axis]
+        order[low:high] = sorted(order[low:high], key=column.__getitem__)
+        middle = (low + high) // 2
+        self._axes[node] = axis
+        self._splits[node] = column[order[middle]]
+        self._build(order, columns, 2 * node + 1, low, middle)
+        self._build(order, columns, 2 * node + 2, middle, high)
+
+    def _cell_candidates(self, cell: int, corner_nearest: Dict[CornerKey, int]) -> Cell:
+        """Points (and their positions) that can be nearest to some point in ``cell``.
+
+        Every point of the cell is within ``reach`` of its center, so whatever is nearest
+        to one is within ``closest + 2 * reach`` of the center. For unit vectors, ``a`` is
+        nearer than ``b`` to ``q`` exactly when ``q . a > q . b``, which is linear in ``q``;
+        so a point beaten by the same other point at all four corners of the cell is never
+        nearest inside it and is dropped. The nearest points to the center and corners
+        are tried first as they beat the most; ``corner_nearest`` caches the corner ones,
+        as neighbouring cells share them. The few points left are then compared in pairs.
+        """
+        grid = self._grid
+        face, rest = divmod(cell, grid * grid)
+        row, column = divmod(rest, grid)
+        step = 2 / grid
+        u, v = column * step - 1, row * step - 1
+        center = _face_point(face, u + step / 2, v + step / 2)
+        corner_keys = [(face, column + right, row + up) for right in (0, 1) for up in (0, 1)]
+        corners = [_face_point(face, key[1] * step - 1, key[2] * step - 1) for key in corner_keys]
+        reach = max(math.dist(center, corner) for corner in corners)
+        closest, nearest = self._search(center, 1, math.inf)[0]
+        limit = (closest + 2 * reach) * (1 + 1e-9) + 1e-12
+        found = [position for _, position in self._search(center, len(self._points), limit)]
+
+        def dots(position: int) -> Tuple[float, ...]:
+            x, y, z = self._points[position]
+            return tuple(x * cx + y * cy + z * cz for cx, cy, cz in corners)
+
+        scores = {position: dots(position) for position in found}
+        anchors = {nearest}
+        for key, corner in zip(corner_keys, corners):
+            anchor = corner_nearest.get(key)
+            if anchor is None:
+                anchor = corner_nearest[key] = self._search(corner, 1, math.inf)[0][1]
+            anchors.add(anchor)
+        anchor_scores = [scores.get(anchor) or dots(anchor) for anchor in anchors]
+        kept = [
+            position
+            for position in found
+            if not any(all(a > b for a, b in zip(anchor, scores[position])) for anchor in anchor_scores)
+        ]
+        # Beating is transitive, so points dropped above can't matter here.
+        kept_scores = [scores[position] for position in kept]
+        kept = tuple(
+            position
+            for position in kept
+            if not any(all(a > b for a, b in zip(other, scores[position])) for other in kept_scores)
+        )
+        return tuple(self._points[position] for position in kept), kept
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def save(self, destination: Path) -> Path:
+        """Write the built index to ``destination``; ``load`` reads it back without rebuilding."""
+        state = (self.leaf_size, self._axes, self._splits, self.locations, self._points, self._grid, self._cells)
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temporary = destination.with_name(destination.name + f".{os.getpid()}.tmp")
+        with open(temporary, "wb") as handle:
+            handle.write(MAGIC + bytes([FORMAT_VERSION]))
+            # marshal keeps the cells sharing the point tuples of ``_points``.
+            marshal.dump(state, handle)
+        os.replace(temporary, destination)
+        return destination
+
+    @classmethod
+    def load(cls, path: Path) -> "SpatialIndex":
+        """An index written by ``save``. It is a local cache, trusted like the story cache."""
+        with open(path, "rb") as handle:
+            if handle.read(len(MAGIC) + 1) != MAGIC + bytes([FORMAT_VERSION]):
+                raise ValueError(f"{path} is not a spatial index (format {FORMAT_VERSION})")
+            state = marshal.load(handle)
+        index = cls.__new__(cls)
+        index.leaf_size, index._axes, index._splits, index.locations, index._points, index._grid, index._cells = state
+        return index
+
+    def _closest(self, query: Vector) -> Tuple[float, int]:
+        points, positions = self._cells[cube_cell(query, self._grid)]
+        distances = list(map(math.dist, repeat(query, len(points)), points))
+        closest = min(distances)
+        return closest, positions[distances.index(closest)]
+
+    def _search(self, query: Vector, k: int, limit: float) -> List[Tuple[float, int]]:
+        """``(chord, position)`` of up to ``k`` places closer than ``limit``, nearest first."""
+        points, axes, splits, leaf_size = self._points, self._axes, self._splits, self.leaf_size
+        best: List[Tuple[float, int]] = []
+        if not points:
+            return best
+        worst = limit
+        stack = [(0.0, 0, 0, len(points))]
+        while stack:
+            gap, node, low, high = stack.pop()
+            if gap >= worst:
+                continue
+            while high - low > leaf_size:
+                middle = (low + high) // 2
+                difference = query[axes[node]] - splits[node]
+                if difference < 0:
+                    stack.append((-difference, 2 * node + 2, middle, high))
+                    node, high = 2 * node + 1, middle
+                else:
+                    stack.append((difference, 2 * node + 1, low, middle))
+                    node, low = 2 * node + 2, middle
+            # Whole leaves are measured in one call; most turn out to hold nothing closer.
+            distances = list(map(math.dist, repeat(query, high - low), points[low:high]))
+            closest = min(distances)
+            if closest >= worst:
+                continue
+            if k == 1:
+                best = [(closest, low + distances.index(closest))]
+                worst = closest
+                continue
+            for offset, distance in enumerate(distances):
+                if distance < worst:
+                    bisect.insort(best, (distance, low + offset))
+                    if len(best) > k:
+                        best.pop()
+                    if len(best) == k:
+                        worst = best[-1][0]
+        return best
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[Location, float]]:
+        """The ``k`` places closest to ``(lat, lon)`` with their distances in km, nearest first."""
+        if k < 1 or not self.locations:
+            return []
+        locations = self.locations
+        if k == 1:
+            distance, position = self._closest(unit_vector(lat, lon))
+            return [(locations[position], chord_to_km(distance))]
+        return [
+            (locations[position], chord_to_km(distance))
+            for distance, position in self._search(unit_vector(lat, lon), k, math.inf)
+        ]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[Location, float]]:
+        """Every place within ``radius_km`` of ``(lat, lon)``, nearest first."""
+        if radius_km < 0:
+            return []
+        locations = self.locations
+        # A hair past the radius so places exactly on it are not lost to rounding.
+        limit = km_to_chord(radius_km) * (1 + 1e-12) + 1e-15
+        return [
+            (locations[position], chord_to_km(distance))
+            for distance, position in self._search(unit_vector(lat, lon), len(locations), limit)
+        ]
+
+
+def _index_path(source: Path, cache_dir: Path) -> Path:
+    from story_compiler import content_hash
+
+    key = hashlib.sha256(f"spatial-{FORMAT_VERSION}-{LEAF_SIZE}-{PLACES_PER_CELL}:{content_hash(source, cache_dir)}".encode()).hexdigest()
+    return Path(cache_dir) / f"spatial-{key[:16]}.bin"
+
+
+@lru_cache(maxsize=None)
+def story_spatial_index() -> SpatialIndex:
+    """The index of every place in ``STORY_GRAPH``, loaded from the story cache or built on first use."""
+    from locations import build_location_table
+    from travel_story import STORY_CACHE_DIR, STORY_GRAPH, story_source
+
+    path = _index_path(story_source(), STORY_CACHE_DIR)
+    try:
+        return SpatialIndex.load(path)
+    except (OSError, ValueError, EOFError, TypeError):
+        pass
+    index = SpatialIndex(build_location_table(STORY_GRAPH))
+    try:
+        index.save(path)
+    except OSError:
+        pass
+    return index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find story places near a point.")
+    parser.add_argument("lat", type=float)
+    parser.add_argument("lon", type=float)
+    parser.add_argument("-k", type=int, default=5, help="how many nearest places to list")
+    parser.add_argument("--radius", type=float, default=None, help="list every place within this many km instead")
+    args = parser.parse_args()
+    index = story_spatial_index()
+    if args.radius is not None:
+        found = index.within(args.lat, args.lon, args.radius)
+    else:
+        found = index.nearest(args.lat, args.lon, args.k)
+    for (name, _, _), km in found:
+        print(f"{km:8.0f} km  {name}")
+    if not found:
+        print("No places found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+"""Structural analysis of the story graph: journey counts, components, reachability.
+
+Everything works on integer adjacency lists built once from a ``node_id -> StoryNode``
+mapping, so the same code handles ``STORY_GRAPH`` and large synthetic graphs.
+``PredecessorIndex`` is the one exception: it maps node ids to the options leading
+into them and is kept up to date node by node as the story changes.
+Run ``python story_analysis.py`` for a report on the built-in story, or
+``python story_analysis.py --into seoul`` for what leads to one node.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+import argparse
+
+
+@dataclass(frozen=True)
+class StoryIndex:
+    node_ids: List[str]
+    positions: Dict[str, int]
+    successors: List[List[int]]
+    missing_targets: List[Tuple[str, int, str]]
+
+
+@dataclass(frozen=True)
+class StoryReport:
+    node_count: int
+    journey_counts: List[int]
+    components: List[List[str]]
+    unreachable: List[str]
+    dead_ends: List[str]
+    # (node id, how many other nodes can only be reached through it), busiest first.
+    gateways: List[Tuple[str, int]]
+
+
+def build_index(graph: Mapping) -> StoryIndex:
+    """Number the nodes and turn every option into an integer edge.
+
+    Options pointing at ids that are not in the graph are left out of ``successors``
+    and listed in ``missing_targets`` as ``(node_id, option_index, next_id)``.
+    """
+    node_ids = list(graph)
+    positions = {node_id: index for index, node_id in enumerate(node_ids)}
+    successors: List[List[int]] = []
+    missing = []
+    for node_id in node_ids:
+        targets = []
+        for option_index, option in enumerate(graph[node_id].options):
+            target = positions.get(option.next_id)
+            if target is None:
+                missing.append((node_id, option_index, option.next_id))
+            else:
+                targets.append(target)
+        successors.append(targets)
+    return StoryIndex(node_ids, positions, successors, missing)
+
+
+def predecessor_lists(index: StoryIndex) -> List[List[int]]:
+    """The reverse of ``index.successors``: for each node, the nodes with an option into it."""
+    predecessors: List[List[int]] = [[] for _ in index.node_ids]
+    for source, targets in enumerate(index.successors):
+        for target in targets:
+            predecessors[target].append(source)
+    return predecessors
+
+
+def journey_counts(index: StoryIndex, max_depth: int, start: str = "start") -> List[int]:
+    """Count distinct choice sequences of each length ``0..max_depth`` from ``start``.
+
+    Two options that lead to the same node are still different journeys. Counts are
+    propagated one depth at a time over the predecessor lists, so the cost is
+    ``O(max_depth * edges)`` even with cycles, and each step runs as C-level sums.
+    """
+    predecessors = predecessor_lists(index)
+    ways = [0] * len(index.node_ids)
+    ways[index.positions[start]] = 1
+    counts = [1]
+    for _ in range(max_depth):
+        ways = [sum(map(ways.__getitem__, sources)) for sources in predecessors]
+        counts.append(sum(ways))
+    return counts
+
+
+def reachable(index: StoryIndex, start: str = "start") -> List[bool]:
+    seen = [False] * len(index.node_ids)
+    origin = index.positions[start]
+    seen[origin] = True
+    stack = [origin]
+    while stack:
+        for target in index.successors[stack.pop()]:
+            if not seen[target]:
+                seen[target] = True
+                stack.append(target)
+    return seen
+
+
+def can_reach(index: StoryIndex, target: str, predecessors: Optional[List[List[int]]] = None) -> List[bool]:
+    """Which nodes have some route to ``target``: ``reachable`` run backward over the options."""
+    predecessors = predecessor_lists(index) if predecessors is None else predecessors
+    seen = [False] * len(index.node_ids)
+    goal = index.positions[target]
+    seen[goal] = True
+    stack = [goal]
+    while stack:
+        for source in predecessors[stack.pop()]:
+            if not seen[source]:
+                seen[source] = True
+                stack.append(source)
+    return seen
+
+
+def unreachable_nodes(index: StoryIndex, start: str = "start") -> List[str]:
+    seen = reachable(index, start)
+    return [node_id for node_id, visited in zip(index.node_ids, seen) if not visited]
+
+
+def dead_ends(index: StoryIndex) -> List[str]:
+    """Nodes with no option leading to an existing node."""
+    return [node_id for node_id, targets in zip(index.node_ids, index.successors) if not targets]
+
+
+def strongly_connected_components(index: StoryIndex) -> List[List[int]]:
+    """Tarjan's algorithm, written iteratively so deep graphs don't hit the recursion limit."""
+    count = len(index.node_ids)
+    successors = index.successors
+    order = [-1] * count
+    low = [0] * count
+    on_stack = [False] * count
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+
+    for root in range(count):
+        if order[root] != -1:
+            continue
+        work = [(root, 0)]
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, edge = work[-1]
+            targets = successors[node]
+            if edge < len(targets):
+                work[-1] = (node, edge + 1)
+                target = targets[edge]
+                if order[target] == -1:
+                    order[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, 0))
+                elif on_stack[target] and order[target] < low[node]:
+                    low[node] = order[target]
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+def _dominator_tree(index: StoryIndex, start: str) -> Tuple[List[int], List[int]]:
+    """Immediate dominators by node and the depth-first order they were found in.
+
+    Lengauer-Tarjan with path compression, written iteratively: ``O(edges * log(nodes))``.
+    """
+    count = len(index.node_ids)
+    successors = index.successors
+    root = index.positions[start]
+    number = [-1] * count
+    order: List[int] = []
+    tree_parent: List[int] = []
+    number[root] = 0
+    order.append(root)
+    tree_parent.append(0)
+    work = [(root, 0)]
+    while work:
+        node, edge = work[-1]
+        targets = successors[node]
+        if edge < len(targets):
+            work[-1] = (node, edge + 1)
+            target = targets[edge]
+            if number[target] == -1:
+                number[target] = len(order)
+                order.append(target)
+                tree_parent.append(number[node])
+                work.append((target, 0))
+            continue
+        work.pop()
+
+    # From here on vertices are depth-first numbers, so every array has one slot per reachable node.
+    reached = len(order)
+    predecessors: List[List[int]] = [[] for _ in range(reached)]
+    for vertex, node in enumerate(order):
+        for target in successors[node]:
+            predecessors[number[target]].append(vertex)
+    semi = list(range(reached))
+    label = list(range(reached))
+    ancestor = [-1] * reached
+    idom = [0] * reached
+    bucket: List[List[int]] = [[] for _ in range(reached)]
+
+    def evaluate(vertex: int) -> int:
+        # The vertex with the smallest semidominator on the linked path above ``vertex``,
+        # compressing that path so later calls skip it.
+        if ancestor[vertex] == -1:
+            return vertex
+        path = []
+        step = vertex
+        while ancestor[ancestor[step]] != -1:
+            path.append(step)
+            step = ancestor[step]
+        for step in reversed(path):
+            above = ancestor[step]
+            if semi[label[above]] < semi[label[step]]:
+                label[step] = label[above]
+            ancestor[step] = ancestor[above]
+        return label[vertex]
+
+    for vertex in range(reached - 1, 0, -1):
+        for source in predecessors[vertex]:
+            candidate = semi[evaluate(source)]
+            if candidate < semi[vertex]:
+                semi[vertex] = candidate
+        bucket[semi[vertex]].append(vertex)
+        parent = tree_parent[vertex]
+        ancestor[vertex] = parent
+        for waiting in bucket[parent]:
+            lowest = evaluate(waiting)
+            idom[waiting] = lowest if semi[lowest] < semi[waiting] else parent
+        bucket[parent] = []
+    for vertex in range(1, reached):
+        if idom[vertex] != semi[vertex]:
+            idom[vertex] = idom[idom[vertex]]
+
+    dominators = [-1] * count
+    for vertex, node in enumerate(order):
+        dominators[node] = order[idom[vertex]]
+    return dominators, order
+
+
+def immediate_dominators(index: StoryIndex, start: str = "start") -> List[int]:
+    """For each node, the last node every route from ``start`` to it must pass through.
+
+    ``start`` is its own immediate dominator; nodes ``start`` can't reach get ``-1``.
+    """
+    return _dominator_tree(index, start)[0]
+
+
+def gateways_to(index: StoryIndex, target: str, start: str = "start") -> List[str]:
+    """The nodes every route from ``start`` to ``target`` passes through, in route order."""
+    dominators = immediate_dominators(index, start)
+    node = index.positions[target]
+    if dominators[node] == -1:
+        return []
+    chain = []
+    while node != dominators[node]:
+        node = dominators[node]
+        chain.append(index.node_ids[node])
+    return chain[::-1]
+
+
+def gateway_counts(index: StoryIndex, start: str = "start") -> List[Tuple[str, int]]:
+    """Nodes other than ``start`` that some other node can only be reached through.
+
+    Each comes with how many nodes lie behind it, busiest first.
+    """
+    dominators, order = _dominator_tree(index, start)
+    behind = [0] * len(index.node_ids)
+    # Dominators come before the nodes they dominate in depth-first order.
+    for node in reversed(order[1:]):
+        behind[dominators[node]] += behind[node] + 1
+    root = index.positions[start]
+    counts = [(index.node_ids[node], behind[node]) for node in order if node != root and behind[node]]
+    return sorted(counts, key=lambda item: (-item[1], item[0]))
+
+
+class PredecessorIndex:
+    """``node_id -> [(source node_id, option index)]`` for every option leading to it.
+
+    Maintained one node at a time: ``add_node`` indexes a node's options (replacing an
+    earlier version of the node) and ``remove_node`` drops them. Options naming ids that
+    are not nodes yet are indexed too, so adding that node later needs no rescan.
+    """
+
+    def __init__(self, graph: Optional[Mapping] = None) -> None:
+        self._incoming: Dict[str, List[Tuple[str, int]]] = {}
+        self._targets: Dict[str, List[str]] = {}
+        for node_id in graph or ():
+            self.add_node(graph[node_id])
+
+    def add_node(self, node) -> None:
+        if node.node_id in self._targets:
+            self.remove_node(node.node_id)
+        targets = [option.next_id for option in node.options]
+        self._targets[node.node_id] = targets
+        for option_index, next_id in enumerate(targets):
+            self._incoming.setdefault(next_id, []).append((node.node_id, option_index))
+
+    def remove_node(self, node_id: str) -> None:
+        for option_index, next_id in enumerate(self._targets.pop(node_id, ())):
+            incoming = self._incoming[next_id]
+            incoming.remove((node_id, option_index))
+            if not incoming:
+                del self._incoming[next_id]
+
+    def incoming(self, node_id: str) -> List[Tuple[str, int]]:
+        """Every ``(source node_id, option index)`` whose option leads to ``node_id``."""
+        return list(self._incoming.get(node_id, ()))
+
+    def can_reach(self, target: str) -> List[str]:
+        """Ids of the nodes with some route to ``target``, nearest first."""
+        seen = {target}
+        found = []
+        frontier = [target]
+        while frontier:
+            reached = []
+            for node_id in frontier:
+                for source, _ in self._incoming.get(node_id, ()):
+                    if source not in seen:
+                        seen.add(source)
+                        found.append(source)
+                        reached.append(source)
+            frontier = reached
+        return found
+
+    def __contains__(self, node_id: object) -> bool:
+        return node_id in self._targets
+
+    def __len__(self) -> int:
+        return len(self._targets)
+
+
+_live: Optional[Tuple[Mapping, PredecessorIndex]] = None
+
+
+def story_predecessors() -> PredecessorIndex:
+    """The predecessor index of the live story, built on first use."""
+    global _live
+    import travel_story
+
+    graph = travel_story.STORY_GRAPH
+    if _live is None or _live[0] is not graph:
+        _live = graph, PredecessorIndex(graph)
+    return _live[1]
+
+
+def follow_story_change(previous: Mapping, graph: Mapping, updated: Iterable, removed: Iterable[str]) -> None:
+    """Carry the live predecessor index over to ``graph`` by applying only the changed nodes.
+
+    Does nothing unless the index was built for ``previous``; it is then built afresh on next use.
+    """
+    global _live
+    if _live is None or _live[0] is not previous:
+        return
+    predecessors = _live[1]
+    for node_id in removed:
+        predecessors.remove_node(node_id)
+    for node in updated:
+        predecessors.add_node(node)
+    _live = graph, predecessors
+
+
+def iter_journeys(index: StoryIndex, depth: int, start: str = "start") -> Iterator[Tuple[str, ...]]:
+    """Lazily yield every journey of exactly ``depth`` choices as the node ids it visits."""
+    successors = index.successors
+    node_ids = index.node_ids
+    nodes = [index.positions[start]]
+    path: List[int] = []
+    if depth == 0:
+        yield ()
+        return
+    choice = 0
+    while True:
+        targets = successors[nodes[-1]]
+        if len(path) < depth and choice < len(targets):
+            path.append(choice)
+            nodes.append(targets[choice])
+            choice = 0
+            if len(path) == depth:
+                yield tuple(node_ids[node] for node in nodes[1:])
+            continue
+        # Backtrack to the next untried option of the previous node.
+        if not path:
+            return
+        nodes.pop()
+        choice = path.pop() + 1
+
+
+def analyze_story(graph: Mapping, max_depth: int = 10, start: str = "start") -> StoryReport:
+    index = build_index(graph)
+    components = [
+        sorted(index.node_ids[member] for member in component)
+        for component in strongly_connected_components(index)
+        if len(component) > 1
+    ]
+    return StoryReport(
+        node_count=len(index.node_ids),
+        journey_counts=journey_counts(index, max_depth, start),
+        components=sorted(components, key=len, reverse=True),
+        unreachable=unreachable_nodes(index, start),
+        dead_ends=dead_ends(index),
+        gateways=gateway_counts(index, start),
+    )
+
+
+def describe_incoming(target: str, start: str = "start") -> str:
+    """What leads into live story node ``target``: its incoming options, who can reach it and its gateways."""
+    import travel_story
+
+    graph = travel_story.STORY_GRAPH
+    predecessors = story_predecessors()
+    lines = [f"Options leading to {target}:"]
+    for source, option_index in predecessors.incoming(target):
+        lines.append(f"  {source} option {option_index + 1}: {graph[source].options[option_index].prompt}")
+    reaching = predecessors.can_reach(target)
+    lines.append(f"{len(reaching)} nodes can reach {target}")
+    gateways = gateways_to(build_index(graph), target, start)
+    lines.append(f"Every route from {start} passes through: {' > '.join(gateways) or 'nothing else'}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    from travel_story import STORY_GRAPH, get_start_node_id
+
+    parser = argparse.ArgumentParser(description="Report on the shape of the story graph.")
+    parser.add_argument("depth", type=int, nargs="?", default=10, help="longest journeys to count")
+    parser.add_argument("--into", metavar="NODE", help="show what leads into this node instead")
+    args = parser.parse_args()
+    if args.into:
+        if args.into not in STORY_GRAPH:
+            raise SystemExit(f"No story node {args.into!r}")
+        print(describe_incoming(args.into, get_start_node_id()))
+        return
+    report = analyze_story(STORY_GRAPH, args.depth, get_start_node_id())
+    print(f"{report.node_count} story nodes")
+    for length, count in enumerate(report.journey_counts):
+        print(f"  journeys of {length} choices: {count}")
+    print(f"{len(report.components)} looping groups, largest has {len(report.components[0]) if report.components else 0} nodes")
+    print(f"Unreachable: {', '.join(report.unreachable) or 'none'}")
+    print(f"Dead ends: {', '.join(report.dead_ends) or 'none'}")
+    gateways = ", ".join(f"{node_id} ({behind})" for node_id, behind in report.gateways[:10])
+    print(f"Gateways (nodes only reachable through them): {gateways or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
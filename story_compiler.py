@@ -0,0 +1,240 @@
+"""Compile the story graph into a compact binary file and load it with mmap."""
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b"TSTY"
+FORMAT_VERSION = 1
+NO_INDEX = 0xFFFFFFFF
+
+# magic, version, node count, option count, string count, then the byte offsets of
+# the string offsets, string blob, node table, option table and sorted id index.
+_HEADER = struct.Struct("<4sHxxIIIIIIII")
+# id, title, description (string indices), first option, option count
+_NODE = struct.Struct("<IIIII")
+# prompt, next node index, next id, location name, detail (string indices), lat, lon
+_OPTION = struct.Struct("<IIIIIdd")
+_U32 = struct.Struct("<I")
+
+# (resolved path, size, mtime_ns) -> content_hash, for sources already hashed here.
+_known_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def content_hash(source: Path, cache_dir: Optional[Path] = None) -> str:
+    """Hash the story source together with the binary format version.
+
+    The hash is remembered with the file's size and modification time, in this process
+    and, given ``cache_dir``, in a small record there, so the file is only read and
+    hashed again after it changes.
+    """
+    source = Path(source)
+    status = source.stat()
+    stamp = (str(source.resolve()), status.st_size, status.st_mtime_ns)
+    known = _known_hashes.get(stamp)
+    if known is not None:
+        return known
+    record = None
+    if cache_dir is not None:
+        name = hashlib.sha256(stamp[0].encode("utf-8")).hexdigest()[:16]
+        record = Path(cache_dir) / f"hash-{name}.json"
+        try:
+            saved = json.loads(record.read_text(encoding="utf-8"))
+            if saved["stamp"] == [FORMAT_VERSION, status.st_size, status.st_mtime_ns]:
+                known = _known_hashes[stamp] = saved["hash"]
+                return known
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    digest = hashlib.sha256(f"story-format-{FORMAT_VERSION}".encode())
+    digest.update(source.read_bytes())
+    known = _known_hashes[stamp] = digest.hexdigest()
+    if record is not None:
+        try:
+            record.parent.mkdir(parents=True, exist_ok=True)
+            temporary = record.with_name(record.name + f".{os.getpid()}.tmp")
+            saved = {"stamp": [FORMAT_VERSION, status.st_size, status.st_mtime_ns], "hash": known}
+            temporary.write_text(json.dumps(saved), encoding="utf-8")
+            os.replace(temporary, record)
+        except OSError:
+            pass
+    return known
+
+
+def compile_story(graph: Mapping, destination: Path) -> Path:
+    """Write ``graph`` to ``destination`` in the compiled binary format."""
+    strings: Dict[str, int] = {}
+    blob: List[bytes] = []
+
+    def intern(text: str) -> int:
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(blob)
+            blob.append(text.encode("utf-8"))
+        return index
+
+    node_ids = list(graph)
+    positions = {node_id: index for index, node_id in enumerate(node_ids)}
+    node_rows = bytearray()
+    option_rows = bytearray()
+    option_count = 0
+    for node_id in node_ids:
+        node = graph[node_id]
+        node_rows += _NODE.pack(
+            intern(node.node_id), intern(node.title), intern(node.description),
+            option_count, len(node.options),
+        )
+        for option in node.options:
+            if option.location is None:
+                name, lat, lon = NO_INDEX, 0.0, 0.0
+            else:
+                name = intern(option.location[0])
+                lat, lon = option.location[1], option.location[2]
+            option_rows += _OPTION.pack(
+                intern(option.prompt), positions.get(option.next_id, NO_INDEX),
+                intern(option.next_id), name, intern(option.detail), lat, lon,
+            )
+            option_count += 1
+
+    string_offsets = bytearray()
+    position = 0
+    for encoded in blob:
+        string_offsets += _U32.pack(position)
+        position += len(encoded)
+    string_offsets += _U32.pack(position)
+
+    # Lookups by id binary-search this permutation of node indices.
+    sorted_ids = sorted(range(len(node_ids)), key=lambda index: node_ids[index].encode("utf-8"))
+    id_index = b"".join(_U32.pack(index) for index in sorted_ids)
+
+    offsets_at = _HEADER.size
+    blob_at = offsets_at + len(string_offsets)
+    nodes_at = blob_at + position
+    options_at = nodes_at + len(node_rows)
+    index_at = options_at + len(option_rows)
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(node_ids), option_count, len(blob),
+        offsets_at, blob_at, nodes_at, options_at, index_at,
+    )
+
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary = destination.with_name(destination.name + f".{os.getpid()}.tmp")
+    with open(temporary, "wb") as handle:
+        for chunk in (header, string_offsets, *blob, node_rows, option_rows, id_index):
+            handle.write(chunk)
+    os.replace(temporary, destination)
+    return destination
+
+
+class CompiledStory(Mapping):
+    """Read-only ``node_id -> StoryNode`` mapping backed by a memory-mapped story file.
+
+    Nodes are only turned into ``StoryNode`` objects when they are looked up, and only
+    the most recent ``cache_size`` of them are kept in an LRU cache.
+    """
+
+    def __init__(self, path: Path, cache_size: int = 256) -> None:
+        # Imported here because travel_story itself loads this module while importing.
+        from travel_story import JourneyOption, StoryNode
+
+        self._node_type = StoryNode
+        self._option_type = JourneyOption
+        self.path = Path(path)
+        with open(self.path, "rb") as handle:
+            self._data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._data) < _HEADER.size:
+            raise ValueError(f"{self.path} is not a compiled story")
+        (magic, version, self._node_count, self._option_count, _, self._offsets_at,
+         self._blob_at, self._nodes_at, self._options_at, self._index_at) = _HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a compiled story (format {FORMAT_VERSION})")
+        self._load = lru_cache(maxsize=cache_size)(self._read_node)
+
+    def _string(self, index: int) -> str:
+        start, end = struct.unpack_from("<II", self._data, self._offsets_at + index * 4)
+        return self._data[self._blob_at + start:self._blob_at + end].decode("utf-8")
+
+    def _id_bytes(self, node_index: int) -> bytes:
+        id_string = _U32.unpack_from(self._data, self._nodes_at + node_index * _NODE.size)[0]
+        start, end = struct.unpack_from("<II", self._data, self._offsets_at + id_string * 4)
+        return self._data[self._blob_at + start:self._blob_at + end]
+
+    def index_of(self, node_id: str) -> Optional[int]:
+        """Return the position of ``node_id`` in the node table, or None."""
+        wanted = node_id.encode("utf-8")
+        low, high = 0, self._node_count
+        while low < high:
+            middle = (low + high) // 2
+            candidate = _U32.unpack_from(self._data, self._index_at + middle * 4)[0]
+            found = self._id_bytes(candidate)
+            if found == wanted:
+                return candidate
+            if found < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def node_at(self, node_index: int):
+        """Materialize the node stored at ``node_index``."""
+        id_string, title, description, first, count = _NODE.unpack_from(
+            self._data, self._nodes_at + node_index * _NODE.size
+        )
+        options = []
+        for option_index in range(first, first + count):
+            prompt, _, next_id, name, detail, lat, lon = _OPTION.unpack_from(
+                self._data, self._options_at + option_index * _OPTION.size
+            )
+            options.append(
+                self._option_type(
+                    prompt=self._string(prompt),
+                    next_id=self._string(next_id),
+                    location=None if name == NO_INDEX else (self._string(name), lat, lon),
+                    detail=self._string(detail),
+                )
+            )
+        return self._node_type(
+            node_id=self._string(id_string),
+            title=self._string(title),
+            description=self._string(description),
+            options=options,
+        )
+
+    def _read_node(self, node_id: str):
+        node_index = self.index_of(node_id)
+        if node_index is None:
+            raise KeyError(node_id)
+        return self.node_at(node_index)
+
+    def __getitem__(self, node_id: str):
+        return self._load(node_id)
+
+    def __iter__(self) -> Iterator[str]:
+        for node_index in range(self._node_count):
+            yield self._id_bytes(node_index).decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._node_count
+
+
+def load_or_compile(source: Path, build: Callable[[], Mapping], cache_dir: Path) -> Mapping:
+    """Return the compiled story for ``source``, compiling ``build()`` into the cache if needed.
+
+    Falls back to the freshly built graph when the cache directory cannot be written.
+    """
+    cached = Path(cache_dir) / f"story-{content_hash(source, cache_dir)[:16]}.bin"
+    try:
+        return CompiledStory(cached)
+    except (OSError, ValueError):
+        pass
+    graph = build()
+    try:
+        compile_story(graph, cached)
+        return CompiledStory(cached)
+    except (OSError, ValueError):
+        return graph
@@ -0,0 +1,197 @@
+"""Story content stored as JSON Lines with a sidecar offset index.
+
+Each line of a ``.jsonl`` story file holds one node. The ``.idx`` file next to it maps
+node ids to byte ranges so a single node can be decoded without reading the rest.
+Run ``python story_files.py export story.jsonl`` to export the built-in story.
+"""
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, Optional
+import json
+import mmap
+import os
+import struct
+import sys
+
+INDEX_MAGIC = b"TSIX"
+_INDEX_HEADER = struct.Struct("<4sI")
+# key offset, key length, line offset, line length
+_INDEX_ENTRY = struct.Struct("<IIQI")
+_U32 = struct.Struct("<I")
+
+
+def index_path(content: Path) -> Path:
+    return Path(content).with_suffix(".idx")
+
+
+def node_to_json(node) -> str:
+    return json.dumps(
+        {
+            "node_id": node.node_id,
+            "title": node.title,
+            "description": node.description,
+            "options": [
+                {
+                    "prompt": option.prompt,
+                    "next_id": option.next_id,
+                    "location": list(option.location) if option.location else None,
+                    "detail": option.detail,
+                }
+                for option in node.options
+            ],
+        },
+        ensure_ascii=False,
+    )
+
+
+def node_from_json(line: bytes):
+    from travel_story import JourneyOption, StoryNode
+
+    data = json.loads(line)
+    return StoryNode(
+        node_id=data["node_id"],
+        title=data["title"],
+        description=data["description"],
+        options=[
+            JourneyOption(
+                prompt=option["prompt"],
+                next_id=option["next_id"],
+                location=tuple(option["location"]) if option.get("location") else None,
+                detail=option.get("detail", ""),
+            )
+            for option in data["options"]
+        ],
+    )
+
+
+def build_index(content: Path) -> Path:
+    """Scan a story ``.jsonl`` file once and write its sidecar offset index."""
+    content = Path(content)
+    entries = []
+    offset = 0
+    with open(content, "rb") as handle:
+        for line in handle:
+            stripped = line.rstrip(b"\r\n")
+            if stripped.strip():
+                node_id = json.loads(stripped)["node_id"].encode("utf-8")
+                entries.append((node_id, offset, len(stripped)))
+            offset += len(line)
+
+    keys = bytearray()
+    rows = []
+    for node_id, line_offset, length in entries:
+        rows.append((node_id, _INDEX_ENTRY.pack(len(keys), len(node_id), line_offset, length)))
+        keys += node_id
+    ordered = sorted(range(len(rows)), key=lambda position: rows[position][0])
+
+    destination = index_path(content)
+    temporary = destination.with_name(destination.name + f".{os.getpid()}.tmp")
+    with open(temporary, "wb") as handle:
+        handle.write(_INDEX_HEADER.pack(INDEX_MAGIC, len(rows)))
+        for position in ordered:
+            handle.write(rows[position][1])
+        # File order of the sorted entries, so iteration follows the content file.
+        for position in sorted(range(len(rows)), key=lambda rank: ordered[rank]):
+            handle.write(_U32.pack(position))
+        handle.write(keys)
+    os.replace(temporary, destination)
+    return destination
+
+
+def export_story(graph: Mapping, content: Path) -> Path:
+    """Write ``graph`` as a ``.jsonl`` story file and index it."""
+    content = Path(content)
+    content.parent.mkdir(parents=True, exist_ok=True)
+    with open(content, "w", encoding="utf-8") as handle:
+        for node_id in graph:
+            handle.write(node_to_json(graph[node_id]))
+            handle.write("\n")
+    build_index(content)
+    return content
+
+
+def _open_map(path: Path) -> mmap.mmap:
+    with open(path, "rb") as handle:
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class JsonlStory(Mapping):
+    """Read-only ``node_id -> StoryNode`` mapping that decodes nodes on demand.
+
+    Opening the story only maps the two files; ``get_node`` binary-searches the index,
+    decodes that one line, and keeps the most recent ``cache_size`` nodes in an LRU cache.
+    """
+
+    def __init__(self, content: Path, cache_size: int = 256) -> None:
+        self.path = Path(content)
+        sidecar = index_path(self.path)
+        if not sidecar.exists() or sidecar.stat().st_mtime < self.path.stat().st_mtime:
+            build_index(self.path)
+        self._content = _open_map(self.path)
+        self._index = _open_map(sidecar)
+        magic, self._count = _INDEX_HEADER.unpack_from(self._index)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{sidecar} is not a story index")
+        self._order_at = _INDEX_HEADER.size + self._count * _INDEX_ENTRY.size
+        self._keys_at = self._order_at + self._count * _U32.size
+        self._load = lru_cache(maxsize=cache_size)(self._read_node)
+
+    def _entry(self, position: int):
+        return _INDEX_ENTRY.unpack_from(self._index, _INDEX_HEADER.size + position * _INDEX_ENTRY.size)
+
+    def _key(self, position: int) -> bytes:
+        key_offset, key_length, _, _ = self._entry(position)
+        start = self._keys_at + key_offset
+        return self._index[start:start + key_length]
+
+    def _find(self, node_id: str) -> Optional[int]:
+        wanted = node_id.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            found = self._key(middle)
+            if found == wanted:
+                return middle
+            if found < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _read_node(self, node_id: str):
+        position = self._find(node_id)
+        if position is None:
+            raise KeyError(node_id)
+        _, _, line_offset, length = self._entry(position)
+        return node_from_json(self._content[line_offset:line_offset + length])
+
+    def __getitem__(self, node_id: str):
+        return self._load(node_id)
+
+    def __contains__(self, node_id: object) -> bool:
+        return isinstance(node_id, str) and self._find(node_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for rank in range(self._count):
+            position = _U32.unpack_from(self._index, self._order_at + rank * _U32.size)[0]
+            yield self._key(position).decode("utf-8")
+
+    def __len__(self) -> int:
+        return self._count
+
+
+def main() -> None:
+    if len(sys.argv) != 3 or sys.argv[1] not in {"export", "index"}:
+        print("usage: python story_files.py export|index STORY.jsonl")
+        raise SystemExit(2)
+    if sys.argv[1] == "export":
+        from travel_story import STORY_GRAPH
+
+        export_story(STORY_GRAPH, Path(sys.argv[2]))
+    else:
+        build_index(Path(sys.argv[2]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""Hot reload of story content while the game or server keeps running.
+
+The story source is cut into one chunk per node: a line of a ``.jsonl`` story, or one
+``"node_id": StoryNode(...)`` entry of ``_build_story_graph`` in ``travel_story.py``.
+When the file changes, chunks are compared by their exact text; only new or edited
+chunks are parsed, and nodes whose chunk disappeared are dropped. The edited nodes are
+checked, copied into a new graph and swapped in with ``use_story_graph`` in one step,
+so a reader always sees either the old story or the new one.
+
+    python main.py --watch
+    python game_server.py --watch
+"""
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import ast
+import bisect
+import threading
+import time
+
+import travel_story
+from story_analysis import follow_story_change, story_predecessors
+from story_files import node_from_json
+from travel_story import Session, StoryNode
+
+Chunks = Dict[bytes, str]
+
+
+@dataclass
+class ReloadReport:
+    updated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    problems: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def applied(self) -> bool:
+        return not self.problems
+
+    def summary(self) -> str:
+        if self.problems:
+            return "Story reload rejected:\n" + "\n".join(f"  {problem}" for problem in self.problems)
+        return (
+            f"Story reloaded in {self.seconds * 1000:.1f} ms: "
+            f"{len(self.updated)} nodes added or changed, {len(self.removed)} removed"
+        )
+
+
+class _ChunkedSource(ABC):
+    """A story file split into per-node chunks, remembering which node each chunk was."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._chunks: Chunks = {}
+
+    @abstractmethod
+    def _split(self, data: bytes) -> List[bytes]:
+        """Cut the source into one chunk per node."""
+
+    @abstractmethod
+    def _parse(self, chunk: bytes) -> StoryNode:
+        """The node one chunk describes."""
+
+    def load(self) -> Dict[str, StoryNode]:
+        """Parse every chunk; the starting point for later ``changes``."""
+        graph = {}
+        chunks = {}
+        for chunk in self._split(self.path.read_bytes()):
+            node = self._parse(chunk)
+            graph[node.node_id] = node
+            chunks[chunk] = node.node_id
+        self._chunks = chunks
+        return graph
+
+    def changes(self) -> Tuple[Dict[str, StoryNode], List[str], Chunks]:
+        """Parse only chunks that are new since the last accepted version.
+
+        Returns the new or edited nodes, the ids of removed nodes and the chunk table to
+        pass to ``accept`` once the change has been applied.
+        """
+        chunks = self._split(self.path.read_bytes())
+        previous = self._chunks
+        current: Chunks = {}
+        updated: Dict[str, StoryNode] = {}
+        for chunk in chunks:
+            node_id = previous.get(chunk)
+            if node_id is None:
+                node = self._parse(chunk)
+                node_id = node.node_id
+                updated[node_id] = node
+            current[chunk] = node_id
+        if len(current) == len(previous) and not updated:
+            return updated, [], current
+        live = set(current.values())
+        removed = sorted({node_id for node_id in previous.values() if node_id not in live})
+        return updated, removed, current
+
+    def accept(self, chunks: Chunks) -> None:
+        self._chunks = chunks
+
+
+def _common_prefix(old: bytes, new: bytes, limit: int, block: int = 1 << 16) -> int:
+    """Length of the longest shared prefix, at most ``limit``; compares a block at a time."""
+    size = 0
+    while size < limit:
+        step = min(block, limit - size)
+        if old[size:size + step] != new[size:size + step]:
+            break
+        size += step
+    else:
+        return limit
+    low, high = size, size + step
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[size:middle] == new[size:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix(old: bytes, new: bytes, limit: int, block: int = 1 << 16) -> int:
+    """Length of the longest shared suffix, at most ``limit``."""
+    old_end, new_end = len(old), len(new)
+    size = 0
+    while size < limit:
+        step = min(block, limit - size)
+        if old[old_end - size - step:old_end - size] != new[new_end - size - step:new_end - size]:
+            break
+        size += step
+    else:
+        return limit
+    low, high = size, size + step
+    while low < high:
+        middle = (low + high + 1) // 2
+        if old[old_end - middle:old_end - size] == new[new_end - middle:new_end - size]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class JsonlSource(_ChunkedSource):
+    """A ``.jsonl`` story written by ``story_files.export_story``: one node per line.
+
+    Large stories make even hashing every line too slow, so changes are found by
+    comparing the new file with the last accepted one from both ends; only the lines
+    between the first and last differing byte are looked at.
+    """
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._data = b""
+        self._starts = array("q")
+        self._ids: List[str] = []
+
+    def _split(self, data: bytes) -> List[bytes]:
+        return [line for line in data.split(b"\n") if line.strip()]
+
+    def _parse(self, chunk: bytes) -> StoryNode:
+        return node_from_json(chunk)
+
+    @staticmethod
+    def _lines(data: bytes, offset: int) -> Iterator[Tuple[int, bytes]]:
+        for line in data.split(b"\n"):
+            if line.strip():
+                yield offset, line
+            offset += len(line) + 1
+
+    def load(self) -> Dict[str, StoryNode]:
+        data = self.path.read_bytes()
+        graph = {}
+        starts, ids = array("q"), []
+        for start, line in self._lines(data, 0):
+            node = self._parse(line)
+            graph[node.node_id] = node
+            starts.append(start)
+            ids.append(node.node_id)
+        self._data, self._starts, self._ids = data, starts, ids
+        return graph
+
+    def changes(self):
+        old, new = self._data, self.path.read_bytes()
+        if old == new:
+            return {}, [], (old, self._starts, self._ids)
+        shortest = min(len(old), len(new))
+        prefix = _common_prefix(old, new, shortest)
+        suffix = _common_suffix(old, new, shortest - prefix)
+        # Widen the differing bytes to whole lines; the same in both files by construction.
+        begin = old.rfind(b"\n", 0, prefix) + 1
+        old_end = old.find(b"\n", len(old) - suffix)
+        old_end = len(old) if old_end < 0 else old_end
+        new_end = old_end + len(new) - len(old)
+
+        first = bisect.bisect_left(self._starts, begin)
+        last = bisect.bisect_left(self._starts, old_end)
+        old_lines = {
+            old[start:start + self._line_length(old, start, old_end)]: node_id
+            for start, node_id in zip(self._starts[first:last], self._ids[first:last])
+        }
+        updated: Dict[str, StoryNode] = {}
+        region_starts, region_ids = array("q"), []
+        for start, line in self._lines(new[begin:new_end], begin):
+            node_id = old_lines.get(line)
+            if node_id is None:
+                node = self._parse(line)
+                node_id = node.node_id
+                updated[node_id] = node
+            region_starts.append(start)
+            region_ids.append(node_id)
+        kept = set(region_ids)
+        removed = sorted({node_id for node_id in old_lines.values() if node_id not in kept})
+
+        shift = len(new) - len(old)
+        starts = self._starts[:first] + region_starts + array("q", [start + shift for start in self._starts[last:]])
+        ids = self._ids[:first] + region_ids + self._ids[last:]
+        return updated, removed, (new, starts, ids)
+
+    @staticmethod
+    def _line_length(data: bytes, start: int, limit: int) -> int:
+        end = data.find(b"\n", start, limit)
+        return (limit if end < 0 else end) - start
+
+    def accept(self, state) -> None:
+        self._data, self._starts, self._ids = state
+
+
+class ModuleSource(_ChunkedSource):
+    """``travel_story.py``: each entry of the dict literal ``_build_story_graph`` returns."""
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        # The story's own names (StoryNode, JourneyOption, ...) for evaluating entries.
+        self._namespace = dict(vars(travel_story))
+
+    def _split(self, data: bytes) -> List[bytes]:
+        tree = ast.parse(data, str(self.path))
+        builder = next(
+            (node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == "_build_story_graph"),
+            None,
+        )
+        returned = builder.body[-1] if builder and builder.body else None
+        if not (isinstance(returned, ast.Return) and isinstance(returned.value, ast.Dict)):
+            raise ValueError(f"{self.path}: _build_story_graph must end by returning a dict literal")
+        starts = [0]
+        for line in data.splitlines(keepends=True):
+            starts.append(starts[-1] + len(line))
+        chunks = []
+        for value in returned.value.values:
+            begin = starts[value.lineno - 1] + value.col_offset
+            end = starts[value.end_lineno - 1] + value.end_col_offset
+            chunks.append(data[begin:end])
+        return chunks
+
+    def _parse(self, chunk: bytes) -> StoryNode:
+        # Entries are keyed by their node_id, so the value alone is enough.
+        node = eval(compile(chunk, str(self.path), "eval"), self._namespace)
+        if not isinstance(node, StoryNode):
+            raise ValueError(f"{self.path}: story entry is not a StoryNode: {chunk[:60]!r}")
+        return node
+
+
+def _check(graph: Dict[str, StoryNode], updated: Dict[str, StoryNode], removed: Iterable[str]) -> List[str]:
+    """Problems the change would introduce, looking only at what it touched."""
+    problems = []
+    start = travel_story.get_start_node_id()
+    if start not in graph:
+        problems.append(f"start node {start!r} was removed")
+    for node_id, node in updated.items():
+        if not node.options:
+            problems.append(f"{node_id}: has no options")
+        for number, option in enumerate(node.options, start=1):
+            if option.next_id not in graph:
+                problems.append(f"{node_id} option {number}: next_id {option.next_id!r} is not a node")
+    gone: Set[str] = set(removed)
+    if gone:
+        for node_id, node in graph.items():
+            if node_id in updated:
+                continue
+            for number, option in enumerate(node.options, start=1):
+                if option.next_id in gone:
+                    problems.append(f"{node_id} option {number}: next_id {option.next_id!r} was removed")
+    return problems
+
+
+def migrate_sessions(sessions: Iterable[Session], graph: Optional[Dict[str, StoryNode]] = None) -> List[int]:
+    """Move sessions standing on nodes that no longer exist back to the start.
+
+    Returns the ids of the sessions that were moved.
+    """
+    graph = travel_story.STORY_GRAPH if graph is None else graph
+    moved = []
+    for session in sessions:
+        if session.node_id not in graph:
+            session.node_id = travel_story.get_start_node_id()
+            moved.append(session.session_id)
+    return moved
+
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    status = path.stat()
+    return status.st_mtime_ns, status.st_size
+
+
+class StoryWatcher:
+    """Polls the story source and swaps edits into the live story graph."""
+
+    def __init__(self, path: Optional[Path] = None, interval: float = 0.5) -> None:
+        path = Path(path) if path else travel_story.story_source()
+        self.source = JsonlSource(path) if path.suffix == ".jsonl" else ModuleSource(path)
+        self.interval = interval
+        self._stamp = _stamp(path)
+        self.graph = self.source.load()
+        travel_story.use_story_graph(self.graph)
+        # Every node is in memory now anyway; from here on reloads update it node by node.
+        story_predecessors()
+        self._stop = threading.Event()
+
+    def poll(self) -> Optional[ReloadReport]:
+        """Reload if the source changed since the last poll; ``None`` when it hasn't."""
+        try:
+            stamp = _stamp(self.source.path)
+        except OSError:
+            return None
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        started = time.perf_counter()
+        try:
+            updated, removed, chunks = self.source.changes()
+        except (OSError, SyntaxError, ValueError, NameError, TypeError, KeyError) as error:
+            return ReloadReport(problems=[f"{type(error).__name__}: {error}"])
+        if not updated and not removed:
+            self.source.accept(chunks)
+            return None
+        graph = dict(self.graph)
+        graph.update(updated)
+        for node_id in removed:
+            graph.pop(node_id, None)
+        report = ReloadReport(sorted(updated), removed, _check(graph, updated, removed))
+        if report.applied:
+            previous = travel_story.use_story_graph(graph)
+            follow_story_change(previous, graph, updated.values(), removed)
+            self.graph = graph
+            self.source.accept(chunks)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def run(self, on_reload: Callable[[ReloadReport], None] = lambda report: print(report.summary())) -> None:
+        while not self._stop.wait(self.interval):
+            report = self.poll()
+            if report is not None:
+                on_reload(report)
+
+    def start(self, on_reload: Optional[Callable[[ReloadReport], None]] = None) -> threading.Thread:
+        """Watch in a daemon thread until ``stop()``."""
+        thread = threading.Thread(
+            target=self.run, args=(on_reload,) if on_reload else (), name="story-watcher", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
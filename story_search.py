@@ -0,0 +1,258 @@
+"""Full-text search over the story: find every node that mentions a word.
+
+Titles, descriptions, option prompts and option details are split into case-folded
+word tokens, and an inverted index maps each token to the sorted positions of the nodes
+that use it. The index is written once per story version into the story cache and read
+back with mmap, so a query only binary-searches the sorted terms and walks the posting
+lists it needs. Every query word matches as a prefix, so ``guin`` finds Guinness.
+
+    python story_search.py guinness
+    python story_search.py dublin pub --limit 50
+"""
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+import argparse
+import bisect
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+
+MAGIC = b"TSRH"
+FORMAT_VERSION = 1
+# A prefix matching more terms than this only searches the first ones, as a short
+# prefix like "s" would otherwise pull in a large share of the vocabulary.
+MAX_EXPANSIONS = 64
+
+# magic, version, node count, term count, then the byte offsets of the node id
+# offsets, node id blob, term offsets, term blob, posting offsets and postings.
+_HEADER = struct.Struct("<4sHxxIIIIIIII")
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded word tokens of ``text``."""
+    return _WORD.findall(text.casefold())
+
+
+def node_tokens(node) -> set:
+    """Every distinct token in the searchable text of one node."""
+    parts = [node.title, node.description]
+    for option in node.options:
+        parts.append(option.prompt)
+        parts.append(option.detail)
+    return set(tokenize(" ".join(parts)))
+
+
+def _strings(items: List[bytes]) -> Tuple[array, bytes]:
+    offsets = array("I", [0])
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    blob = b"".join(items)
+    return offsets, blob + bytes(-len(blob) % 4)
+
+
+def build_search_index(graph: Mapping, destination: Path) -> Path:
+    """Index every node of ``graph`` and write the index to ``destination``."""
+    node_ids = []
+    postings: Dict[str, array] = {}
+    for position, node_id in enumerate(graph):
+        node_ids.append(node_id.encode("utf-8"))
+        for token in node_tokens(graph[node_id]):
+            found = postings.get(token)
+            if found is None:
+                found = postings[token] = array("I")
+            found.append(position)
+
+    terms = sorted((token.encode("utf-8"), token) for token in postings)
+    id_offsets, id_blob = _strings(node_ids)
+    term_offsets, term_blob = _strings([encoded for encoded, _ in terms])
+    posting_offsets = array("I", [0])
+    for _, token in terms:
+        posting_offsets.append(posting_offsets[-1] + len(postings[token]))
+
+    sections = [id_offsets.tobytes(), id_blob, term_offsets.tobytes(), term_blob, posting_offsets.tobytes()]
+    starts = []
+    position = _HEADER.size
+    for section in sections:
+        starts.append(position)
+        position += len(section)
+    starts.append(position)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(node_ids), len(terms), *starts)
+
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary = destination.with_name(destination.name + f".{os.getpid()}.tmp")
+    with open(temporary, "wb") as handle:
+        handle.write(header)
+        for section in sections:
+            handle.write(section)
+        for _, token in terms:
+            postings[token].tofile(handle)
+    os.replace(temporary, destination)
+    return destination
+
+
+class _Terms:
+    """The index's sorted terms as a sequence of bytes, for ``bisect``."""
+
+    def __init__(self, index: "SearchIndex") -> None:
+        self._index = index
+
+    def __getitem__(self, position: int) -> bytes:
+        return self._index._term(position)
+
+    def __len__(self) -> int:
+        return self._index.term_count
+
+
+class SearchIndex:
+    """A story search index memory-mapped from the file ``build_search_index`` wrote.
+
+    The index is a local cache, so its integer arrays are stored in native byte order.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as handle:
+            self._data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._data) < _HEADER.size:
+            raise ValueError(f"{self.path} is not a story search index")
+        (magic, version, self.node_count, self.term_count, id_offsets_at, self._ids_at,
+         term_offsets_at, self._terms_at, posting_offsets_at, postings_at) = _HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a story search index (format {FORMAT_VERSION})")
+        view = memoryview(self._data)
+        self._id_offsets = view[id_offsets_at:self._ids_at].cast("I")
+        self._term_offsets = view[term_offsets_at:self._terms_at].cast("I")
+        self._posting_offsets = view[posting_offsets_at:postings_at].cast("I")
+        self._postings = view[postings_at:].cast("I")
+        self._sorted_terms = _Terms(self)
+
+    def _term(self, position: int) -> bytes:
+        start = self._terms_at + self._term_offsets[position]
+        return self._data[start:self._terms_at + self._term_offsets[position + 1]]
+
+    def node_id(self, position: int) -> str:
+        start = self._ids_at + self._id_offsets[position]
+        return self._data[start:self._ids_at + self._id_offsets[position + 1]].decode("utf-8")
+
+    def _posting(self, term: int) -> memoryview:
+        return self._postings[self._posting_offsets[term]:self._posting_offsets[term + 1]]
+
+    def expand(self, prefix: str) -> List[str]:
+        """Indexed terms starting with ``prefix``, shortest match first, at most ``MAX_EXPANSIONS``."""
+        return [self._term(term).decode("utf-8") for term in self._expansions(prefix)]
+
+    def _expansions(self, prefix: str) -> range:
+        wanted = prefix.encode("utf-8")
+        first = bisect.bisect_left(self._sorted_terms, wanted)
+        last = first
+        while last < min(self.term_count, first + MAX_EXPANSIONS) and self._term(last).startswith(wanted):
+            last += 1
+        return range(first, last)
+
+    def positions(self, query: str) -> Iterator[int]:
+        """Positions of nodes matching every word of ``query``, each word as a prefix.
+
+        Candidates come from the word with the shortest posting lists, exact matches of
+        that word first, and are checked against the other words by binary search.
+        """
+        groups = [[self._posting(term) for term in self._expansions(token)] for token in dict.fromkeys(tokenize(query))]
+        if not groups:
+            return
+        groups.sort(key=lambda postings: sum(len(posting) for posting in postings))
+        leader, others = groups[0], groups[1:]
+        seen = set()
+        for posting in leader:
+            for position in posting:
+                if position in seen:
+                    continue
+                seen.add(position)
+                if all(any(_contains(posting, position) for posting in group) for group in others):
+                    yield position
+
+    def search(self, query: str, limit: Optional[int] = 20) -> List[str]:
+        """Ids of up to ``limit`` nodes matching ``query``; ``None`` for every match."""
+        matches = []
+        for position in self.positions(query):
+            if limit is not None and len(matches) >= limit:
+                break
+            matches.append(self.node_id(position))
+        return matches
+
+
+def _contains(posting: memoryview, position: int) -> bool:
+    found = bisect.bisect_left(posting, position)
+    return found < len(posting) and posting[found] == position
+
+
+def _index_path(source: Path, cache_dir: Path) -> Path:
+    from story_compiler import content_hash
+
+    key = hashlib.sha256(f"search-{FORMAT_VERSION}:{content_hash(source, cache_dir)}".encode()).hexdigest()
+    return Path(cache_dir) / f"search-{key[:16]}.bin"
+
+
+def load_or_build(graph: Mapping, source: Path, cache_dir: Path) -> SearchIndex:
+    """The search index for this version of ``source``, building it into the cache if needed."""
+    path = _index_path(source, cache_dir)
+    try:
+        return SearchIndex(path)
+    except (OSError, ValueError):
+        pass
+    return SearchIndex(build_search_index(graph, path))
+
+
+_live: Optional[Tuple[Mapping, SearchIndex]] = None
+# Threads building at once would also share one temporary file name.
+_live_lock = threading.Lock()
+
+
+def live_index() -> SearchIndex:
+    """The index of the live story; rebuilt after the story is swapped, e.g. by a hot reload."""
+    global _live
+    import travel_story
+
+    graph = travel_story.STORY_GRAPH
+    with _live_lock:
+        if _live is None or _live[0] is not graph:
+            _live = graph, load_or_build(graph, travel_story.story_source(), travel_story.STORY_CACHE_DIR)
+        return _live[1]
+
+
+def find_nodes(query: str, limit: Optional[int] = 20) -> List[str]:
+    """Ids of live story nodes whose text matches every word of ``query``."""
+    return live_index().search(query, limit)
+
+
+def resolve_node(keyword: str) -> Optional[str]:
+    """The node ``keyword`` names: a node id as typed, or else the first node matching it."""
+    import travel_story
+
+    keyword = keyword.strip()
+    if keyword in travel_story.STORY_GRAPH:
+        return keyword
+    matches = find_nodes(keyword, limit=1)
+    return matches[0] if matches else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Find story nodes by the words in their text.")
+    parser.add_argument("query", nargs="+")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    from travel_story import get_node
+
+    matches = find_nodes(" ".join(args.query), args.limit)
+    for node_id in matches:
+        print(f"{node_id}: {get_node(node_id).title}")
+    if not matches:
+        print("No nodes match")
+
+
+if __name__ == "__main__":
+    main()
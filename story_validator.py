@@ -0,0 +1,116 @@
+"""Check the story graph for broken links and bad data before anyone plays it.
+
+Every ``next_id`` must name a node, every node needs at least one option, coordinates
+must be on the globe and every node must be reachable from the start. The checks run
+in one pass over the integer index from ``story_analysis``. The result is cached next
+to the compiled story, keyed by the hash of the story source, so startup only
+re-validates after the story changes; the source is only re-hashed when its size or
+modification time changes.
+
+    python story_validator.py
+"""
+from pathlib import Path
+from typing import List, Mapping
+import argparse
+import hashlib
+import json
+import math
+import os
+
+from story_analysis import build_index, reachable
+
+VALIDATOR_VERSION = 1
+
+
+class StoryValidationError(ValueError):
+    """The story has problems that would break a playthrough."""
+
+    def __init__(self, problems: List[str]) -> None:
+        super().__init__(f"story has {len(problems)} problem(s):\n" + "\n".join(f"  {problem}" for problem in problems))
+        self.problems = problems
+
+
+def validate_story(graph: Mapping, start: str = "start") -> List[str]:
+    """Every problem found in ``graph``, as readable messages; empty when it is valid."""
+    # Lazily loaded stories parse a node on every lookup, so read each one only once.
+    graph = graph if isinstance(graph, dict) else dict(graph.items())
+    index = build_index(graph)
+    problems = [
+        f"{node_id} option {option_index + 1}: next_id {next_id!r} is not a node"
+        for node_id, option_index, next_id in index.missing_targets
+    ]
+    for node_id in index.node_ids:
+        options = graph[node_id].options
+        if not options:
+            problems.append(f"{node_id}: has no options")
+        for option_index, option in enumerate(options):
+            if option.location is None:
+                continue
+            name, lat, lon = option.location
+            if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+                problems.append(f"{node_id} option {option_index + 1}: {name} has coordinates ({lat}, {lon}) off the globe")
+    if start not in index.positions:
+        problems.append(f"start node {start!r} is not a node")
+    else:
+        problems.extend(
+            f"{node_id}: unreachable from {start!r}"
+            for node_id, seen in zip(index.node_ids, reachable(index, start))
+            if not seen
+        )
+    return problems
+
+
+def _result_path(source: Path, cache_dir: Path, start: str) -> Path:
+    from story_compiler import content_hash
+
+    key = hashlib.sha256(f"validator-{VALIDATOR_VERSION}:{start}:{content_hash(source, cache_dir)}".encode()).hexdigest()
+    return Path(cache_dir) / f"validation-{key[:16]}.json"
+
+
+def validate_cached(graph: Mapping, source: Path, cache_dir: Path, start: str = "start") -> List[str]:
+    """``validate_story`` with its result cached per version of the ``source`` file."""
+    path = _result_path(source, cache_dir, start)
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        pass
+    problems = validate_story(graph, start)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + f".{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(problems), encoding="utf-8")
+        os.replace(temporary, path)
+    except OSError:
+        pass
+    return problems
+
+
+def check_story(use_cache: bool = True) -> None:
+    """Raise ``StoryValidationError`` if the live story is broken.
+
+    Cheap on every start after the first: only the story source's size and mtime are read.
+    """
+    from travel_story import STORY_CACHE_DIR, STORY_GRAPH, get_start_node_id, story_source
+
+    start = get_start_node_id()
+    if use_cache:
+        problems = validate_cached(STORY_GRAPH, story_source(), STORY_CACHE_DIR, start)
+    else:
+        problems = validate_story(STORY_GRAPH, start)
+    if problems:
+        raise StoryValidationError(problems)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate the story graph.")
+    parser.add_argument("--no-cache", action="store_true", help="validate even if this story version passed before")
+    args = parser.parse_args()
+    try:
+        check_story(use_cache=not args.no_cache)
+    except StoryValidationError as error:
+        raise SystemExit(str(error))
+    print("Story is valid")
+
+
+if __name__ == "__main__":
+    main()
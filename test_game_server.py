@@ -0,0 +1,82 @@
+"""Run with ``python -m pytest test_game_server.py``."""
+from pathlib import Path
+import asyncio
+import tempfile
+import unittest
+
+import travel_story
+from game_server import NAME_PROMPT, PROMPT, GameServer
+from story_files import JsonlStory, export_story
+from travel_story import JourneyOption, StoryNode, get_node, use_story_graph
+
+NODE_COUNT = 2000
+CACHE_SIZE = 256
+
+
+def _ring_story(count: int) -> dict:
+    """``start`` and ``n1``..``n{count - 1}`` each leading to the next node and back to the start."""
+    ids = ["start"] + [f"n{number}" for number in range(1, count)]
+    graph = {}
+    for position, node_id in enumerate(ids):
+        following = ids[(position + 1) % count]
+        graph[node_id] = StoryNode(
+            node_id=node_id,
+            title=f"Stop {position}",
+            description=f"Stop number {position}.",
+            options=[
+                JourneyOption(f"Go on to {following}", following, (f"Place {position}", position % 80, position % 170)),
+                JourneyOption("Head back to the start", "start"),
+            ],
+        )
+    return graph
+
+
+class ChoiceAfterEvictionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        content = export_story(_ring_story(NODE_COUNT), Path(directory.name) / "ring.jsonl")
+        previous = use_story_graph(JsonlStory(content, cache_size=CACHE_SIZE))
+        self.addCleanup(use_story_graph, previous)
+
+    async def _play(self, between_prompt_and_answer) -> str:
+        """Answer ``1`` to the first prompt after calling ``between_prompt_and_answer``; returns the reply."""
+        server = await asyncio.start_server(GameServer(idle_timeout=5).handle, "127.0.0.1", 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            await reader.readuntil(NAME_PROMPT.encode())
+            writer.write(b"Tester\n")
+            await reader.readuntil(PROMPT.encode())
+            between_prompt_and_answer()
+            writer.write(b"1\n")
+            reply = (await reader.readuntil(PROMPT.encode())).decode()
+            writer.write(b"quit\n")
+            await reader.read()
+            writer.close()
+            await writer.wait_closed()
+        return reply
+
+    def test_choice_survives_cache_eviction(self) -> None:
+        def read_other_nodes() -> None:
+            for number in range(1, CACHE_SIZE + 45):
+                get_node(f"n{number + 500}")
+
+        reply = asyncio.run(self._play(read_other_nodes))
+        self.assertNotIn("The story was just updated", reply)
+        self.assertIn("=== Stop 1 ===", reply)
+
+    def test_edited_node_is_shown_again(self) -> None:
+        def edit_start() -> None:
+            graph = dict(travel_story.STORY_GRAPH.items())
+            start = graph["start"]
+            graph["start"] = StoryNode(start.node_id, "Stop 0, rebuilt", start.description, start.options)
+            use_story_graph(graph)
+
+        reply = asyncio.run(self._play(edit_start))
+        self.assertIn("The story was just updated", reply)
+        self.assertIn("=== Stop 0, rebuilt ===", reply)
+
+
+if __name__ == "__main__":
+    unittest.main()
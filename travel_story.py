@@ -1,6 +1,11 @@
 """Travel story content and helpers for the choose-your-own-adventure program."""
+from array import array
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+import os
+
+from locations import JOURNEY_TYPECODE, location_table
 
 
 @dataclass(frozen=True)
@@ -1297,7 +1302,48 @@ def _build_story_graph() -> Dict[str, StoryNode]:
     }
 
 
-STORY_GRAPH = _build_story_graph()
+EXIT_WORDS = {"quit", "exit", "done"}
+START_LOCATION = ("East Lansing, Michigan", 42.73698, -84.48387)
+STORY_CACHE_DIR = Path(__file__).with_name(".story_cache")
+
+
+def story_source() -> Path:
+    """The file the live story is read from: a ``TRAVEL_STORY_CONTENT`` file or this module."""
+    content = os.environ.get("TRAVEL_STORY_CONTENT")
+    return Path(content) if content else Path(__file__)
+
+
+def _load_story_graph() -> Mapping[str, StoryNode]:
+    """Load the story from its compiled cache, compiling it the first time the content changes.
+
+    Set ``TRAVEL_STORY_CONTENT`` to a ``.jsonl`` story file to read nodes from it lazily instead.
+    """
+    content = os.environ.get("TRAVEL_STORY_CONTENT")
+    if content:
+        from story_files import JsonlStory
+
+        return JsonlStory(Path(content))
+
+    from story_compiler import load_or_compile
+
+    return load_or_compile(Path(__file__), _build_story_graph, STORY_CACHE_DIR)
+
+
+STORY_GRAPH: Mapping[str, StoryNode] = _load_story_graph()
+_story_generation = 0
+
+
+def use_story_graph(graph: Mapping[str, StoryNode]) -> Mapping[str, StoryNode]:
+    """Make ``graph`` the live story and return the one it replaced."""
+    global STORY_GRAPH, _story_generation
+    previous, STORY_GRAPH = STORY_GRAPH, graph
+    _story_generation += 1
+    return previous
+
+
+def story_generation() -> int:
+    """How many times ``use_story_graph`` has swapped the live story."""
+    return _story_generation
 
 
 def get_start_node_id() -> str:
@@ -1317,5 +1363,42 @@ def describe_node(node: StoryNode) -> str:
     return "\n".join(lines)
 
 
-def record_location(option: JourneyOption) -> Optional[Tuple[str, float, float]]:
-    return option.location
\ No newline at end of file
+def parse_choice(raw: str, option_count: int) -> Optional[int]:
+    """Turn a typed choice into an option index, or None when the player wants to stop.
+
+    Raises ValueError for anything that isn't an exit word or a valid option number.
+    """
+    raw = raw.strip().lower()
+    if raw in EXIT_WORDS:
+        return None
+    if raw.isdigit():
+        selection = int(raw) - 1
+        if 0 <= selection < option_count:
+            return selection
+    raise ValueError(f"not a valid choice: {raw!r}")
+
+
+def record_location(option: JourneyOption, journey: Optional[array] = None) -> Optional[Tuple[str, float, float]]:
+    """Return the option's location, appending its interned id to ``journey`` when given."""
+    if journey is not None and option.location:
+        journey.append(location_table().intern(option.location))
+    return option.location
+
+
+class Session:
+    """Everything kept per player: where they are and where they've been."""
+
+    __slots__ = ("session_id", "node_id", "journey")
+
+    def __init__(self, session_id: int, node_id: str, journey: Optional[array] = None) -> None:
+        self.session_id = session_id
+        self.node_id = node_id
+        if journey is None:
+            journey = array(JOURNEY_TYPECODE, [location_table().intern(START_LOCATION)])
+        self.journey = journey
+
+    def choose(self, option_index: int) -> JourneyOption:
+        option = get_node(self.node_id).options[option_index]
+        record_location(option, self.journey)
+        self.node_id = option.next_id
+        return option
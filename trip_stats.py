@@ -0,0 +1,158 @@
+"""Distance and continent statistics for finished journeys.
+
+Great-circle distances between every pair of story locations are kept in a flat matrix
+indexed by location id, so the stats for a journey are just lookups. Places interned
+later only add their own row and column.
+"""
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
+import math
+import threading
+
+from locations import LocationTable, location_table
+
+EARTH_RADIUS_KM = 6371.0088
+
+# (name, south, north, west, east); checked in order, the first box that matches wins.
+CONTINENT_BOXES = [
+    ("Antarctica", -90, -60, -180, 180),
+    ("North America", 7, 85, -170, -50),
+    ("South America", -60, 13, -92, -30),
+    ("Africa", -36, 36, -20, 52),
+    ("Europe", 35, 72, -30, 45),
+    ("Asia", -11, 82, 45, 180),
+    ("Oceania", -50, -11, 110, 180),
+]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(lon2 - lon1) / 2
+    a = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def continent_of(lat: float, lon: float) -> str:
+    for name, south, north, west, east in CONTINENT_BOXES:
+        if south <= lat <= north and west <= lon <= east:
+            return name
+    return "Open Ocean"
+
+
+class DistanceMatrix:
+    """Pairwise great-circle distances between all locations in a ``LocationTable``."""
+
+    def __init__(self, table: LocationTable) -> None:
+        self.table = table
+        self._grid = (0, array("d"))
+        self.size, self.distances = self._grid
+        self.continents: List[str] = []
+        self._grow_lock = threading.Lock()
+        self._grow()
+
+    def _grow(self) -> None:
+        """Add rows and columns for places interned since the last call, keeping known legs."""
+        with self._grow_lock:
+            old = self.size
+            locations = list(self.table)
+            size = len(locations)
+            if size == old:
+                return
+            distances = array("d", bytes(8 * size * size))
+            for row in range(old):
+                distances[row * size:row * size + old] = self.distances[row * old:(row + 1) * old]
+            for row in range(old, size):
+                _, lat1, lon1 = locations[row]
+                for column in range(row):
+                    _, lat2, lon2 = locations[column]
+                    km = haversine_km(lat1, lon1, lat2, lon2)
+                    distances[row * size + column] = km
+                    distances[column * size + row] = km
+            self.continents.extend(continent_of(lat, lon) for _, lat, lon in locations[old:])
+            # Readers take both at once, so they never pair a new size with the old matrix.
+            self._grid = (size, distances)
+            self.size, self.distances = self._grid
+
+    def leg_distances(self, journey: Iterable[int]) -> List[float]:
+        """Distances of each leg of a journey of location ids."""
+        journey = list(journey)
+        if journey and max(journey) >= self.size:
+            # New places were interned after the matrix was built.
+            self._grow()
+        size, distances = self._grid
+        return [distances[a * size + b] for a, b in zip(journey, journey[1:])]
+
+
+@dataclass
+class JourneyStats:
+    stops: int
+    total_km: float
+    leg_km: List[float]
+    longest_leg: Optional[Tuple[str, str, float]]
+    continents: Counter = field(default_factory=Counter)
+
+
+_matrix: Optional[DistanceMatrix] = None
+
+
+def distance_matrix() -> DistanceMatrix:
+    """The matrix for the shared story location table, built on first use."""
+    global _matrix
+    if _matrix is None:
+        _matrix = DistanceMatrix(location_table())
+    return _matrix
+
+
+def _journey_ids(visits, table: LocationTable) -> array:
+    if isinstance(visits, array):
+        return visits
+    return table.encode(visits)
+
+
+def journey_stats(visits, matrix: Optional[DistanceMatrix] = None) -> JourneyStats:
+    """Stats for one journey, given as a list of locations or a compact id array."""
+    matrix = matrix or distance_matrix()
+    journey = _journey_ids(visits, matrix.table)
+    legs = matrix.leg_distances(journey)
+    longest = None
+    if legs:
+        position = max(range(len(legs)), key=legs.__getitem__)
+        longest = (matrix.table[journey[position]][0], matrix.table[journey[position + 1]][0], legs[position])
+    return JourneyStats(
+        stops=len(journey),
+        total_km=sum(legs),
+        leg_km=legs,
+        longest_leg=longest,
+        continents=Counter(matrix.continents[location_id] for location_id in journey),
+    )
+
+
+def journey_stats_batch(journeys: Iterable, matrix: Optional[DistanceMatrix] = None) -> Iterator[JourneyStats]:
+    """Lazily compute stats for many journeys, e.g. a generator reading logged sessions."""
+    matrix = matrix or distance_matrix()
+    for journey in journeys:
+        yield journey_stats(journey, matrix)
+
+
+def batch_total_km(journeys: Iterable, matrix: Optional[DistanceMatrix] = None) -> array:
+    """Total distance of each journey of location ids, skipping the per-journey stats objects."""
+    matrix = matrix or distance_matrix()
+    totals = array("d")
+    for journey in journeys:
+        totals.append(sum(matrix.leg_distances(_journey_ids(journey, matrix.table))))
+    return totals
+
+
+def format_stats(stats: JourneyStats) -> str:
+    lines = [f"\nYou made {stats.stops} stops and traveled {stats.total_km:,.0f} km."]
+    if stats.longest_leg:
+        origin, destination, km = stats.longest_leg
+        lines.append(f"Longest leg: {origin} to {destination} ({km:,.0f} km)")
+    if stats.continents:
+        breakdown = ", ".join(f"{name} {count}" for name, count in stats.continents.most_common())
+        lines.append(f"Stops by continent: {breakdown}")
+    return "\n".join(lines)
+